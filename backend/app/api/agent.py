@@ -1,12 +1,17 @@
 """
 AI 书童相关 API（无需登录版本）
 """
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import json
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-from app.db.database import get_db
+from app.db.database import get_db, get_async_db
 from app.db.models import (
     Book,
     ChatMessage as ChatMessageModel,
@@ -16,6 +21,7 @@ from app.db.models import (
     User,
 )
 from app.api.auth import get_current_user_optional
+from app.core.pagination import decode_id_cursor, set_next_cursor
 from app.services.llm import LLMService
 
 router = APIRouter()
@@ -60,6 +66,13 @@ def get_current_user_id(db: Session, current_user: Optional[User] = None) -> int
     return anonymous_user.id if anonymous_user else 1
 
 
+async def get_current_user_id_async(db: AsyncSession, current_user: Optional[User] = None) -> int:
+    """get_current_user_id 的异步版本：匿名用户的查找/创建沿用同步逻辑，在异步会话的连接上执行"""
+    if current_user:
+        return current_user.id
+    return await db.run_sync(get_current_user_id)
+
+
 class ChatMessageRequest(BaseModel):
     message: str
     session_id: int  # 会话ID
@@ -430,91 +443,139 @@ def _extract_facts_from_message(text: str) -> List[tuple]:
     return facts
 
 
-def _get_session_summary_and_interests(db: Session, session_id: int, user_id: int):
+async def _get_session_summary_and_interests(db: AsyncSession, session_id: int, user_id: int):
     """获取会话摘要与用户兴趣（用于注入 LLM）"""
-    summary = db.query(ChatSessionSummary).filter(
-        ChatSessionSummary.session_id == session_id
-    ).first()
-    summary_text = summary.summary if summary else ""
+    summary_text = (await db.execute(
+        select(ChatSessionSummary.summary).where(ChatSessionSummary.session_id == session_id)
+    )).scalar() or ""
 
-    interests = db.query(UserInterestFact).filter(
-        UserInterestFact.user_id == user_id,
-        UserInterestFact.weight >= 0.2
-    ).order_by(UserInterestFact.last_mentioned_at.desc()).limit(15).all()
-    interest_values = list(dict.fromkeys([f.fact_value for f in interests]))[:10]
+    interests = (await db.execute(
+        select(UserInterestFact.fact_value).where(
+            UserInterestFact.user_id == user_id,
+            UserInterestFact.weight >= 0.2
+        ).order_by(UserInterestFact.last_mentioned_at.desc()).limit(15)
+    )).scalars().all()
+    interest_values = list(dict.fromkeys(interests))[:10]
     return summary_text, interest_values
 
 
+async def _prepare_chat_turn(db: AsyncSession, user_id: int, chat_data: ChatMessageRequest) -> dict:
+    """保存用户消息并组装生成回复所需的上下文（书籍信息、会话摘要、用户兴趣、最近对话）"""
+    user_message = chat_data.message
+    session_id = chat_data.session_id
+    book_id = chat_data.book_id
+    
+    # 验证会话是否存在
+    session = (await db.execute(
+        select(ChatSessionModel).where(
+            ChatSessionModel.id == session_id,
+            ChatSessionModel.user_id == user_id
+        )
+    )).scalar_one_or_none()
+    
+    if not session:
+        raise HTTPException(status_code=404, detail="会话不存在")
+    
+    # 保存用户消息
+    user_msg = ChatMessageModel(
+        session_id=session_id,
+        user_id=user_id,
+        book_id=book_id,
+        role="user",
+        content=user_message
+    )
+    db.add(user_msg)
+    
+    # 更新会话时间
+    from sqlalchemy.sql import func
+    session.updated_at = func.now()
+    
+    await db.commit()
+    await db.refresh(user_msg)
+    
+    # 获取书籍上下文（如果提供了 book_id）
+    book_context = ""
+    if book_id:
+        book = await db.get(Book, book_id)
+        if book:
+            book_context = f"书名：{book.title}\n作者：{book.author}\n简介：{book.description or '暂无简介'}"
+
+    # 会话摘要与用户兴趣（记忆机制）
+    session_summary, user_interests = await _get_session_summary_and_interests(db, session_id, user_id)
+    
+    # 所有对话统一走 DeepSeek（不再用简介短路），保证「介绍书」和「聊书、聊人生」都由同一大模型生成
+    recent_messages = (await db.execute(
+        select(ChatMessageModel.role, ChatMessageModel.content).where(
+            ChatMessageModel.session_id == session_id
+        ).order_by(ChatMessageModel.created_at.desc()).limit(10)
+    )).all()
+    
+    # DeepSeek/OpenAI 只认 role: system|user|assistant|tool，数据库存的是 agent -> 转为 assistant
+    conversation_history = []
+    for role, content in reversed(recent_messages[:-1]):  # 排除刚保存的用户消息
+        role = "assistant" if role == "agent" else role
+        conversation_history.append({"role": role, "content": content})
+    
+    return {
+        "user_message": user_message,
+        "book_context": book_context,
+        "conversation_history": conversation_history,
+        "session_summary": session_summary,
+        "user_interests": user_interests,
+    }
+
+
+def _extract_and_save_facts(user_id: int, session_id: int, user_message: str):
+    """后台：规则抽取用户消息中的书名/作者，写入 interest_facts"""
+    try:
+        from app.db.database import SessionLocal
+        from sqlalchemy.sql import func
+        local_db = SessionLocal()
+        try:
+            facts = _extract_facts_from_message(user_message)
+            if facts:
+                expires = datetime.utcnow() + timedelta(days=90)
+                for ft, fv in facts:
+                    if not fv or len(fv) < 2:
+                        continue
+                    fv = fv.strip()[:100]
+                    existing = local_db.query(UserInterestFact).filter(
+                        UserInterestFact.user_id == user_id,
+                        UserInterestFact.fact_value == fv
+                    ).first()
+                    if existing:
+                        existing.last_mentioned_at = func.now()
+                        existing.source_session_id = session_id
+                    else:
+                        local_db.add(UserInterestFact(
+                            user_id=user_id,
+                            fact_type=ft,
+                            fact_value=fv,
+                            source_session_id=session_id,
+                            weight=1.0,
+                            expires_at=expires
+                        ))
+                local_db.commit()
+        finally:
+            local_db.close()
+    except Exception as e:
+        print(f"⚠️ 抽取兴趣事实失败: {e}")
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_agent(
     chat_data: ChatMessageRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """与 AI 书童对话（支持访客登录）"""
     try:
-        user_id = get_current_user_id(db, current_user)
-        
-        user_message = chat_data.message
-        session_id = chat_data.session_id
-        book_id = chat_data.book_id
-        
-        # 验证会话是否存在
-        session = db.query(ChatSessionModel).filter(
-            ChatSessionModel.id == session_id,
-            ChatSessionModel.user_id == user_id
-        ).first()
-        
-        if not session:
-            raise HTTPException(status_code=404, detail="会话不存在")
-        
-        # 保存用户消息
-        user_msg = ChatMessageModel(
-            session_id=session_id,
-            user_id=user_id,
-            book_id=book_id,
-            role="user",
-            content=user_message
-        )
-        db.add(user_msg)
-        
-        # 更新会话时间
-        from sqlalchemy.sql import func
-        session.updated_at = func.now()
-        
-        db.commit()
-        db.refresh(user_msg)
-        
-        # 获取书籍上下文（如果提供了 book_id）
-        book_context = ""
-        if book_id:
-            book = db.query(Book).filter(Book.id == book_id).first()
-            if book:
-                book_context = f"书名：{book.title}\n作者：{book.author}\n简介：{book.description or '暂无简介'}"
-
-        # 会话摘要与用户兴趣（记忆机制）
-        session_summary, user_interests = _get_session_summary_and_interests(db, session_id, user_id)
-        
-        # 所有对话统一走 DeepSeek（不再用简介短路），保证「介绍书」和「聊书、聊人生」都由同一大模型生成
-        recent_messages = db.query(ChatMessageModel).filter(
-            ChatMessageModel.session_id == session_id
-        ).order_by(ChatMessageModel.created_at.desc()).limit(10).all()
-        
-        # DeepSeek/OpenAI 只认 role: system|user|assistant|tool，数据库存的是 agent -> 转为 assistant
-        conversation_history = []
-        for msg in reversed(recent_messages[:-1]):  # 排除刚保存的用户消息
-            role = "assistant" if msg.role == "agent" else msg.role
-            conversation_history.append({"role": role, "content": msg.content})
+        user_id = await get_current_user_id_async(db, current_user)
+        context = await _prepare_chat_turn(db, user_id, chat_data)
         
         try:
-            response_text, used_fallback = await llm_service.generate_agent_response(
-                user_message=user_message,
-                book_context=book_context,
-                conversation_history=conversation_history,
-                session_summary=session_summary,
-                user_interests=user_interests
-            )
+            response_text, used_fallback = await llm_service.generate_agent_response(**context)
         except Exception as e:
             print(f"⚠️  LLM生成回复失败: {e}")
             response_text = "抱歉，我现在有点困惑，请稍后再试。"
@@ -522,52 +583,17 @@ async def chat_with_agent(
         
         # 保存AI回复
         agent_msg = ChatMessageModel(
-            session_id=session_id,
+            session_id=chat_data.session_id,
             user_id=user_id,
-            book_id=book_id,
+            book_id=chat_data.book_id,
             role="agent",
             content=response_text
         )
         db.add(agent_msg)
-        db.commit()
-        db.refresh(agent_msg)
+        await db.commit()
+        await db.refresh(agent_msg)
 
-        # 后台：规则抽取用户消息中的书名/作者，写入 interest_facts
-        def _extract_and_save():
-            try:
-                from app.db.database import SessionLocal
-                from sqlalchemy.sql import func
-                local_db = SessionLocal()
-                try:
-                    facts = _extract_facts_from_message(user_message)
-                    if facts:
-                        expires = datetime.utcnow() + timedelta(days=90)
-                        for ft, fv in facts:
-                            if not fv or len(fv) < 2:
-                                continue
-                            fv = fv.strip()[:100]
-                            existing = local_db.query(UserInterestFact).filter(
-                                UserInterestFact.user_id == user_id,
-                                UserInterestFact.fact_value == fv
-                            ).first()
-                            if existing:
-                                existing.last_mentioned_at = func.now()
-                                existing.source_session_id = session_id
-                            else:
-                                local_db.add(UserInterestFact(
-                                    user_id=user_id,
-                                    fact_type=ft,
-                                    fact_value=fv,
-                                    source_session_id=session_id,
-                                    weight=1.0,
-                                    expires_at=expires
-                                ))
-                        local_db.commit()
-                finally:
-                    local_db.close()
-            except Exception as e:
-                print(f"⚠️ 抽取兴趣事实失败: {e}")
-        background_tasks.add_task(_extract_and_save)
+        background_tasks.add_task(_extract_and_save_facts, user_id, chat_data.session_id, chat_data.message)
         
         return ChatResponse(
             response=response_text,
@@ -581,13 +607,89 @@ async def chat_with_agent(
         print(f"❌ 对话API错误: {e}")
         import traceback
         traceback.print_exc()
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"对话服务出错: {str(e)}"
         )
 
 
+def _sse(event: str, data: dict) -> str:
+    """格式化一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_with_agent_stream(
+    chat_data: ChatMessageRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[User] = Depends(get_current_user_optional)
+):
+    """
+    与 AI 书童对话（SSE 流式输出）。
+    事件：delta {"text"} 逐段回复；done {"message_id", "response", "agent_name", "used_fallback"} 回复已保存
+    """
+    try:
+        user_id = await get_current_user_id_async(db, current_user)
+        context = await _prepare_chat_turn(db, user_id, chat_data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ 流式对话API错误: {e}")
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"对话服务出错: {str(e)}")
+
+    async def event_stream():
+        parts: List[str] = []
+        used_fallback = False
+        message_id = None
+        try:
+            try:
+                async for delta, fallback in llm_service.generate_agent_response_stream(**context):
+                    used_fallback = used_fallback or fallback
+                    parts.append(delta)
+                    yield _sse("delta", {"text": delta})
+            except Exception as e:
+                print(f"⚠️  LLM流式生成回复失败: {e}")
+                if not parts:
+                    used_fallback = True
+                    parts.append("抱歉，我现在有点困惑，请稍后再试。")
+                    yield _sse("delta", {"text": parts[-1]})
+        finally:
+            # 流结束（包括客户端中途断开）时保存已生成的回复；响应期间请求级 db 会话可能已关闭，使用独立会话
+            response_text = "".join(parts).strip()
+            if response_text:
+                from app.db.database import AsyncSessionLocal
+                async with AsyncSessionLocal() as local_db:
+                    try:
+                        agent_msg = ChatMessageModel(
+                            session_id=chat_data.session_id,
+                            user_id=user_id,
+                            book_id=chat_data.book_id,
+                            role="agent",
+                            content=response_text
+                        )
+                        local_db.add(agent_msg)
+                        await local_db.commit()
+                        message_id = agent_msg.id
+                    except Exception as e:
+                        print(f"⚠️  保存流式回复失败: {e}")
+                        await local_db.rollback()
+        yield _sse("done", {
+            "message_id": message_id,
+            "response": response_text,
+            "agent_name": AGENT_NAME,
+            "used_fallback": used_fallback,
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(_extract_and_save_facts, user_id, chat_data.session_id, chat_data.message),
+    )
+
+
 def _message_to_response(msg) -> dict:
     """将 ChatMessage 转为 API 响应 dict，确保 created_at 为字符串"""
     created = msg.created_at
@@ -603,11 +705,18 @@ def _message_to_response(msg) -> dict:
 @router.get("/sessions/{session_id}/messages", response_model=List[ChatMessageResponse])
 async def get_session_messages(
     session_id: int,
-    limit: int = 50,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 的值"),
+    latest: bool = Query(False, description="True 时返回最近 limit 条，游标指向更早的消息"),
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
-    """获取会话的消息记录（支持访客登录）"""
+    """
+    获取会话的消息记录（支持访客登录），结果始终按时间升序。
+    默认从最早的消息向后翻页；latest=True 时从最新消息开始，用游标「加载更早的消息」。
+    消息 id 随写入递增，与 created_at 顺序一致，按 (session_id, id) 索引做键集分页。
+    """
     user_id = get_current_user_id(db, current_user)
     
     # 验证会话所有权
@@ -619,9 +728,20 @@ async def get_session_messages(
     if not session:
         raise HTTPException(status_code=404, detail="会话不存在")
     
-    messages = db.query(ChatMessageModel).filter(
-        ChatMessageModel.session_id == session_id
-    ).order_by(ChatMessageModel.created_at.asc(), ChatMessageModel.id.asc()).limit(limit).all()
+    position = decode_id_cursor(cursor)
+    older = latest if position is None else position.get("dir") == "older"
+    query = db.query(ChatMessageModel).filter(ChatMessageModel.session_id == session_id)
+    if older:
+        if position is not None:
+            query = query.filter(ChatMessageModel.id < position["id"])
+        messages = query.order_by(ChatMessageModel.id.desc()).limit(limit).all()
+        set_next_cursor(response, messages, limit, dir="older")
+        messages.reverse()
+    else:
+        if position is not None:
+            query = query.filter(ChatMessageModel.id > position["id"])
+        messages = query.order_by(ChatMessageModel.id.asc()).limit(limit).all()
+        set_next_cursor(response, messages, limit, dir="newer")
     
     return [ChatMessageResponse(**_message_to_response(m)) for m in messages]
 
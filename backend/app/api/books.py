@@ -1,13 +1,14 @@
 """
 书籍相关 API
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.db.models import Book
+from app.core.pagination import decode_id_cursor, set_next_cursor
 from pydantic import BaseModel
-from app.services.llm import LLMService
+from app.services.llm import LLMService, PRIORITY_CHAT
 import urllib.parse
 
 router = APIRouter()
@@ -31,7 +32,7 @@ class BookResponse(BaseModel):
 
 
 @router.get("/{book_id}", response_model=BookResponse)
-async def get_book(book_id: int, db: Session = Depends(get_db)):
+async def get_book(book_id: int, db: Session = Depends(get_read_db)):
     """获取书籍详情"""
     book = db.query(Book).filter(Book.id == book_id).first()
     if not book:
@@ -41,12 +42,21 @@ async def get_book(book_id: int, db: Session = Depends(get_db)):
 
 @router.get("/", response_model=List[BookResponse])
 async def list_books(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 的值，传入时忽略 skip"),
+    db: Session = Depends(get_read_db)
 ):
-    """获取书籍列表"""
-    books = db.query(Book).offset(skip).limit(limit).all()
+    """获取书籍列表（按 id 升序；翻页优先使用游标，skip 仅为兼容保留）"""
+    query = db.query(Book).order_by(Book.id.asc())
+    position = decode_id_cursor(cursor)
+    if position is not None:
+        query = query.filter(Book.id > position["id"])
+    elif skip:
+        query = query.offset(skip)
+    books = query.limit(limit).all()
+    set_next_cursor(response, books, limit)
     return books
 
 
@@ -95,7 +105,8 @@ async def generate_description(
         reply, used_fallback = await llm_service.chat_completion(
             messages=[{"role": "user", "content": prompt}],
             temperature=0.7,
-            max_tokens=200  # 减少 token 数，确保生成约120字
+            max_tokens=200,  # 减少 token 数，确保生成约120字
+            priority=PRIORITY_CHAT
         )
         
         description = reply.strip()
@@ -1,27 +1,29 @@
 """
 书架相关 API（支持访客登录版本）
 """
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Response
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from typing import List, Optional
 from pydantic import BaseModel
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.db.models import Bookshelf, Book, UserPreference, User
 from app.api.books import BookResponse
 from app.api.auth import get_current_user_optional
+from app.core.pagination import decode_id_cursor, set_next_cursor
+from app.services import book_stats
+from app.services.feed_cache import feed_cache
 
 router = APIRouter()
 
 
-def get_current_user_id(db: Session, current_user: Optional[User] = None) -> int:
+async def get_current_user_id(db: AsyncSession, current_user: Optional[User] = None) -> int:
     """获取当前用户ID，如果没有登录则使用匿名用户"""
-    if current_user:
-        return current_user.id
-    
     # 如果没有登录，使用匿名用户（向后兼容）
-    from app.api.agent import ensure_anonymous_user
-    anonymous_user = ensure_anonymous_user(db)
-    return anonymous_user.id if anonymous_user else 1
+    from app.api.agent import get_current_user_id_async
+    return await get_current_user_id_async(db, current_user)
 
 
 class BookshelfItem(BaseModel):
@@ -51,19 +53,31 @@ class NotInterestedRequest(BaseModel):
 
 @router.get("/", response_model=List[BookshelfItem])
 async def get_bookshelf(
+    response: Response,
     status: Optional[str] = None,
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=200, description="每页条数，不传返回全部"),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 的值"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
-    """获取用户书架（支持访客登录）"""
-    user_id = get_current_user_id(db, current_user)
+    """获取用户书架（支持访客登录；按加入顺序，传 limit 时按 id 键集分页）"""
+    user_id = await get_current_user_id(db, current_user)
     
-    query = db.query(Bookshelf).filter(Bookshelf.user_id == user_id)
+    # 书籍随书架项 JOIN 一并取出（多对一，单条语句），避免逐条懒加载
+    query = select(Bookshelf).options(joinedload(Bookshelf.book, innerjoin=True)).where(Bookshelf.user_id == user_id)
     
     if status:
-        query = query.filter(Bookshelf.status == status)
+        query = query.where(Bookshelf.status == status)
+    position = decode_id_cursor(cursor)
+    if position is not None:
+        query = query.where(Bookshelf.id > position["id"])
+    # 由 (user_id, status, id) / (user_id, id) 复合索引直接按序输出
+    query = query.order_by(Bookshelf.id.asc())
+    if limit:
+        query = query.limit(limit)
     
-    bookshelves = query.all()
+    bookshelves = (await db.execute(query)).scalars().all()
+    set_next_cursor(response, bookshelves, limit)
     
     result = []
     for bs in bookshelves:
@@ -93,28 +107,34 @@ def _refresh_reading_profile_task(user_id: int):
 async def add_to_bookshelf(
     request: AddToBookshelfRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """添加书籍到书架（支持访客登录）"""
-    user_id = get_current_user_id(db, current_user)
+    user_id = await get_current_user_id(db, current_user)
     
     # 检查书籍是否存在
-    book = db.query(Book).filter(Book.id == request.book_id).first()
+    book = await db.get(Book, request.book_id)
     if not book:
         raise HTTPException(status_code=404, detail="书籍不存在")
     
     # 检查是否已在书架中
-    existing = db.query(Bookshelf).filter(
-        Bookshelf.user_id == user_id,
-        Bookshelf.book_id == request.book_id
-    ).first()
+    existing = (await db.execute(
+        select(Bookshelf).where(
+            Bookshelf.user_id == user_id,
+            Bookshelf.book_id == request.book_id
+        )
+    )).scalars().first()
     
     if existing:
         # 更新状态
+        old_status = existing.status
         existing.status = request.status
-        db.commit()
-        db.refresh(existing)
+        await db.commit()
+        await db.refresh(existing)
+        await book_stats.record_shelf_change(db, book.id, old_status, existing.status)
+        if old_status != existing.status:
+            feed_cache.invalidate(user_id)
         background_tasks.add_task(_refresh_reading_profile_task, user_id)
         return {
             "id": existing.id,
@@ -130,8 +150,15 @@ async def add_to_bookshelf(
         status=request.status
     )
     db.add(bookshelf)
-    db.commit()
-    db.refresh(bookshelf)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 并发的重复添加请求已先插入（uq_bookshelves_user_book）
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="书籍已在书架中")
+    await db.refresh(bookshelf)
+    await book_stats.record_shelf_change(db, bookshelf.book_id, None, bookshelf.status)
+    feed_cache.invalidate(user_id)
 
     background_tasks.add_task(_refresh_reading_profile_task, user_id)
     
@@ -148,33 +175,41 @@ async def update_bookshelf(
     bookshelf_id: int,
     request: UpdateBookshelfRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """更新书架项（支持访客登录）"""
-    user_id = get_current_user_id(db, current_user)
+    user_id = await get_current_user_id(db, current_user)
     
-    bookshelf = db.query(Bookshelf).filter(
-        Bookshelf.id == bookshelf_id,
-        Bookshelf.user_id == user_id
-    ).first()
+    bookshelf = (await db.execute(
+        select(Bookshelf).options(joinedload(Bookshelf.book, innerjoin=True)).where(
+            Bookshelf.id == bookshelf_id,
+            Bookshelf.user_id == user_id
+        )
+    )).scalars().first()
     
     if not bookshelf:
         raise HTTPException(status_code=404, detail="书架项不存在")
     
+    old_status = bookshelf.status
     if request.status:
         bookshelf.status = request.status
     if request.notes is not None:
         bookshelf.notes = request.notes
     
-    db.commit()
-    db.refresh(bookshelf)
+    book = bookshelf.book
+    await db.commit()
+    await db.refresh(bookshelf, attribute_names=["status", "notes"])
+    await book_stats.record_shelf_change(db, bookshelf.book_id, old_status, bookshelf.status)
+    if old_status != bookshelf.status:
+        # 只改笔记不影响推荐，保留快照
+        feed_cache.invalidate(user_id)
 
     background_tasks.add_task(_refresh_reading_profile_task, user_id)
     
     return {
         "id": bookshelf.id,
-        "book": bookshelf.book,
+        "book": book,
         "status": bookshelf.status,
         "notes": bookshelf.notes
     }
@@ -184,22 +219,27 @@ async def update_bookshelf(
 async def remove_from_bookshelf(
     bookshelf_id: int,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """从书架移除书籍（支持访客登录）"""
-    user_id = get_current_user_id(db, current_user)
+    user_id = await get_current_user_id(db, current_user)
     
-    bookshelf = db.query(Bookshelf).filter(
-        Bookshelf.id == bookshelf_id,
-        Bookshelf.user_id == user_id
-    ).first()
+    bookshelf = (await db.execute(
+        select(Bookshelf).where(
+            Bookshelf.id == bookshelf_id,
+            Bookshelf.user_id == user_id
+        )
+    )).scalars().first()
     
     if not bookshelf:
         raise HTTPException(status_code=404, detail="书架项不存在")
     
-    db.delete(bookshelf)
-    db.commit()
+    book_id, old_status = bookshelf.book_id, bookshelf.status
+    await db.delete(bookshelf)
+    await db.commit()
+    await book_stats.record_shelf_change(db, book_id, old_status, None)
+    feed_cache.invalidate(user_id)
 
     background_tasks.add_task(_refresh_reading_profile_task, user_id)
     
@@ -209,11 +249,11 @@ async def remove_from_bookshelf(
 @router.post("/not-interested")
 async def mark_not_interested(
     request: NotInterestedRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """标记不感兴趣（用于推荐反馈，支持访客登录）"""
-    user_id = get_current_user_id(db, current_user)
+    user_id = await get_current_user_id(db, current_user)
     
     preference = UserPreference(
         user_id=user_id,
@@ -222,6 +262,8 @@ async def mark_not_interested(
         feedback_data={"reason": request.reason} if request.reason else {}
     )
     db.add(preference)
-    db.commit()
+    await db.commit()
+    await book_stats.record_not_interested(db, request.book_id)
+    feed_cache.invalidate(user_id)
     
     return {"message": "已记录您的偏好"}
@@ -2,19 +2,22 @@
 热门推荐 API - 个性化推荐（评分 + 热度 + 书架偏好）
 """
 import asyncio
-import math
 import random
-import time
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+import numpy as np
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Tuple, Optional, Set
 from pydantic import BaseModel
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.db.models import Book, UserPreference, Bookshelf, User
 from app.api.books import BookResponse
 from app.api.auth import get_current_user_optional
-from app.services.llm import LLMService
+from app.services.llm import LLMService, POPULAR_REASON_PROMPT_VERSION
+from app.services.reason_cache import ReasonCache
+from app.core.pagination import decode_cursor, encode_cursor
+from app.services.candidate_store import Candidate, candidate_store
+from app.services.feed_cache import feed_cache
 
 router = APIRouter()
 llm_service = LLMService()
@@ -31,89 +34,72 @@ def _get_vector_db():
     return _vector_db
 
 
-# 推荐语短期缓存
-_reason_cache: Dict[int, Tuple[str, float]] = {}
-_REASON_CACHE_TTL = 300.0
+# 打分后参与多样性重排与分页的候选数
+_MAX_POOL = 300
+# 除平均兴趣向量外，再以最近加入书架的几本书各自检索邻域（批量一次完成）
+_PER_BOOK_QUERY_LIMIT = 5
+# 下一页游标所在的响应头（需在 CORS expose_headers 中暴露）
+FEED_CURSOR_HEADER = "X-Feed-Cursor"
 
-
-def _get_cached_reason(book_id: int) -> Optional[str]:
-    if book_id not in _reason_cache:
-        return None
-    reason, ts = _reason_cache[book_id]
-    if time.time() - ts > _REASON_CACHE_TTL:
-        del _reason_cache[book_id]
-        return None
-    return reason
+# 推荐语两级缓存（内存 LRU + SQLite），按 prompt 版本与模型区分
+reason_cache = ReasonCache(POPULAR_REASON_PROMPT_VERSION, llm_service.model)
+# 正在后台刷新的书籍，避免同一本书被重复刷新
+_refreshing_ids: Set[int] = set()
+_background_tasks: Set[asyncio.Task] = set()
 
 
-def _set_cached_reason(book_id: int, reason: str) -> None:
-    _reason_cache[book_id] = (reason, time.time())
+def _book_payload(b: Book) -> Dict:
+    return {
+        "title": b.title or "",
+        "author": b.author or "",
+        "description": b.description or "",
+        "rating": float(b.rating) if b.rating is not None else None,
+    }
 
 
-async def _generate_reason_with_ai(
-    title: str,
-    author: str = "",
-    description: str = "",
-    rating: float = None,
-) -> str:
-    """使用 AI 根据书籍内容生成推荐语"""
+async def _generate_and_cache_reasons(books: List[Book]) -> Dict[int, str]:
+    """批量生成推荐语并写入缓存，返回 book_id -> 推荐语（生成失败的书籍不在结果中）"""
+    if not books:
+        return {}
     try:
-        book_info = f"书名：《{title}》"
-        if author:
-            book_info += f"\n作者：{author}"
-        if description:
-            book_info += f"\n简介：{description[:300]}"
-        if rating:
-            book_info += f"\n评分：{rating:.1f}分"
-        prompt = f"""请为以下书籍生成一段50-100字的推荐语，要求：
-1. 风格温暖、有感染力，能够引起读者的共鸣
-2. 突出书籍的核心价值和独特之处
-3. 语言优美、有诗意，但不过于华丽
-4. 能够激发读者的阅读兴趣
-5. 不要使用"这本书"、"这部作品"等词汇，直接描述内容
-
-书籍信息：
-{book_info}
-
-请直接输出推荐语，不要添加任何解释或前缀："""
-        messages = [
-            {"role": "system", "content": "你是一个专业的阅读推荐助手，擅长用温暖、有感染力的语言推荐书籍。"},
-            {"role": "user", "content": prompt}
-        ]
-        reason, _ = await llm_service.chat_completion(
-            messages=messages, temperature=0.8, max_tokens=200, timeout=8.0
-        )
-        reason = reason.strip()
-        if reason.startswith('"') and reason.endswith('"'):
-            reason = reason[1:-1]
-        if reason.startswith("'") and reason.endswith("'"):
-            reason = reason[1:-1]
-        if reason and len(reason) > 10:
-            return reason
-        if rating:
-            return f"《{title}》是一本值得一读的书籍。豆瓣{rating:.1f}分，不妨一试。"
-        elif author:
-            return f"《{title}》是{author}的代表作，值得细细品味。"
-        return f"《{title}》是一本值得一读的书籍，不妨一试。"
+        generated = await llm_service.generate_popular_reasons([_book_payload(b) for b in books])
     except Exception as e:
-        print(f"⚠️ AI生成推荐语失败: {e}")
-        if rating:
-            return f"《{title}》是一本值得一读的书籍。豆瓣{rating:.1f}分，不妨一试。"
-        elif author:
-            return f"《{title}》是{author}的代表作，值得细细品味。"
-        return f"《{title}》是一本值得一读的书籍，不妨一试。"
+        print(f"⚠️ 批量生成推荐语失败: {e}")
+        return {}
+    reasons = {b.id: r for b, r in zip(books, generated) if r}
+    reason_cache.set_many(reasons)
+    return reasons
 
 
-def _get_shelf_count_map(db: Session) -> Dict[int, int]:
-    """获取每本书被加入书架的次数（热度）"""
-    try:
-        rows = db.query(Bookshelf.book_id, func.count(Bookshelf.id).label("cnt")).group_by(Bookshelf.book_id).all()
-        return {int(bid): int(cnt) for bid, cnt in rows}
-    except Exception:
-        return {}
+def _schedule_refresh(books: List[Book]) -> None:
+    """后台刷新陈旧推荐语（stale-while-revalidate），本次请求直接返回旧值"""
+    books = [b for b in books if b.id not in _refreshing_ids]
+    if not books:
+        return
+    ids = {b.id for b in books}
+    _refreshing_ids.update(ids)
+
+    async def _run():
+        try:
+            await _generate_and_cache_reasons(books)
+        finally:
+            _refreshing_ids.difference_update(ids)
+
+    task = asyncio.create_task(_run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
 
-def _get_user_shelf_profile(db: Session, user_id: int) -> Tuple[List[int], Set[str], Set[str], Set[str]]:
+def _default_reason(title: str, author: str = "", rating: float = None) -> str:
+    """AI 推荐语不可用时的兜底文案"""
+    if rating:
+        return f"《{title}》是一本值得一读的书籍。豆瓣{rating:.1f}分，不妨一试。"
+    elif author:
+        return f"《{title}》是{author}的代表作，值得细细品味。"
+    return f"《{title}》是一本值得一读的书籍，不妨一试。"
+
+
+async def _get_user_shelf_profile(db: AsyncSession, user_id: int) -> Tuple[List[int], Set[str], Set[str], Set[str]]:
     """
     获取用户书架画像：想读+已读 book_ids、偏好作者、偏好类别、弃读作者
     返回: (shelf_book_ids, preferred_authors, preferred_categories, dropped_authors)
@@ -123,26 +109,27 @@ def _get_user_shelf_profile(db: Session, user_id: int) -> Tuple[List[int], Set[s
     preferred_categories = set()
     dropped_authors = set()
     try:
-        # 想读 + 已读
-        positive = db.query(Bookshelf).filter(
-            Bookshelf.user_id == user_id,
-            Bookshelf.status.in_(["to_read", "read"])
-        ).all()
-        for bs in positive:
-            shelf_ids.append(bs.book_id)
-            if bs.book:
-                if bs.book.author:
-                    preferred_authors.add(bs.book.author.strip())
-                if bs.book.category:
-                    preferred_categories.add(bs.book.category.strip())
-        # 弃读：记录作者以便惩罚
-        dropped = db.query(Bookshelf).filter(
-            Bookshelf.user_id == user_id,
-            Bookshelf.status == "dropped"
-        ).all()
-        for bs in dropped:
-            if bs.book and bs.book.author:
-                dropped_authors.add(bs.book.author.strip())
+        # 一条 JOIN 查询取出画像所需的列（不加载 ORM 对象，与书架大小无关地只执行一条语句）
+        rows = (await db.execute(
+            select(Bookshelf.book_id, Bookshelf.status, Book.author, Book.category)
+            .join(Book, Book.id == Bookshelf.book_id)
+            .where(
+                Bookshelf.user_id == user_id,
+                Bookshelf.status.in_(["to_read", "read", "dropped"])
+            ).order_by(Bookshelf.created_at.desc())
+        )).all()
+        for book_id, status, author, category in rows:
+            if status == "dropped":
+                # 弃读：记录作者以便惩罚
+                if author:
+                    dropped_authors.add(author.strip())
+                continue
+            # 想读 + 已读
+            shelf_ids.append(book_id)
+            if author:
+                preferred_authors.add(author.strip())
+            if category:
+                preferred_categories.add(category.strip())
     except Exception as e:
         print(f"⚠️ 获取书架画像失败: {e}")
     return shelf_ids, preferred_authors, preferred_categories, dropped_authors
@@ -152,28 +139,10 @@ def _average_embeddings(embeddings: List[List[float]]) -> Optional[List[float]]:
     """对多个向量求平均"""
     if not embeddings:
         return None
-    n = len(embeddings)
-    dim = len(embeddings[0])
-    avg = [0.0] * dim
-    for emb in embeddings:
-        for i, v in enumerate(emb):
-            avg[i] += v
-    return [x / n for x in avg]
-
-
-def _normalize_scores(values: List[float], use_log: bool = False) -> List[float]:
-    """Min-max 归一化到 [0, 1]"""
-    if not values:
-        return []
-    if use_log:
-        values = [math.log1p(max(0, v)) for v in values]
-    lo, hi = min(values), max(values)
-    if hi <= lo:
-        return [0.5] * len(values)
-    return [(v - lo) / (hi - lo) for v in values]
+    return np.mean(np.asarray(embeddings, dtype=np.float32), axis=0).tolist()
 
 
-def _apply_diversity(books: List[Book], target: int) -> List[Book]:
+def _apply_diversity(books: List[Candidate], target: int) -> List[Candidate]:
     """类别与作者多样性：尽量包含不同类别与作者，支持返回大量书籍用于分页"""
     if len(books) <= target:
         return books
@@ -208,174 +177,145 @@ class BookWithReason(BookResponse):
     reason: str = ""
 
 
+async def _build_feed(db: AsyncSession, user_id: int, columns, refresh: bool) -> List[int]:
+    """计算用户完整的推荐序列（最多 _MAX_POOL 本，已做多样性重排），结果存入 feed_cache 供分页"""
+    not_interested_ids: Set[int] = set()
+    try:
+        rows = (await db.execute(
+            select(UserPreference.book_id).where(
+                UserPreference.user_id == user_id,
+                UserPreference.preference_type == "not_interested"
+            )
+        )).scalars().all()
+        not_interested_ids = set(rows)
+    except Exception:
+        pass
+
+    shelf_ids, preferred_authors, preferred_categories, dropped_authors = await _get_user_shelf_profile(db, user_id)
+    has_shelf_data = len(shelf_ids) > 0
+
+    sim_map: Dict[int, float] = {}
+
+    if has_shelf_data:
+        try:
+            vdb = _get_vector_db()
+            id_to_emb = vdb.get_embeddings_by_ids([str(bid) for bid in shelf_ids])
+            embeddings = [id_to_emb[str(bid)] for bid in shelf_ids if str(bid) in id_to_emb]
+            avg_emb = _average_embeddings(embeddings) if embeddings else None
+            if not avg_emb:
+                from app.services.memory_service import get_user_interest_vector
+                avg_emb = await db.run_sync(get_user_interest_vector, user_id)
+            if avg_emb:
+                # 平均兴趣向量 + 最近加入书架的几本书各自的邻域，一次批量检索，按最小距离合并
+                recent_ids = [bid for bid in shelf_ids if str(bid) in id_to_emb][:_PER_BOOK_QUERY_LIMIT]
+                queries = [avg_emb] + [id_to_emb[str(bid)] for bid in recent_ids]
+                batches = await vdb.search_similar_batch(queries, top_k=150)
+                dist_map: Dict[int, float] = {}
+                for qi, similar in enumerate(batches):
+                    # 单书查询必然命中该书自身（距离 0），跳过以免书架上的书因此得到满分相似度
+                    self_id = recent_ids[qi - 1] if qi > 0 else None
+                    for s in similar:
+                        try:
+                            bid = int(s.get("book_id", 0))
+                            d = float(s.get("distance", 1))
+                        except (ValueError, TypeError):
+                            continue
+                        if bid == self_id:
+                            continue
+                        if bid not in dist_map or d < dist_map[bid]:
+                            dist_map[bid] = d
+                if dist_map:
+                    max_dist = max(d or 1 for d in dist_map.values()) or 1
+                    for bid, d in dist_map.items():
+                        sim_map[bid] = 1.0 - (d / max_dist) if max_dist > 0 else 1.0
+        except Exception as e:
+            print(f"⚠️ 向量检索失败: {e}")
+
+    # 全库列式打分（评分、book_stats 热度、作者/类别匹配、相似度均为数组运算）
+    top_rows = candidate_store.score(
+        columns,
+        _MAX_POOL,
+        excluded_ids=not_interested_ids,
+        sim_map=sim_map,
+        preferred_authors=preferred_authors,
+        preferred_categories=preferred_categories,
+        dropped_authors=dropped_authors,
+        personalized=has_shelf_data,
+    )
+    top_candidates = candidate_store.candidates(columns, top_rows)
+    if refresh:
+        random.shuffle(top_candidates)
+    selected = _apply_diversity(top_candidates, len(top_candidates))
+    return [c.id for c in selected]
+
+
 @router.get("/everyone-watching", response_model=List[BookWithReason])
 async def get_everyone_watching(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=50),
     refresh: bool = Query(False, description="重新推荐时传 True，增加随机性"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Feed-Cursor 的值，传入时忽略 skip"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
-    """推荐你看 - 个性化推荐（新用户：评分+热度；有书架：个性化+评分+热度，支持访客登录）"""
+    """
+    推荐你看 - 个性化推荐（新用户：评分+热度；有书架：个性化+评分+热度，支持访客登录）
+    首次请求计算整条推荐序列并缓存为用户快照，后续翻页直接切片；书架 / 不感兴趣 / 书目变化时快照失效。
+    下一页游标放在响应头 X-Feed-Cursor 中，已到末尾时为空。
+    """
+    response.headers[FEED_CURSOR_HEADER] = ""
     try:
-        from app.api.agent import get_current_user_id
-        user_id = get_current_user_id(db, current_user)
-
-        not_interested_ids: Set[int] = set()
-        try:
-            rows = db.query(UserPreference.book_id).filter(
-                UserPreference.user_id == user_id,
-                UserPreference.preference_type == "not_interested"
-            ).all()
-            not_interested_ids = {r[0] for r in rows}
-        except Exception:
-            pass
-
-        shelf_count_map = _get_shelf_count_map(db)
-        shelf_ids, preferred_authors, preferred_categories, dropped_authors = _get_user_shelf_profile(db, user_id)
-        has_shelf_data = len(shelf_ids) > 0
-
-        pool_size = 500
-        personalized_ids: Set[int] = set()
-        sim_map: Dict[int, float] = {}
-
-        if has_shelf_data:
+        from app.api.agent import get_current_user_id_async
+        user_id = await get_current_user_id_async(db, current_user)
+
+        columns = await candidate_store.ensure_fresh(db)
+        snapshot = None if refresh else feed_cache.get(user_id, columns.signature)
+        if snapshot is None:
+            snapshot = feed_cache.put(user_id, await _build_feed(db, user_id, columns, refresh), columns.signature)
+
+        # 分页：游标优先，其次 skip=0,20,40,... 直至池耗尽。
+        # 游标所属快照已失效时仍按其偏移量从新快照继续，避免无限滚动跳回开头
+        position = decode_cursor(cursor)
+        start = skip
+        if position is not None:
             try:
-                vdb = _get_vector_db()
-                id_to_emb = vdb.get_embeddings_by_ids([str(bid) for bid in shelf_ids])
-                embeddings = [id_to_emb[str(bid)] for bid in shelf_ids if str(bid) in id_to_emb]
-                avg_emb = _average_embeddings(embeddings) if embeddings else None
-                if not avg_emb:
-                    from app.services.memory_service import get_user_interest_vector
-                    avg_emb = get_user_interest_vector(db, user_id)
-                if avg_emb:
-                    similar = await vdb.search_similar(avg_emb, top_k=150)
-                    if similar:
-                        max_dist = max((s.get("distance") or 1) for s in similar) or 1
-                        for s in similar:
-                            try:
-                                bid = int(s.get("book_id", 0))
-                                personalized_ids.add(bid)
-                                d = float(s.get("distance", 1))
-                                sim_map[bid] = 1.0 - (d / max_dist) if max_dist > 0 else 1.0
-                            except (ValueError, TypeError):
-                                pass
-            except Exception as e:
-                print(f"⚠️ 向量检索失败: {e}")
-
-        # 候选池：个性化结果 + 按评分排序的书籍
-        base_query = db.query(Book)
-        if not_interested_ids:
-            base_query = base_query.filter(Book.id.notin_(list(not_interested_ids)))
-        other_books = base_query.order_by(func.coalesce(Book.rating, 0).desc(), Book.id.desc()).limit(pool_size).all()
-        id_to_book = {b.id: b for b in other_books if b.id not in not_interested_ids}
-        if personalized_ids:
-            extra = db.query(Book).filter(Book.id.in_(list(personalized_ids))).all()
-            for b in extra:
-                if b.id not in not_interested_ids:
-                    id_to_book[b.id] = b
-        all_books = list(id_to_book.values())
-
-        if not all_books:
+                start = max(int(position.get("offset", 0)), 0)
+            except (TypeError, ValueError):
+                start = skip
+        start = min(start, len(snapshot.book_ids))
+        page_ids = snapshot.book_ids[start : start + limit]
+        next_offset = start + len(page_ids)
+        if next_offset < len(snapshot.book_ids):
+            response.headers[FEED_CURSOR_HEADER] = encode_cursor({"feed": snapshot.feed_id, "offset": next_offset})
+        if not page_ids:
             return []
-
-        # 评分与热度归一化
-        ratings = [float(b.rating or 0) / 10.0 for b in all_books]
-        pops = [shelf_count_map.get(b.id, 0) for b in all_books]
-        norm_ratings = _normalize_scores(ratings)
-        norm_pops = _normalize_scores(pops, use_log=True)
-        rating_map = {b.id: norm_ratings[i] for i, b in enumerate(all_books)}
-        pop_map = {b.id: norm_pops[i] for i, b in enumerate(all_books)}
-
-        scored_books: List[Tuple[Book, float]] = []
-
-        if has_shelf_data:
-            for b in all_books:
-                bid = b.id
-                r = rating_map.get(bid, 0)
-                p = pop_map.get(bid, 0)
-                sim = sim_map.get(bid, 0)
-
-                author = (b.author or "").strip()
-                cat = (b.category or "").strip()
-                author_match = 0.3 if author and author in preferred_authors else 0
-                cat_match = 0.2 if cat and cat in preferred_categories else 0
-                dropped_penalty = 0.4 if author and author in dropped_authors else 0
-                personal = sim * 0.5 + author_match + cat_match - dropped_penalty
-                personal = max(0, min(1, personal))
-
-                final = 0.5 * personal + 0.3 * r + 0.2 * p
-                scored_books.append((b, final))
-        else:
-            # 新用户：评分 + 热度
-            for b in all_books:
-                r = rating_map.get(b.id, 0)
-                p = pop_map.get(b.id, 0)
-                final = 0.6 * r + 0.4 * p
-                scored_books.append((b, final))
-
-        scored_books.sort(key=lambda x: -x[1])
-        # 扩大候选池以支持分页（各分类下滚动加载更多）
-        max_pool = min(300, len(scored_books))
-        top_candidates = [b for b, _ in scored_books[:max_pool]]
-        if refresh:
-            random.shuffle(top_candidates)
-        selected = _apply_diversity(top_candidates, max_pool)
-        # 分页：支持 skip=0,20,40,... 直至池耗尽
-        start = min(skip, len(selected))
-        books = selected[start : start + limit]
+        # 只为当前页加载完整书籍信息
+        id_to_book = {
+            b.id: b for b in (await db.execute(select(Book).where(Book.id.in_(page_ids)))).scalars().all()
+        }
+        books = [id_to_book[bid] for bid in page_ids if bid in id_to_book]
 
         if not books:
             return []
 
-        cache_hits = {}
-        to_generate = []
-        for book in books:
-            cached = _get_cached_reason(book.id)
-            if cached is not None:
-                cache_hits[book.id] = cached
-            else:
-                to_generate.append(book)
+        cached = reason_cache.get_many([b.id for b in books])
+        reason_by_id = {bid: reason for bid, (reason, _) in cached.items()}
+        stale_books = [b for b in books if b.id in cached and cached[b.id][1]]
+        to_generate = [b for b in books if b.id not in cached]
+        if stale_books:
+            _schedule_refresh(stale_books)
 
-        async def gen_one(b):
-            try:
-                r = await _generate_reason_with_ai(
-                    title=b.title or "",
-                    author=b.author or "",
-                    description=b.description or "",
-                    rating=float(b.rating) if b.rating is not None else None,
-                )
-                _set_cached_reason(b.id, r)
-                return b.id, r
-            except Exception as e:
-                print(f"⚠️ 书籍 {b.id} 推荐语生成失败: {e}")
-                rating_val = float(b.rating) if b.rating is not None else None
-                if rating_val:
-                    default = f"《{b.title or ''}》是一本值得一读的书籍。豆瓣{rating_val:.1f}分，不妨一试。"
-                elif b.author:
-                    default = f"《{b.title or ''}》是{b.author}的代表作，值得细细品味。"
-                else:
-                    default = f"《{b.title or ''}》是一本值得一读的书籍，不妨一试。"
-                return b.id, default
-
-        generated = await asyncio.gather(*[gen_one(b) for b in to_generate])
-        reason_by_id = dict(cache_hits)
-        for bid, r in generated:
-            reason_by_id[bid] = r
+        # 未命中缓存的书籍一次批量生成推荐语（按 prompt 长度自动拆批）
+        reason_by_id.update(await _generate_and_cache_reasons(to_generate))
 
         result = []
         for book in books:
             try:
+                rating_val = float(book.rating) if book.rating is not None else None
                 reason = reason_by_id.get(book.id)
                 if reason is None:
-                    rating_val = float(book.rating) if book.rating is not None else None
-                    if rating_val:
-                        reason = f"《{book.title or ''}》是一本值得一读的书籍。豆瓣{rating_val:.1f}分，不妨一试。"
-                    elif book.author:
-                        reason = f"《{book.title or ''}》是{book.author}的代表作，值得细细品味。"
-                    else:
-                        reason = f"《{book.title or ''}》是一本值得一读的书籍，不妨一试。"
-                rating_val = float(book.rating) if book.rating is not None else None
+                    reason = _default_reason(book.title or "", book.author or "", rating_val)
                 book_dict = {
                     "id": book.id,
                     "isbn": book.isbn,
@@ -1,14 +1,20 @@
 """
 推荐相关 API
 """
+import asyncio
+import json
 import random
+import time
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional, Dict
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Dict, Tuple
 from pydantic import BaseModel
-from app.db.database import get_db
+from app.db.database import get_async_read_db
 from app.db.models import Book, User, UserPreference
 # 已移除认证相关导入
+from app.core.metrics import LatencyStats
 from app.services.llm import LLMService
 from app.services.embedding import EmbeddingService
 from app.services.vector_db import VectorDBService
@@ -29,6 +35,54 @@ def get_vector_db_service():
 
 book_data_service = BookDataService()
 
+# 语义推荐各阶段耗时（/api/metrics 展示）
+_stage_stats: Dict[str, LatencyStats] = {
+    name: LatencyStats()
+    for name in ("intent", "speculative_search", "expanded_search", "rerank", "generation", "total")
+}
+_pipeline_counts = {"speculative_only": 0, "expanded": 0}
+
+
+def get_pipeline_metrics() -> Dict[str, object]:
+    """语义推荐流水线各阶段耗时、是否需要二次检索的次数与投机检索结果的复用率"""
+    decided = _pipeline_counts["speculative_only"] + _pipeline_counts["expanded"]
+    return {
+        "stages": {name: stats.snapshot() for name, stats in _stage_stats.items()},
+        **_pipeline_counts,
+        "speculative_reuse_rate": round(_pipeline_counts["speculative_only"] / decided, 4) if decided else 0.0,
+    }
+
+
+async def _timed_search(stage: str, query: str, top_k: int = 100) -> List[Dict]:
+    """生成查询向量并检索相似书籍（带超时），耗时记入对应阶段"""
+    started = time.perf_counter()
+    try:
+        query_embedding = await asyncio.wait_for(
+            embedding_service.get_query_embedding(query),
+            timeout=90.0
+        )
+        return await asyncio.wait_for(
+            get_vector_db_service().search_similar(
+                query_embedding=query_embedding,
+                top_k=top_k
+            ),
+            timeout=5.0
+        )
+    finally:
+        _stage_stats[stage].record(time.perf_counter() - started)
+
+
+def _merge_search_results(primary: List[Dict], secondary: List[Dict]) -> List[Dict]:
+    """合并两次检索结果：同一本书取较小距离，按距离升序排列"""
+    best: Dict[str, Dict] = {}
+    for b in list(primary) + list(secondary):
+        bid = str(b.get("book_id", ""))
+        if not bid:
+            continue
+        if bid not in best or float(b.get("distance", 1)) < float(best[bid].get("distance", 1)):
+            best[bid] = b
+    return sorted(best.values(), key=lambda b: float(b.get("distance", 1)))
+
 
 # 类型/关键词同义词：用户说「推理小说」时，匹配简介中含「悬疑」「侦探」或英文 mystery/detective 等的书籍
 # 书库来自 Open Library，简介多为英文，故推理类同时保留中英文匹配词
@@ -58,8 +112,24 @@ def _build_search_query(user_input: str, keywords: List[str], book_types: List[s
     return " ".join(parts)
 
 
-def _get_books_by_genre_keywords(
-    db: Session,
+def _adds_new_terms(user_input: str, keywords: List[str], book_types: List[str]) -> bool:
+    """
+    意图提取是否给检索带来了新词：关键词 / 类型不全是原始输入的子串，或扩展查询会追加原文中没有的同义词。
+    不带来新词时扩展查询与原始输入语义相同，直接复用投机检索结果
+    """
+    text = user_input.strip().lower()
+    terms = [t.strip() for t in list(keywords) + list(book_types) if t and isinstance(t, str) and t.strip()]
+    if any(t.lower() not in text for t in terms):
+        return True
+    return any(
+        s.lower() not in text
+        for bt in book_types if bt in GENRE_SYNONYMS
+        for s in GENRE_SYNONYMS[bt]
+    )
+
+
+async def _get_books_by_genre_keywords(
+    db: AsyncSession,
     keywords: List[str],
     book_types: List[str],
     not_interested_ids: set,
@@ -85,22 +155,22 @@ def _get_books_by_genre_keywords(
         conditions.append(Book.title.ilike(f"%{t}%"))
         conditions.append(Book.description.ilike(f"%{t}%"))
     combined = or_(*conditions)
-    books = db.query(Book).filter(combined).limit(limit * 2).all()  # 多取一些再去重
+    books = (await db.execute(select(Book.id).where(combined).limit(limit * 2))).scalars().all()  # 多取一些再去重
     seen = set()
     result = []
-    for b in books:
-        if b.id in not_interested_ids or b.id in seen:
+    for book_id in books:
+        if book_id in not_interested_ids or book_id in seen:
             continue
-        seen.add(b.id)
-        result.append({"book_id": str(b.id), "distance": 0.0})  # 类型命中给最高优先级
+        seen.add(book_id)
+        result.append({"book_id": str(book_id), "distance": 0.0})  # 类型命中给最高优先级
         if len(result) >= limit:
             break
     return result
 
 
-def _rerank_by_keyword_match(
+async def _rerank_by_keyword_match(
     similar_books: List[Dict],
-    db: Session,
+    db: AsyncSession,
     keywords: List[str],
     book_types: List[str],
 ) -> List[Dict]:
@@ -132,12 +202,12 @@ def _rerank_by_keyword_match(
     if not book_ids:
         return similar_books
 
-    books = db.query(Book).filter(Book.id.in_(book_ids)).all()
+    rows = (await db.execute(
+        select(Book.id, Book.title, Book.description).where(Book.id.in_(book_ids))
+    )).all()
     id_to_text = {}
-    for b in books:
-        title = (b.title or "")
-        desc = (b.description or "") or ""
-        id_to_text[b.id] = (title + " " + desc).lower()  # 小写便于匹配英文 Mystery/detective
+    for book_id, title, desc in rows:
+        id_to_text[book_id] = ((title or "") + " " + (desc or "")).lower()  # 小写便于匹配英文 Mystery/detective
 
     def score(book_id: int) -> int:
         text = id_to_text.get(book_id, "")
@@ -161,7 +231,7 @@ def _extract_random_sentence(text: str) -> str:
     return ""
 
 
-def _select_diverse_books(similar_books: List[Dict], db: Session, target_count: int = 20) -> List[Dict]:
+async def _select_diverse_books(similar_books: List[Dict], db: AsyncSession, target_count: int = 20) -> List[Dict]:
     """从相似书籍中选择多样化的书籍集合
     
     多样性策略：
@@ -190,7 +260,7 @@ def _select_diverse_books(similar_books: List[Dict], db: Session, target_count:
         
         # 批量查询书籍信息，提高效率
         if book_ids:
-            books = db.query(Book).filter(Book.id.in_(book_ids)).all()
+            books = (await db.execute(select(Book).where(Book.id.in_(book_ids)))).scalars().all()
             for book in books:
                 books_info[book.id] = {
                     "author": book.author or "未知",
@@ -336,38 +406,134 @@ class RecommendationResponse(BaseModel):
     agent_name: str = "苏童童"  # AI书童名称
 
 
-@router.post("/semantic", response_model=RecommendationResponse)
-async def semantic_recommendation(
-    request: RecommendationRequest,
-    db: Session = Depends(get_db)
-):
-    """语义推荐引擎"""
-    import asyncio
+def _book_payload(book: Book) -> Dict:
+    return {
+        "title": book.title,
+        "author": book.author or "未知作者",
+        "description": book.description or "暂无简介",
+    }
+
+
+def _to_recommendation_item(book: Book, recommendation_text: str) -> RecommendationItem:
+    # 随机高亮推荐语中的一句话
+    highlighted_sentence = _extract_random_sentence(recommendation_text) if recommendation_text else ""
+    return RecommendationItem(
+        book_id=book.id,
+        title=book.title,
+        author=book.author or "未知作者",
+        cover_url=book.cover_url or "",
+        rating=book.rating or 0.0,
+        recommendation_text=recommendation_text,
+        highlighted_words=[highlighted_sentence] if highlighted_sentence else []
+    )
+
+
+async def _build_recommendation_items(user_input: str, books: List[Book]) -> List[RecommendationItem]:
+    """批量生成推荐语并组装推荐项：一次结构化调用覆盖多本书，缺失条目由 LLMService 回退模板"""
+    if not books:
+        return []
+    try:
+        texts = await llm_service.generate_recommendation_texts(user_input, [_book_payload(b) for b in books])
+    except Exception as e:
+        print(f"⚠️  批量生成推荐语失败: {e}")
+        texts = [f"《{b.title}》或许符合你的需求：{user_input[:30]}" for b in books]
+    return [_to_recommendation_item(book, text) for book, text in zip(books, texts)]
+
+
+async def _stream_recommendation_texts(user_input: str, books: List[Book]):
+    """按小批并发生成推荐语，每批完成即产出 (书籍, 推荐语)；异常时为未产出的书补上兜底文案"""
+    pending = {i: b for i, b in enumerate(books)}
+    try:
+        async for i, text in llm_service.generate_recommendation_texts_stream(
+            user_input, [_book_payload(b) for b in books]
+        ):
+            book = pending.pop(i, None)
+            if book is not None:
+                yield book, text
+    except Exception as e:
+        print(f"⚠️  流式生成推荐语失败: {e}")
+    for book in pending.values():
+        yield book, f"《{book.title}》或许符合你的需求：{user_input[:30]}"
+
+
+async def _agent_suggestion_response(db: AsyncSession) -> RecommendationResponse:
+    """未能推荐时引导用户去和 AI 书童聊聊（带上匿名用户设置的书童名称）"""
+    agent_name = "苏童童"
+    try:
+        anonymous_agent_name = (await db.execute(select(User.agent_name).where(User.id == 1))).scalar()
+        if anonymous_agent_name:
+            agent_name = anonymous_agent_name
+    except Exception as user_error:
+        print(f"⚠️  获取用户书童名称失败: {user_error}")
+        # 如果获取失败，使用默认名称
+    return RecommendationResponse(
+        recommendations=[],
+        message=f"好像还没读懂你的心哦，不妨试试和{agent_name}仔细聊聊。",
+        show_agent_suggestion=True,
+        agent_name=agent_name
+    )
+
+
+async def _pick_diverse_popular_books(db: AsyncSession, not_interested_ids: set, k: int, pool: int) -> List[Book]:
+    """从高评分书籍中按多样性挑选 k 本，不够时随机补充"""
+    # 大幅增加候选池，并使用多样性算法
+    all_popular_books = (await db.execute(
+        select(Book).where(
+            Book.rating.isnot(None),
+            Book.rating > 0
+        ).order_by(Book.rating.desc()).limit(pool)
+    )).scalars().all()
+    all_popular_books = [b for b in all_popular_books if b.id not in not_interested_ids]
+    
+    # 转换为similar_books格式以便使用多样性算法
+    popular_books_dict = [
+        {"book_id": str(b.id), "distance": 1.0 - (b.rating or 0) / 10.0}
+        for b in all_popular_books
+    ]
+    
+    # 使用多样性算法选择
+    diverse_popular = await _select_diverse_books(popular_books_dict, db, target_count=k * 2)
+    popular_book_ids = [int(b["book_id"]) for b in diverse_popular[:k]]
+    popular_books = [b for b in all_popular_books if b.id in popular_book_ids]
     
+    if len(popular_books) < k:
+        # 如果多样性选择不够，随机补充
+        remaining_ids = set(popular_book_ids)
+        additional = [b for b in all_popular_books if b.id not in remaining_ids]
+        if additional:
+            needed = k - len(popular_books)
+            popular_books.extend(random.sample(additional, min(needed, len(additional))))
+    return popular_books
+
+
+async def _plan_recommendations(user_input: str, db: AsyncSession) -> Tuple[List[Book], RecommendationResponse]:
+    """
+    语义推荐的检索与选书阶段（不含推荐语生成）。
+    返回 (最终推荐的书籍, 响应骨架)：响应的 message / show_agent_suggestion 已确定，recommendations 待填充。
+    """
+    speculative_task = None
     try:
-        user_input = request.query
-        
-        if not user_input or not user_input.strip():
-            raise HTTPException(status_code=400, detail="查询内容不能为空")
-        
-        print(f"📚 收到语义推荐请求: {user_input[:50]}...")
+        # 投机检索：意图提取（LLM）进行的同时，先用原始输入生成向量并检索，两次远程调用并行
+        raw_query = user_input.strip()
+        speculative_task = asyncio.create_task(_timed_search("speculative_search", raw_query))
         
         # 获取当前用户标记为「不感兴趣」的书籍 ID，后续推荐中排除
         not_interested_ids = set()
         try:
-            rows = db.query(UserPreference.book_id).filter(
-                UserPreference.user_id == 1,
-                UserPreference.preference_type == "not_interested"
-            ).all()
-            not_interested_ids = {r[0] for r in rows}
+            rows = (await db.execute(
+                select(UserPreference.book_id).where(
+                    UserPreference.user_id == 1,
+                    UserPreference.preference_type == "not_interested"
+                )
+            )).scalars().all()
+            not_interested_ids = set(rows)
         except Exception:
             pass
         
-        recommendations = []
-        
         # Step 1: 意图识别 - 提取关键词、情绪因子、书籍类型（带超时）
         keywords = []
         book_types = []
+        intent_started = time.perf_counter()
         try:
             intent_data = await asyncio.wait_for(
                 llm_service.extract_keywords(user_input),
@@ -381,34 +547,38 @@ async def semantic_recommendation(
         except Exception as e:
             print(f"⚠️  关键词提取失败: {e}")
             keywords = user_input.split()[:5]
+        _stage_stats["intent"].record(time.perf_counter() - intent_started)
         
         # Step 2: 向量检索（带超时）
         similar_books = []
         try:
-            # 用「用户输入 + 关键词 + 书籍类型」构建扩展查询，使向量更贴近「类型/主题」而非仅口语描述
-            search_query = _build_search_query(user_input, keywords, book_types)
-            query_embedding = await asyncio.wait_for(
-                embedding_service.get_embedding(search_query),
-                timeout=90.0
-            )
+            try:
+                raw_similar = await speculative_task
+            except Exception as e:
+                # 投机检索失败（含超时）不影响扩展查询检索
+                print(f"⚠️  原始输入向量检索失败: {e!r}")
+                raw_similar = []
+            # 用「用户输入 + 关键词 + 书籍类型」构建扩展查询，使向量更贴近「类型/主题」而非仅口语描述；
+            # 意图提取没有带来新词（关键词都是原文子串、也没有追加同义词）时直接复用投机检索结果
+            if _adds_new_terms(user_input, keywords, book_types):
+                _pipeline_counts["expanded"] += 1
+                expanded = await _timed_search("expanded_search", _build_search_query(user_input, keywords, book_types))
+                raw_similar = _merge_search_results(expanded, raw_similar)
+            else:
+                _pipeline_counts["speculative_only"] += 1
             
-            raw_similar = await asyncio.wait_for(
-                get_vector_db_service().search_similar(
-                    query_embedding=query_embedding,
-                    top_k=100
-                ),
-                timeout=5.0
-            )
+            rerank_started = time.perf_counter()
             similar_books = [b for b in raw_similar if int(b.get("book_id", 0)) not in not_interested_ids]
             # 类型兜底：用户明确要某类（如推理）时，用关键词从 DB 再拉一批候选，避免向量未命中时完全推荐不到
             if keywords or book_types:
-                genre_books = _get_books_by_genre_keywords(db, keywords, book_types, not_interested_ids, limit=30)
+                genre_books = await _get_books_by_genre_keywords(db, keywords, book_types, not_interested_ids, limit=30)
                 if genre_books:
                     genre_ids = {int(b["book_id"]) for b in genre_books}
                     vector_only = [b for b in similar_books if int(b.get("book_id", 0)) not in genre_ids]
                     similar_books = genre_books + vector_only
             # 按书名、简介中的关键词/类型匹配重排序，确保「推理小说」等请求优先得到推理类书籍
-            similar_books = _rerank_by_keyword_match(similar_books, db, keywords, book_types)
+            similar_books = await _rerank_by_keyword_match(similar_books, db, keywords, book_types)
+            _stage_stats["rerank"].record(time.perf_counter() - rerank_started)
         except asyncio.TimeoutError:
             print("⚠️  向量检索超时，使用热门书籍作为备选")
             similar_books = []
@@ -421,298 +591,151 @@ async def semantic_recommendation(
         
         if not similar_books:
             # 如果未匹配到，返回热门书籍作为备选（5～8 本，增加推荐数量）
-            # 大幅增加候选池，并确保多样性
-            k_fallback = random.randint(5, 8)
             # 获取更多热门书籍（100本），然后使用多样性算法选择
-            all_popular_books = db.query(Book).filter(
-                Book.rating.isnot(None),
-                Book.rating > 0
-            ).order_by(Book.rating.desc()).limit(100).all()
-            all_popular_books = [b for b in all_popular_books if b.id not in not_interested_ids]
-            
-            # 转换为similar_books格式以便使用多样性算法
-            popular_books_dict = [
-                {"book_id": str(b.id), "distance": 1.0 - (b.rating or 0) / 10.0}
-                for b in all_popular_books
-            ]
-            
-            # 使用多样性算法选择
-            diverse_popular = _select_diverse_books(popular_books_dict, db, target_count=k_fallback * 2)
-            popular_book_ids = [int(b["book_id"]) for b in diverse_popular[:k_fallback]]
-            popular_books = [b for b in all_popular_books if b.id in popular_book_ids]
-            
-            if len(popular_books) < k_fallback:
-                # 如果多样性选择不够，随机补充
-                remaining_ids = set(popular_book_ids)
-                additional = [b for b in all_popular_books if b.id not in remaining_ids]
-                if additional:
-                    needed = k_fallback - len(popular_books)
-                    popular_books.extend(random.sample(additional, min(needed, len(additional))))
+            k_fallback = random.randint(5, 8)
+            popular_books = await _pick_diverse_popular_books(db, not_interested_ids, k_fallback, pool=100)
             if not popular_books:
-                # 获取匿名用户的AI书童名称
-                agent_name = "苏童童"
-                try:
-                    anonymous_user = db.query(User).filter(User.id == 1).first()
-                    if anonymous_user and anonymous_user.agent_name:
-                        agent_name = anonymous_user.agent_name
-                except Exception:
-                    pass  # 如果获取失败，使用默认名称
-                
-                return RecommendationResponse(
-                    recommendations=[],
-                    message=f"好像还没读懂你的心哦，不妨试试和{agent_name}仔细聊聊。",
-                    show_agent_suggestion=True,
-                    agent_name=agent_name
-                )
-            
-            # 并行为热门书籍生成推荐语（提升速度）
-            async def generate_for_popular_book(book):
-                try:
-                    try:
-                        recommendation_text = await asyncio.wait_for(
-                            llm_service.generate_recommendation_text(
-                                user_input=user_input,
-                                book_title=book.title,
-                                book_author=book.author or "未知作者",
-                                book_description=book.description or "暂无简介"
-                            ),
-                            timeout=8.0  # 增加到8秒，给LLM更多响应时间
-                        )
-                    except asyncio.TimeoutError:
-                        print(f"⚠️  为热门书籍 {book.id} 生成推荐语超时，使用默认推荐语")
-                        recommendation_text = f"《{book.title}》或许符合你的需求：{user_input[:30]}"
-                    except Exception as e:
-                        print(f"⚠️  为热门书籍 {book.id} 生成推荐语失败: {e}")
-                        recommendation_text = f"《{book.title}》或许符合你的需求：{user_input[:30]}"
-                    
-                    # 随机高亮推荐语中的一句话
-                    highlighted_sentence = _extract_random_sentence(recommendation_text)
-                    
-                    return RecommendationItem(
-                        book_id=book.id,
-                        title=book.title,
-                        author=book.author or "未知作者",
-                        cover_url=book.cover_url or "",
-                        rating=book.rating or 0.0,
-                        recommendation_text=recommendation_text,
-                        highlighted_words=[highlighted_sentence] if highlighted_sentence else []
-                    )
-                except Exception as e:
-                    print(f"⚠️  为书籍 {book.id} 生成推荐语失败: {e}")
-                    return RecommendationItem(
-                        book_id=book.id,
-                        title=book.title,
-                        author=book.author or "未知作者",
-                        cover_url=book.cover_url or "",
-                        rating=book.rating or 0.0,
-                        recommendation_text=f"这本书可能符合你的需求：{book.title}",
-                        highlighted_words=[]
-                    )
-            
-            tasks = [generate_for_popular_book(book) for book in popular_books]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            for result in results:
-                if result and isinstance(result, RecommendationItem):
-                    recommendations.append(result)
-            
-            return RecommendationResponse(
-                recommendations=recommendations[:k_fallback],
+                return [], await _agent_suggestion_response(db)
+            return popular_books[:k_fallback], RecommendationResponse(
+                recommendations=[],
                 message="虽然没找到完全匹配的，但这些热门书籍也许适合你：",
                 show_agent_suggestion=False,
                 agent_name="苏童童"
             )
         
-        # Step 3: 并行为每个匹配的书籍生成推荐语（提升速度）
-        async def generate_recommendation_for_book(similar_book):
-            """为单本书生成推荐语"""
-            try:
-                book_id = int(similar_book["book_id"])
-                book = db.query(Book).filter(Book.id == book_id).first()
-                
-                if not book:
-                    return None
-                
-                # 生成推荐语（带超时，增加到8秒，给LLM更多时间）
-                try:
-                    recommendation_text = await asyncio.wait_for(
-                        llm_service.generate_recommendation_text(
-                            user_input=user_input,
-                            book_title=book.title,
-                            book_author=book.author or "未知作者",
-                            book_description=book.description or "暂无简介"
-                        ),
-                        timeout=8.0  # 增加到8秒，给LLM更多响应时间
-                    )
-                except asyncio.TimeoutError:
-                    print(f"⚠️  为书籍 {book_id} 生成推荐语超时，使用默认推荐语")
-                    recommendation_text = f"《{book.title}》或许符合你的需求：{user_input[:30]}"
-                except Exception as e:
-                    print(f"⚠️  为书籍 {book_id} 生成推荐语失败: {e}")
-                    recommendation_text = f"《{book.title}》或许符合你的需求：{user_input[:30]}"
-                
-                # 随机高亮推荐语中的一句话
-                highlighted_sentence = _extract_random_sentence(recommendation_text)
-                
-                return RecommendationItem(
-                    book_id=book.id,
-                    title=book.title,
-                    author=book.author or "未知作者",
-                    cover_url=book.cover_url or "",
-                    rating=book.rating or 0.0,
-                    recommendation_text=recommendation_text,
-                    highlighted_words=[highlighted_sentence] if highlighted_sentence else []
-                )
-            except Exception as e:
-                print(f"⚠️  处理相似书籍 {similar_book.get('book_id')} 失败: {e}")
-                return None
-        
         # 使用多样性算法选择书籍（确保作者、类别、评分等维度的多样性）
         # 增加候选数量，提高推荐丰富度；selected_books 已排除不感兴趣
-        selected_books = _select_diverse_books(similar_books, db, target_count=40)
+        selected_books = await _select_diverse_books(similar_books, db, target_count=40)
         selected_books = [b for b in selected_books if int(b.get("book_id", 0)) not in not_interested_ids]
         
-        # 并行处理选中的书籍（最多同时处理40个，增加推荐数量）
-        tasks = [generate_recommendation_for_book(book) for book in selected_books[:40]]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        for result in results:
-            if result and isinstance(result, RecommendationItem):
-                recommendations.append(result)
-        
-        # 对推荐结果进行去重（按book_id）
-        seen_ids = set()
-        unique_recommendations = []
-        for rec in recommendations:
-            if rec.book_id not in seen_ids:
-                seen_ids.add(rec.book_id)
-                unique_recommendations.append(rec)
-        recommendations = unique_recommendations
+        # 批量查询选中书籍，并按 book_id 去重
+        selected_ids = list(dict.fromkeys(int(b["book_id"]) for b in selected_books[:40]))
+        id_to_book = {}
+        if selected_ids:
+            selected_rows = (await db.execute(select(Book).where(Book.id.in_(selected_ids)))).scalars().all()
+            id_to_book = {b.id: b for b in selected_rows}
+        books = [id_to_book[bid] for bid in selected_ids if bid in id_to_book]
         
-        # 随机打乱顺序，增加多样性
-        random.shuffle(recommendations)
+        # 随机打乱顺序，增加多样性；先取 5-8 本候选
+        random.shuffle(books)
+        books = books[:random.randint(5, 8)]
         
-        # 返回5-8本推荐（增加推荐数量）
-        final_count = random.randint(5, 8)
-        recommendations = recommendations[:final_count]
-        
-        if not recommendations:
+        if not books:
             # 如果最终没有推荐，返回热门书籍（3～5 本）
-            k_final = random.randint(3, 5)
-            # 大幅增加候选池，并使用多样性算法
-            all_popular_books = db.query(Book).filter(
-                Book.rating.isnot(None),
-                Book.rating > 0
-            ).order_by(Book.rating.desc()).limit(50).all()
-            all_popular_books = [b for b in all_popular_books if b.id not in not_interested_ids]
-            
-            # 转换为similar_books格式以便使用多样性算法
-            popular_books_dict = [
-                {"book_id": str(b.id), "distance": 1.0 - (b.rating or 0) / 10.0}
-                for b in all_popular_books
-            ]
-            
-            # 使用多样性算法选择
-            diverse_popular = _select_diverse_books(popular_books_dict, db, target_count=k_final * 2)
-            popular_book_ids = [int(b["book_id"]) for b in diverse_popular[:k_final]]
-            popular_books = [b for b in all_popular_books if b.id in popular_book_ids]
-            
-            if len(popular_books) < k_final:
-                # 如果多样性选择不够，随机补充
-                remaining_ids = set(popular_book_ids)
-                additional = [b for b in all_popular_books if b.id not in remaining_ids]
-                if additional:
-                    needed = k_final - len(popular_books)
-                    popular_books.extend(random.sample(additional, min(needed, len(additional))))
-            if popular_books:
-                async def generate_for_fallback_book(book):
-                    try:
-                        recommendation_text = await asyncio.wait_for(
-                            llm_service.generate_recommendation_text(
-                                user_input=user_input,
-                                book_title=book.title,
-                                book_author=book.author or "未知作者",
-                                book_description=book.description or "暂无简介"
-                            ),
-                            timeout=8.0  # 增加到8秒，给LLM更多响应时间
-                        )
-                        highlighted_sentence = _extract_random_sentence(recommendation_text)
-                        return RecommendationItem(
-                            book_id=book.id,
-                            title=book.title,
-                            author=book.author or "未知作者",
-                            cover_url=book.cover_url or "",
-                            rating=book.rating or 0.0,
-                            recommendation_text=recommendation_text,
-                            highlighted_words=[highlighted_sentence] if highlighted_sentence else []
-                        )
-                    except Exception as e:
-                        print(f"⚠️  为热门书籍 {book.id} 生成推荐语失败: {e}")
-                        return RecommendationItem(
-                            book_id=book.id,
-                            title=book.title,
-                            author=book.author or "未知作者",
-                            cover_url=book.cover_url or "",
-                            rating=book.rating or 0.0,
-                            recommendation_text=f"这本书可能符合你的需求：{book.title}",
-                            highlighted_words=[]
-                        )
-                
-                tasks_fallback = [generate_for_fallback_book(book) for book in popular_books]
-                results_fallback = await asyncio.gather(*tasks_fallback, return_exceptions=True)
-                for result in results_fallback:
-                    if result and isinstance(result, RecommendationItem):
-                        recommendations.append(result)
+            books = await _pick_diverse_popular_books(db, not_interested_ids, random.randint(3, 5), pool=50)
         
-        # 情绪搜索推荐 3～5 本，使用多样性算法最终选择
+        # 情绪搜索推荐 3～5 本，使用多样性算法最终选择（只依赖书籍本身，在生成推荐语之前完成，
+        # 这样只为最终展示的书生成推荐语，流式接口也能先返回书单）
         k = random.randint(3, 5)
-        if len(recommendations) > k:
+        if len(books) > k:
             # 转换为similar_books格式以便使用多样性算法
-            recs_dict = [
-                {"book_id": str(r.book_id), "distance": 0.5}  # 距离不重要，主要看多样性
-                for r in recommendations
+            books_dict = [
+                {"book_id": str(b.id), "distance": 0.5}  # 距离不重要，主要看多样性
+                for b in books
             ]
-            # 使用多样性算法选择最终推荐
-            diverse_final = _select_diverse_books(recs_dict, db, target_count=k)
+            diverse_final = await _select_diverse_books(books_dict, db, target_count=k)
             final_book_ids = {int(b["book_id"]) for b in diverse_final}
-            final_recommendations = [r for r in recommendations if r.book_id in final_book_ids]
+            final_books = [b for b in books if b.id in final_book_ids]
             
             # 如果多样性选择不够，随机补充
-            if len(final_recommendations) < k:
-                remaining = [r for r in recommendations if r.book_id not in final_book_ids]
+            if len(final_books) < k:
+                remaining = [b for b in books if b.id not in final_book_ids]
                 if remaining:
-                    needed = k - len(final_recommendations)
-                    final_recommendations.extend(random.sample(remaining, min(needed, len(remaining))))
+                    needed = k - len(final_books)
+                    final_books.extend(random.sample(remaining, min(needed, len(remaining))))
         else:
-            final_recommendations = recommendations
+            final_books = books
         
         # 最后随机打乱顺序
-        random.shuffle(final_recommendations)
+        random.shuffle(final_books)
         
-        return RecommendationResponse(
-            recommendations=final_recommendations,
-            message="" if final_recommendations else "暂时没有找到合适的书籍，请换个方式描述一下你的心情？"
+        return final_books, RecommendationResponse(
+            recommendations=[],
+            message="" if final_books else "暂时没有找到合适的书籍，请换个方式描述一下你的心情？"
         )
-    except HTTPException:
-        raise
     except Exception as e:
         print(f"❌ 推荐API错误: {e}")
         import traceback
         traceback.print_exc()
+        # 返回AI书童引导信息
+        return [], await _agent_suggestion_response(db)
+    finally:
+        if speculative_task is not None and not speculative_task.done():
+            speculative_task.cancel()
+
+
+@router.post("/semantic", response_model=RecommendationResponse)
+async def semantic_recommendation(
+    request: RecommendationRequest,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """语义推荐引擎"""
+    user_input = request.query
+    if not user_input or not user_input.strip():
+        raise HTTPException(status_code=400, detail="查询内容不能为空")
+    
+    print(f"📚 收到语义推荐请求: {user_input[:50]}...")
+    pipeline_started = time.perf_counter()
+    try:
+        books, response = await _plan_recommendations(user_input, db)
         
-        # 获取匿名用户的AI书童名称
-        agent_name = "苏童童"
+        # Step 3: 批量生成推荐语（一次结构化调用，按 prompt 长度自动拆批，取代逐本调用）
+        generation_started = time.perf_counter()
         try:
-            anonymous_user = db.query(User).filter(User.id == 1).first()
-            if anonymous_user and anonymous_user.agent_name:
-                agent_name = anonymous_user.agent_name
-        except Exception as user_error:
-            print(f"⚠️  获取用户书童名称失败: {user_error}")
-            # 如果获取失败，使用默认名称
-        
-        # 返回AI书童引导信息
-        return RecommendationResponse(
-            recommendations=[],
-            message=f"好像还没读懂你的心哦，不妨试试和{agent_name}仔细聊聊。",
-            show_agent_suggestion=True,
-            agent_name=agent_name
-        )
+            response.recommendations = await _build_recommendation_items(user_input, books)
+        except Exception as e:
+            print(f"❌ 推荐API错误: {e}")
+            import traceback
+            traceback.print_exc()
+            return await _agent_suggestion_response(db)
+        _stage_stats["generation"].record(time.perf_counter() - generation_started)
+        return response
+    finally:
+        _stage_stats["total"].record(time.perf_counter() - pipeline_started)
+
+
+def _sse(event: str, data: dict) -> str:
+    """格式化一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/semantic/stream")
+async def semantic_recommendation_stream(
+    request: RecommendationRequest,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    语义推荐（SSE 流式）：检索与选书完成后立即推送书单，推荐语按批生成完成后逐条推送。
+    事件：books {RecommendationResponse，recommendation_text 为空}；text {book_id, recommendation_text, highlighted_words}；done {}
+    """
+    user_input = request.query
+    if not user_input or not user_input.strip():
+        raise HTTPException(status_code=400, detail="查询内容不能为空")
+    
+    print(f"📚 收到语义推荐请求（流式）: {user_input[:50]}...")
+
+    async def event_stream():
+        pipeline_started = time.perf_counter()
+        try:
+            books, response = await _plan_recommendations(user_input, db)
+            response.recommendations = [_to_recommendation_item(b, "") for b in books]
+            yield _sse("books", response.model_dump())
+            
+            generation_started = time.perf_counter()
+            async for book, recommendation_text in _stream_recommendation_texts(user_input, books):
+                item = _to_recommendation_item(book, recommendation_text)
+                yield _sse("text", {
+                    "book_id": item.book_id,
+                    "recommendation_text": item.recommendation_text,
+                    "highlighted_words": item.highlighted_words,
+                })
+            _stage_stats["generation"].record(time.perf_counter() - generation_started)
+            yield _sse("done", {})
+        finally:
+            _stage_stats["total"].record(time.perf_counter() - pipeline_started)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,18 +1,26 @@
 """
 搜索相关 API
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional
 import asyncio
-from app.db.database import get_db
+from app.db.database import get_async_db, get_async_read_db
 from app.db.models import Book
 from app.api.books import BookResponse
 from app.api.popular import BookWithReason
 from app.api.popular_reason_templates import get_reason_for_user_template, get_reason_by_index
 from app.services.book_data import BookDataService
+from app.core.config import settings
 from app.services.llm import LLMService
-from app.services.fts_search import FTSSearchService
+from app.services.author_index import author_condition, normalize_author, split_authors
+from app.services.fts_search import empty_is_final, fts_service
+from app.services.hybrid_search import HybridSearchService
+from app.services.query_translation import QueryTranslator
+from app.services.suggest_index import suggest_service
 from app.db.models import Book as BookModel
 
 router = APIRouter()
@@ -20,59 +28,58 @@ book_data_service = BookDataService()
 llm_service = LLMService()
 
 
-def _is_chinese(text: str) -> bool:
-    """检测文本是否包含中文字符"""
-    import re
-    return bool(re.search(r'[\u4e00-\u9fff]', text))
+def _create_hybrid_service() -> HybridSearchService:
+    """与语义推荐共用 embedding 服务（及其缓存）和向量库"""
+    from app.api.recommendation import embedding_service, get_vector_db_service
+    return HybridSearchService(embedding_service, get_vector_db_service)
 
 
-async def _translate_to_english(text: str) -> str:
-    """将中文文本翻译成英文（用于搜索外文书）"""
-    if not _is_chinese(text):
-        # 如果输入不是中文，直接返回
-        return text
-    
-    try:
-        # 使用LLM服务翻译
-        prompt = f"""请将以下中文文本翻译成英文，保持原意和语气。只返回翻译结果，不要添加任何解释。
+hybrid_search_service = _create_hybrid_service()
 
-中文文本：{text}
 
-英文翻译："""
-        
-        messages = [
-            {"role": "system", "content": "你是一个专业的翻译助手，擅长将中文翻译成自然流畅的英文。"},
-            {"role": "user", "content": prompt}
-        ]
-        
-        # 设置5秒超时，避免翻译耗时过长
-        translated_text, _ = await asyncio.wait_for(
-            llm_service.chat_completion(messages, temperature=0.3),
-            timeout=5.0
-        )
-        
-        # 清理翻译结果（移除可能的引号等）
-        translated_text = translated_text.strip().strip('"').strip("'")
-        return translated_text if translated_text else text
-        
-    except asyncio.TimeoutError:
-        print("⚠️  翻译超时，使用原始文本")
-        return text
-    except Exception as e:
-        print(f"⚠️  翻译失败: {e}，使用原始文本")
-        return text
+def _create_query_translator() -> QueryTranslator:
+    """离线词表由推荐接口的 GENRE_SYNONYMS 补充类型词"""
+    from app.api.recommendation import GENRE_SYNONYMS
+    return QueryTranslator(GENRE_SYNONYMS, llm_service)
+
+
+query_translator = _create_query_translator()
+
+
+class HybridBookResult(BookWithReason):
+    score: float  # RRF 融合分
+    sources: List[str]  # 命中的召回路：bm25 / author / ann
+
+
+class SuggestionItem(BaseModel):
+    text: str
+    kind: str  # title / author
+    book_id: Optional[int] = None
+
 
+class HybridSearchResponse(BaseModel):
+    query: str
+    books: List[HybridBookResult]
+    timings_ms: Dict[str, float]  # 各阶段耗时（bm25、author、embedding、ann、fusion、hydrate、total）
+    degraded: List[str]  # 失败 / 超时被跳过的召回路
 
-def _fallback_like_search(
-    db: Session,
+
+def _is_chinese(text: str) -> bool:
+    """检测文本是否包含中文字符"""
+    import re
+    return bool(re.search(r'[\u4e00-\u9fff]', text))
+
+
+async def _fallback_like_search(
+    db: AsyncSession,
     isbn: Optional[str],
     title: Optional[str],
     author: Optional[str]
 ) -> List[Book]:
     """回退到普通 LIKE 搜索（当 FTS 不可用时）"""
-    from sqlalchemy import or_, distinct
+    from sqlalchemy import or_
     
-    query = db.query(Book)
+    query = select(Book)
     conditions = []
     
     if isbn:
@@ -90,40 +97,122 @@ def _fallback_like_search(
             conditions.append(title_conditions[0])
     
     if author:
-        all_authors = db.query(distinct(Book.author)).filter(
-            Book.author.isnot(None),
-            Book.author != ""
-        ).all()
-        author_list = [a[0] for a in all_authors if a[0]]
-        matching_authors = []
-        search_lower = author.lower()
-        
-        for author_name in author_list:
-            if not author_name:
-                continue
-            author_parts = author_name.replace('，', ',').replace('；', ';').split(',')
-            author_parts.extend(author_name.replace('，', ',').replace('；', ';').split(';'))
-            for part in author_parts:
-                part_clean = part.strip()
-                if search_lower in part_clean.lower():
-                    matching_authors.append(author_name)
-                    break
-        
-        if matching_authors:
-            author_conditions = [Book.author == auth for auth in matching_authors]
-            if len(author_conditions) > 1:
-                conditions.append(or_(*author_conditions))
-            else:
-                conditions.append(author_conditions[0])
-        else:
-            conditions.append(Book.author.contains(author))
+        # book_author_terms 索引上的前缀范围查询（子串 / 拼音），不再加载全部作者名逐个比对
+        condition = author_condition(author)
+        conditions.append(condition if condition is not None else Book.author.contains(author))
     
     if len(conditions) > 1:
-        query = query.filter(or_(*conditions))
+        query = query.where(or_(*conditions))
     elif len(conditions) == 1:
-        query = query.filter(conditions[0])
+        query = query.where(conditions[0])
     
-    return query.limit(100).all()
+    return list((await db.execute(query.limit(100))).scalars().all())
+
+
+async def _merge_author_matches(db: AsyncSession, books: List[Book], author: str) -> List[Book]:
+    """
+    FTS 按原文分词匹配作者，「特德姜」匹配不到「[美] 特德·姜」、拼音也匹配不到；
+    再用作者索引（规范化名 / 拼音子串）查一次，补在 FTS 结果之后，总数不超过 100
+    """
+    condition = author_condition(author)
+    if condition is None or len(books) >= 100:
+        return books
+    query = select(Book).where(condition)
+    if books:
+        query = query.where(Book.id.not_in([b.id for b in books]))
+    extra = (await db.execute(
+        query.order_by(Book.rating.desc().nulls_last(), Book.id).limit(100 - len(books))
+    )).scalars().all()
+    return books + list(extra)
+
+
+async def _search_books(
+    db: AsyncSession,
+    isbn: Optional[str],
+    title: Optional[str],
+    author: Optional[str]
+) -> List[Book]:
+    """FTS 优先，无法回答或出错时回退到 LIKE"""
+    try:
+        # 索引未就绪（启动后仍在后台构建）时不必进入 run_sync
+        books = await db.run_sync(_fts_search, isbn, title, author) if fts_service.ready else None
+        # FTS 无法回答（不可用、查询含单个汉字等）时回退到普通搜索；
+        # 纯中文查询由二元组完整覆盖，FTS 明确无结果时不再做一遍全表 LIKE；
+        # ISBN 片段、英文词中间的子串不在索引里，无结果时仍走 LIKE
+        if books is None or (not books and not empty_is_final(isbn, title, author)):
+            books = await _fallback_like_search(db, isbn, title, author)
+        elif author:
+            books = await _merge_author_matches(db, books, author)
+    except Exception as e:
+        # FTS 不可用或出错，回退到普通 LIKE 搜索
+        print(f"⚠️  FTS 搜索失败，使用普通搜索: {e}")
+        books = await _fallback_like_search(db, isbn, title, author)
+    return books
+
+
+def _author_tokens(term: str) -> List[str]:
+    return [t for t in (normalize_author(w) for w in term.split()) if t]
+
+
+async def _search_translated(db: AsyncSession, terms: List[str], title: bool, author: bool) -> List[Book]:
+    """
+    译文检索：每个译名单独检索（词表拼出的「history」「novel」不合成一句）。
+    书名：每个译名作为一个短语（不查简介、不拆词）；作者：译名中的每个词都要出现、不要求顺序，
+    走作者索引（「Liu Cixin」也能命中 Open Library 的「Cixin Liu」）
+    """
+    from sqlalchemy import and_, or_
+    books: List[Book] = []
+    if title:
+        try:
+            found = await db.run_sync(
+                lambda s: fts_service.search_phrase(s, tuple(terms), title=True, author=False, limit=100)
+            ) if fts_service.ready else None
+        except Exception as e:
+            print(f"⚠️  译文 FTS 搜索失败，使用普通搜索: {e}")
+            found = None
+        if found is None:
+            found = (await db.execute(
+                select(Book).where(or_(*(Book.title.contains(t) for t in terms))).limit(100)
+            )).scalars().all()
+        books.extend(found)
+    if author and len(books) < 100:
+        conditions = [
+            and_(*(author_condition(token) for token in tokens))
+            for tokens in map(_author_tokens, terms) if tokens
+        ]
+        if conditions:
+            query = select(Book).where(or_(*conditions))
+            if books:
+                query = query.where(Book.id.not_in([b.id for b in books]))
+            books.extend((await db.execute(query.limit(100 - len(books)))).scalars().all())
+    return books
+
+
+def _translated_match_score(book: Book, terms: List[str], title: bool, author: bool) -> int:
+    """英文书按译名计算的匹配分（与 calculate_match_score 同档位，不含评分加成）：书名按整个译名，作者按词、不论顺序"""
+    score = 0
+    book_title = (book.title or "").lower().strip()
+    names = [normalize_author(name) for name in split_authors(book.author)]
+    for term in terms:
+        term_lower = term.lower().strip()
+        if title and term_lower and book_title:
+            if book_title == term_lower:
+                score = max(score, 800)
+            elif book_title.startswith(term_lower):
+                score = max(score, 600)
+            elif term_lower in book_title:
+                score = max(score, 400)
+        tokens = _author_tokens(term) if author else []
+        for name in names:
+            if tokens and all(t in name for t in tokens):
+                # 各词拼起来恰好是整个名字（「Cixin Liu」对「Liu Cixin」）算完全匹配
+                score = max(score, 700 if sum(map(len, tokens)) == len(name) else 300)
+    return score
+
+
+def _fts_search(db: Session, isbn: Optional[str], title: Optional[str], author: Optional[str]) -> Optional[List[Book]]:
+    """FTS 服务基于同步会话，经 AsyncSession.run_sync 在异步连接上执行；None 表示需回退到 LIKE"""
+    return fts_service.search(db, isbn=isbn, title=title, author=author, limit=100)
 
 
 def _build_search_reason(
@@ -162,7 +251,7 @@ async def exact_search(
     isbn: Optional[str] = Query(None),
     title: Optional[str] = Query(None),
     author: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """精确搜索（ISBN/书名/作者）- 优先使用 FTS 全文搜索，性能比 LIKE 快 10-100 倍
     
@@ -179,22 +268,21 @@ async def exact_search(
         if not isbn and not title and not author:
             return []
         
-        # 优先使用 FTS 全文搜索（性能更好）
-        try:
-            fts_service = FTSSearchService(db)
-            books = fts_service.search(isbn=isbn, title=title, author=author, limit=100)
-            
-            # 如果 FTS 返回结果，使用 FTS 结果；否则回退到普通搜索
-            if not books:
-                # FTS 无结果时，尝试普通搜索（可能 FTS 索引未同步）
-                books = _fallback_like_search(db, isbn, title, author)
-        except Exception as e:
-            # FTS 不可用或出错，回退到普通 LIKE 搜索
-            print(f"⚠️  FTS 搜索失败，使用普通搜索: {e}")
-            books = _fallback_like_search(db, isbn, title, author)
+        # 中文书名 / 作者同时翻译成英文（词表 / 缓存命中时几乎无耗时），与中文检索并行
+        query_text = title or author
+        translation_task = None
+        if settings.QUERY_TRANSLATION_ENABLED and query_text and _is_chinese(query_text):
+            translation_task = asyncio.create_task(query_translator.translate(query_text))
         
-        if not books:
-            return []
+        books = await _search_books(db, isbn, title, author)
+        
+        # 跨语言扩展：用英文译文再检索一次，补充英文书（排在中文结果之后，总数仍不超过 100）
+        translated = None
+        if translation_task is not None:
+            try:
+                translated = await translation_task
+            except Exception as e:
+                print(f"⚠️  搜索词翻译失败，仅返回中文结果: {e}")
         
         # 对搜索结果进行排序，最匹配的排在前面
         def calculate_match_score(book: Book) -> int:
@@ -238,8 +326,28 @@ async def exact_search(
             
             return score
         
-        # 按匹配分数排序，分数高的在前
-        sorted_books = sorted(books, key=calculate_match_score, reverse=True)
+        if translated and len(books) < 100:
+            seen = {b.id for b in books}
+            extra = await _search_translated(db, translated, bool(title), bool(author))
+            # 译文在书名 / 作者上没有任何匹配分的书（短语被标点、分词拆开等）不补充，避免无关英文书占满结果
+            extra = [
+                b for b in extra
+                if b.id not in seen and _translated_match_score(b, translated, bool(title), bool(author)) > 0
+            ]
+            books = books + extra[:100 - len(books)]
+        
+        if not books:
+            return []
+        
+        # 按匹配分数排序，分数高的在前（英文书按译文计算匹配分）
+        def best_match_score(book: Book) -> int:
+            score = calculate_match_score(book)
+            if translated:
+                bonus = int(book.rating * 10) if book.rating else 0
+                score = max(score, _translated_match_score(book, translated, bool(title), bool(author)) + bonus)
+            return score
+        
+        sorted_books = sorted(books, key=best_match_score, reverse=True)
         
         # 为每本书生成推荐理由
         result = []
@@ -297,3 +405,59 @@ async def exact_search(
         traceback.print_exc()
         # 返回空列表而不是抛出异常
         return []
+
+
+@router.get("/hybrid", response_model=HybridSearchResponse)
+async def hybrid_search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """混合搜索：全文 bm25、向量近邻、作者模糊匹配三路并发召回，RRF 融合后一次返回，附各阶段耗时"""
+    query = q.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="搜索词不能为空")
+    result = await hybrid_search_service.search(db, query, limit=limit)
+
+    books = []
+    used_reasons = set()
+    for i, hit in enumerate(result.hits):
+        book = hit.book
+        rating_val = float(book.rating) if book.rating is not None else None
+        reason = _build_search_reason(
+            title=book.title or "",
+            author=book.author or "",
+            description=book.description or "",
+            rating=rating_val,
+            used_reasons=used_reasons,
+            fallback_index=i,
+        )
+        used_reasons.add(reason)
+        books.append(HybridBookResult(
+            id=book.id,
+            isbn=book.isbn,
+            title=book.title or "",
+            author=book.author,
+            publisher=book.publisher,
+            description=book.description,
+            cover_url=book.cover_url,
+            rating=rating_val,
+            category=book.category,
+            page_count=book.page_count,
+            reason=reason,
+            score=round(hit.score, 6),
+            sources=hit.sources,
+        ))
+    return HybridSearchResponse(query=query, books=books, timings_ms=result.timings_ms, degraded=result.degraded)
+
+
+@router.get("/suggest", response_model=List[SuggestionItem])
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=50),
+    limit: int = Query(8, ge=1, le=20)
+):
+    """输入联想：书名 / 作者（含拼音、首字母）前缀匹配，按热度取前 limit 条；索引构建完成前返回空列表"""
+    return [
+        SuggestionItem(text=s.text, kind=s.kind, book_id=s.book_id)
+        for s in suggest_service.suggest(q, limit)
+    ]
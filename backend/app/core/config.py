@@ -21,6 +21,11 @@ class Settings(BaseSettings):
     BIGMODEL_EMBEDDING_BASE_URL: str = "https://open.bigmodel.cn"
     BIGMODEL_EMBEDDING_MODEL: str = "embedding-3"
     BIGMODEL_EMBEDDING_DIMENSIONS: int = 1024  # 256/512/1024/2048，与向量库一致
+    # 查询 embedding 缓存（内存 LRU + SQLite）；修改向量生成方式时递增 VERSION 使旧缓存失效
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MEMORY_SIZE: int = 5000
+    EMBEDDING_CACHE_DTYPE: str = "float16"  # float16 体积减半，余弦相似度误差可忽略；需要精确值时用 float32
+    EMBEDDING_CACHE_VERSION: int = 2  # 2：缓存只存查询文本，弃用混入了书籍文档向量的旧条目
     
     # JWT
     JWT_SECRET_KEY: str = "yuexin_secret_key_2024_change_in_production"
@@ -29,16 +34,95 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./yuexin.db"
+    # 异步会话使用的 URL，留空时由 DATABASE_URL 推导（sqlite -> sqlite+aiosqlite，postgresql -> postgresql+asyncpg）
+    ASYNC_DATABASE_URL: str = ""
+    # 只读库 URL（如 Postgres 只读副本），留空时 SQLite 文件库对同一文件建只读连接池，其他数据库复用主库
+    DATABASE_READ_URL: str = ""
+    # 连接池（SQLite 内存库不使用）
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_READ_POOL_SIZE: int = 8
+    SQLITE_READ_POOL_ENABLED: bool = True
+
+    # SQLite 性能配置（每个连接建立时执行）：WAL 使写入不阻塞读取；synchronous=NORMAL 在 WAL 下仍保证不损坏
+    SQLITE_TUNING_ENABLED: bool = True
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # 字节，0 表示关闭 mmap
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024  # 每个连接的页缓存
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
     
     # Chroma
     CHROMA_PERSIST_DIR: str = "./chroma_db"
-    
+
+    # 向量后端：chroma（默认）| numpy（内存暴力检索，需先运行 scripts/build_numpy_index.py 或重新 init_books）
+    VECTOR_BACKEND: str = "chroma"
+    NUMPY_INDEX_DIR: str = "./numpy_index"
+
     # CORS
     FRONTEND_URL: str = "http://localhost:5173"
     
     # 豆瓣 API（可选，无 Key 时可能返回 400，init_books 会回退到仅用 Open Library）
     DOUBAN_API_KEY: str = ""
-    
+
+    # 出站 HTTP 连接池（LLM / Embedding / Open Library / 豆瓣 共享，按提供方各一个池）
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # 空闲连接保活秒数
+    HTTP2_ENABLED: bool = True  # 需安装 h2，未安装时自动使用 HTTP/1.1
+    HTTP_TIMEOUT_LLM: float = 60.0
+    HTTP_TIMEOUT_EMBEDDING: float = 30.0
+    HTTP_TIMEOUT_OPENLIBRARY: float = 60.0
+    HTTP_TIMEOUT_DOUBAN: float = 15.0
+
+    # LLM 调度：全局并发上限 + 每个提供方的令牌桶限流（避免一次推荐请求打出几十个并发调用）
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_RATE_LIMIT_PER_SECOND: float = 10.0
+    LLM_RATE_LIMIT_BURST: int = 20
+    # 批量推荐语：单次调用最多条数与 prompt 字符上限，超出自动拆批
+    LLM_BATCH_MAX_ITEMS: int = 10
+    LLM_BATCH_MAX_PROMPT_CHARS: int = 4000
+    # 流式推荐接口拆成更小的批并发生成，先完成的推荐语先推送
+    LLM_STREAM_BATCH_MAX_ITEMS: int = 2
+
+    # 意图提取：查询完全由已知情绪 / 类型词构成时走规则快速路径；其余 LLM 结果按规范化查询缓存
+    INTENT_FAST_PATH: bool = True
+    INTENT_CACHE_ENABLED: bool = True
+    INTENT_CACHE_MEMORY_SIZE: int = 2000
+    INTENT_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # 书籍热度物化表 book_stats 与明细表的对账周期（秒），启动时先对账一次；0 表示关闭
+    BOOK_STATS_RECONCILE_SECONDS: int = 3600
+
+    # 「推荐你看」每用户推荐快照：内存 LRU 用户数；书架 / 不感兴趣 / 书目变化时立即失效，
+    # TTL 兜底多 worker 部署（其他 worker 上的快照收不到失效通知）与向量库离线更新
+    FEED_CACHE_SIZE: int = 5000
+    FEED_SNAPSHOT_TTL_SECONDS: int = 600
+
+    # 混合检索（/api/search/hybrid）：每路召回条数、RRF 平滑常数 k、向量路超时（超时只丢弃向量路）
+    HYBRID_CANDIDATES_PER_SOURCE: int = 50
+    HYBRID_RRF_K: int = 60
+    HYBRID_EMBEDDING_TIMEOUT_SECONDS: float = 3.0
+    HYBRID_ANN_TIMEOUT_SECONDS: float = 2.0
+
+    # 输入联想（/api/search/suggest）内存前缀索引的全量重建周期（秒），用于更新热度排序；书目增删改提交后即时生效
+    SUGGEST_REFRESH_SECONDS: int = 600
+
+    # 精确搜索跨语言扩展：中文查询先查离线词表，再查译文缓存（内存 LRU + 持久表），都未覆盖时才调用 LLM；
+    # LLM 翻译最多等待 QUERY_TRANSLATION_WAIT_SECONDS，超时后在后台完成并写入缓存，本次只返回中文结果
+    QUERY_TRANSLATION_ENABLED: bool = True
+    QUERY_TRANSLATION_MEMORY_SIZE: int = 2000
+    QUERY_TRANSLATION_TTL_SECONDS: int = 30 * 24 * 3600
+    QUERY_TRANSLATION_MAX_ROWS: int = 20000
+    QUERY_TRANSLATION_WAIT_SECONDS: float = 1.5
+
+    # 热门推荐语缓存：内存 LRU 条数；超过新鲜期后仍返回旧值并后台刷新，超过最大陈旧期视为未命中
+    REASON_CACHE_MEMORY_SIZE: int = 2000
+    REASON_CACHE_FRESH_SECONDS: int = 7 * 24 * 3600
+    REASON_CACHE_MAX_STALE_SECONDS: int = 30 * 24 * 3600
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
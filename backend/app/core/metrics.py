@@ -0,0 +1,39 @@
+"""
+轻量运行指标：延迟统计（次数 / 均值 / 最大值 / 近期分位数）
+"""
+from collections import deque
+from typing import Dict, Any
+
+
+class LatencyStats:
+    """记录耗时（秒），保留最近 window 个样本用于计算分位数"""
+
+    def __init__(self, window: int = 512):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self._recent.append(seconds)
+
+    def _percentile(self, p: float) -> float:
+        if not self._recent:
+            return 0.0
+        values = sorted(self._recent)
+        idx = min(len(values) - 1, int(round(p * (len(values) - 1))))
+        return values[idx]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """以毫秒返回统计结果"""
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(self._percentile(0.5) * 1000, 2),
+            "p95_ms": round(self._percentile(0.95) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
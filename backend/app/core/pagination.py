@@ -0,0 +1,50 @@
+"""
+分页游标：不透明的 base64url(JSON) 字符串，客户端从响应头取出后原样回传
+"""
+import base64
+import json
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """解析失败（被篡改、格式过期）时返回 None，由调用方按首页处理"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+# 键集分页（keyset）：游标记录上一页最后一行的排序键，下一页用 WHERE key > :last 走索引定位，
+# 深翻页不再像 OFFSET 那样扫描并丢弃前面的行。下一页游标放在响应头中，已到末尾时不返回该头
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_id_cursor(last_id: int, **extra: Any) -> str:
+    return encode_cursor({"id": int(last_id), **extra})
+
+
+def decode_id_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """解析键集游标，未传时返回 None；格式错误抛 400（避免静默回到第一页导致重复数据）"""
+    if not cursor:
+        return None
+    payload = decode_cursor(cursor)
+    if payload is None or not isinstance(payload.get("id"), int):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    return payload
+
+
+def set_next_cursor(response, rows: List[Any], limit: Optional[int], **extra: Any) -> None:
+    """本页取满 limit 条时按最后一行 id 生成下一页游标（可能多一次空页请求，但无需额外 COUNT）"""
+    if limit and len(rows) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_id_cursor(rows[-1].id, **extra)
@@ -1,20 +1,131 @@
 """
 数据库配置
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+# 同步驱动 -> 异步驱动（SQLite 用 aiosqlite，Postgres 用 asyncpg）
+_ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+
+def get_async_database_url(url: str) -> str:
+    """由 DATABASE_URL 推导异步驱动 URL；已指定异步驱动或未知后端时原样返回"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = _ASYNC_DRIVERS.get(backend)
+    if not driver or parsed.get_driver_name() == driver:
+        return url
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or "mode=memory" in str(url)
+
+
+def _sqlite_pragmas(read_only: bool = False) -> list:
+    """连接建立时执行的 PRAGMA（由 Settings 中的 SQLITE_* 配置决定）"""
+    pragmas = [
+        f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        # 负数表示以 KiB 为单位，与页大小无关
+        f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}",
+        f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}",
+        f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def _install_sqlite_tuning(sync_engine, url: str, read_only: bool = False) -> None:
+    """为 SQLite 引擎注册 connect 事件：WAL 让写入不再阻塞读取，其余 PRAGMA 扩大页缓存并启用 mmap"""
+    if not settings.SQLITE_TUNING_ENABLED or not _is_sqlite(url):
+        return
+    pragmas = _sqlite_pragmas(read_only)
+    # journal_mode 会写入数据库文件头，只由读写连接设置；内存库不支持 WAL
+    journal_mode = None if read_only or _is_sqlite_memory(url) else settings.SQLITE_JOURNAL_MODE
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if journal_mode:
+                cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def _engine_kwargs(url: str, pool_size: int) -> dict:
+    """连接池参数：SQLite 内存库使用单连接池，不接受 pool_size 等参数"""
+    kwargs = {}
+    if _is_sqlite(url):
+        driver = make_url(url).get_driver_name()
+        if driver == "pysqlite":
+            kwargs["connect_args"] = {"check_same_thread": False}
+        if _is_sqlite_memory(url):
+            return kwargs
+        if driver == "aiosqlite":
+            # aiosqlite 默认 NullPool，每次会话都重新建连并执行 PRAGMA；改为复用连接
+            kwargs["poolclass"] = AsyncAdaptedQueuePool
+    kwargs.update(
+        pool_size=pool_size,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=not _is_sqlite(url),
+    )
+    return kwargs
+
+
+engine = create_engine(settings.DATABASE_URL, **_engine_kwargs(settings.DATABASE_URL, settings.DB_POOL_SIZE))
+_install_sqlite_tuning(engine, settings.DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+_ASYNC_URL = settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(_ASYNC_URL, **_engine_kwargs(_ASYNC_URL, settings.DB_POOL_SIZE))
+_install_sqlite_tuning(async_engine.sync_engine, _ASYNC_URL)
+
+# expire_on_commit=False：提交后仍可直接读取 ORM 对象属性（异步会话中不能隐式懒加载）
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# 只读连接池：供查询密集型接口使用。
+# 配置了 DATABASE_READ_URL（如 Postgres 只读副本）时连接该库；SQLite 文件库时对同一文件另建一组 query_only 连接，
+# 在 WAL 模式下与写连接互不阻塞；其余情况（含内存库）直接复用读写引擎。
+_READ_URL = settings.DATABASE_READ_URL or settings.DATABASE_URL
+if settings.DATABASE_READ_URL or (
+    settings.SQLITE_READ_POOL_ENABLED and _is_sqlite(_READ_URL) and not _is_sqlite_memory(_READ_URL)
+):
+    read_engine = create_engine(_READ_URL, **_engine_kwargs(_READ_URL, settings.DB_READ_POOL_SIZE))
+    _install_sqlite_tuning(read_engine, _READ_URL, read_only=True)
+    _ASYNC_READ_URL = get_async_database_url(_READ_URL)
+    async_read_engine = create_async_engine(
+        _ASYNC_READ_URL, **_engine_kwargs(_ASYNC_READ_URL, settings.DB_READ_POOL_SIZE)
+    )
+    _install_sqlite_tuning(async_read_engine.sync_engine, _ASYNC_READ_URL, read_only=True)
+else:
+    read_engine = engine
+    async_read_engine = async_engine
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db():
     """获取数据库会话"""
@@ -23,3 +134,32 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """获取只读数据库会话（只读连接池，写操作会被拒绝）"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """获取异步数据库会话（查询期间不阻塞事件循环，供高频接口使用）"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db():
+    """获取异步只读数据库会话"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+async def dispose_engines() -> None:
+    """关闭所有连接池（应用关闭时调用）"""
+    for eng in {id(async_engine): async_engine, id(async_read_engine): async_read_engine}.values():
+        await eng.dispose()
+    for eng in {id(engine): engine, id(read_engine): read_engine}.values():
+        eng.dispose()
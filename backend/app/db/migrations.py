@@ -0,0 +1,182 @@
+"""
+数据库结构迁移（按版本号顺序执行，已执行的版本记录在 schema_migrations 表中）
+- 新表由 Base.metadata.create_all 创建；已存在的表补列、补索引、数据修正在这里以迁移的形式追加
+- 每个迁移在独立事务中执行，且自身幂等：多个 worker 同时启动时重复执行也不会出错
+- 新增迁移：在文件末尾追加 @migration(下一个版本号, "说明") 装饰的函数，不要修改已发布的迁移
+"""
+import logging
+import time
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+from app.db.database import Base
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    def register(fn: Callable[[Connection], None]):
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"迁移版本号重复: {version}")
+        MIGRATIONS.append(Migration(version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return fn
+    return register
+
+
+def _columns(conn: Connection, table: str) -> List[str]:
+    return [c["name"] for c in inspect(conn).get_columns(table)]
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    if table in inspect(conn).get_table_names() and column not in _columns(conn, table):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _create_indexes(conn: Connection, *names: str) -> None:
+    """按名称创建 models 中声明的索引（已存在则跳过）"""
+    wanted = set(names)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in wanted:
+                index.create(bind=conn, checkfirst=True)
+                wanted.discard(index.name)
+    if wanted:
+        raise ValueError(f"models 中未声明的索引: {sorted(wanted)}")
+
+
+@migration(1, "legacy_columns")
+def _legacy_columns(conn: Connection) -> None:
+    """旧库缺失列（原 main._migrate_db）"""
+    _add_column(conn, "chat_messages", "session_id", "INTEGER NOT NULL DEFAULT 1")
+    _add_column(conn, "users", "agent_name", "VARCHAR DEFAULT '苏童童'")
+    _add_column(conn, "books", "douban_id", "VARCHAR")
+    _add_column(conn, "books", "rating_source", "VARCHAR DEFAULT 'douban'")
+
+
+@migration(2, "keyset_pagination_indexes")
+def _keyset_pagination_indexes(conn: Connection) -> None:
+    _create_indexes(
+        conn,
+        "ix_bookshelves_user_status_id",
+        "ix_bookshelves_user_id_id",
+        "ix_chat_messages_session_id_id",
+    )
+
+
+def _merge_duplicate_shelves(conn: Connection) -> None:
+    """
+    同一用户重复加入的书架记录合并到最新一条（MAX(id)）：状态以最新一条为准（为空时取较早记录中最近的非空值），
+    闪念笔记按时间顺序拼接、去重，创建时间取最早；被删除的记录 id 写入日志
+    """
+    rows = conn.execute(text(
+        "SELECT id, user_id, book_id, status, notes, created_at FROM bookshelves "
+        "WHERE (user_id, book_id) IN "
+        "(SELECT user_id, book_id FROM bookshelves GROUP BY user_id, book_id HAVING COUNT(*) > 1) "
+        "ORDER BY user_id, book_id, id"
+    )).all()
+    groups = {}
+    for row in rows:
+        groups.setdefault((row.user_id, row.book_id), []).append(row)
+    for (user_id, book_id), group in groups.items():
+        keep, older = group[-1], group[:-1]
+        status = keep.status or next((r.status for r in reversed(older) if r.status), None)
+        notes = "\n".join(dict.fromkeys(r.notes.strip() for r in group if r.notes and r.notes.strip())) or None
+        created_at = min((r.created_at for r in group if r.created_at is not None), default=keep.created_at)
+        conn.execute(
+            text("UPDATE bookshelves SET status = :status, notes = :notes, created_at = :created_at WHERE id = :id"),
+            {"status": status, "notes": notes, "created_at": created_at, "id": keep.id},
+        )
+        removed = [r.id for r in older]
+        conn.execute(
+            text("DELETE FROM bookshelves WHERE id IN (%s)" % ", ".join(str(i) for i in removed))
+        )
+        logger.warning(
+            "合并重复书架记录: user_id=%s book_id=%s 保留 id=%s，删除 id=%s（状态 / 笔记已合并）",
+            user_id, book_id, keep.id, removed,
+        )
+
+
+@migration(3, "hot_filter_indexes")
+def _hot_filter_indexes(conn: Connection) -> None:
+    """热点过滤条件的复合索引；建唯一索引前先合并同一用户重复加入的书架记录（book_stats 将在下次对账时修正）"""
+    _merge_duplicate_shelves(conn)
+    _create_indexes(
+        conn,
+        "uq_bookshelves_user_book",
+        "ix_user_preferences_user_type_book",
+        "ix_chat_sessions_user_book",
+        "ix_chat_messages_session_created",
+        "ix_user_interest_facts_user_value",
+    )
+
+
+@migration(4, "books_fts_bigram")
+def _books_fts_bigram(conn: Connection) -> None:
+    """精确搜索 FTS5 表（中文二元组切分）；只建表，索引内容由应用启动时在后台填充"""
+    if conn.dialect.name != "sqlite":
+        return
+    from app.services.fts_search import create_fts_table
+    create_fts_table(conn)
+
+
+@migration(5, "book_authors_index")
+def _book_authors_index(conn: Connection) -> None:
+    """作者规范化表与后缀检索词（表由 create_all 创建），按现有书目全量生成"""
+    from app.services.author_index import rebuild_author_index
+    rows = rebuild_author_index(conn)
+    logger.info("作者索引已生成: %d 位作者", rows)
+
+
+def _ensure_version_table(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at FLOAT NOT NULL)"
+        ))
+
+
+def applied_versions(engine: Engine) -> List[int]:
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """创建缺失的表并执行未执行过的迁移，返回本次执行的版本号"""
+    Base.metadata.create_all(bind=engine)
+    done = set(applied_versions(engine))
+    executed = []
+    for m in MIGRATIONS:
+        if m.version in done:
+            continue
+        try:
+            with engine.begin() as conn:
+                m.upgrade(conn)
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                    {"v": m.version, "n": m.name, "t": time.time()},
+                )
+        except IntegrityError:
+            # 只有其他 worker 已执行并登记了该版本时才跳过；
+            # 迁移自身的约束错误（如建唯一索引时遇到并发写入的重复数据）照常抛出，下次启动重试
+            if m.version in applied_versions(engine):
+                logger.info("数据库迁移 %d_%s 已由其他进程执行", m.version, m.name)
+                continue
+            logger.exception("数据库迁移 %d_%s 失败", m.version, m.name)
+            raise
+        executed.append(m.version)
+        logger.info("数据库迁移 %d_%s 已执行", m.version, m.name)
+    return executed
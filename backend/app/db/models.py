@@ -1,7 +1,7 @@
 """
 数据库模型
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Boolean, JSON, UniqueConstraint, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -52,9 +52,40 @@ class Book(Base):
     chat_messages = relationship("ChatMessage", back_populates="book")
 
 
+class BookAuthor(Base):
+    """书籍作者规范化表：每位作者一行（合著者拆开），由 app/services/author_index 随 Book 写入同步维护"""
+    __tablename__ = "book_authors"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False, default=0)  # 在 books.author 中的顺序
+    name = Column(String, nullable=False)  # 原始写法（去掉首尾空白）
+    normalized = Column(String, nullable=False, index=True)  # 去国籍前缀、间隔号、空白，小写
+    pinyin = Column(String, index=True)  # 中文名全拼（未安装 pypinyin 时为空）
+
+
+class BookAuthorTerm(Base):
+    """作者检索词：规范化名与拼音的后缀。子串查询 = 后缀上的前缀查询，走 (term, book_id) 索引范围扫描"""
+    __tablename__ = "book_author_terms"
+    __table_args__ = (
+        Index("ix_book_author_terms_term_book", "term", "book_id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    term = Column(String, nullable=False)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False, index=True)
+
+
 class Bookshelf(Base):
     """书架模型（用户-书籍关联）"""
     __tablename__ = "bookshelves"
+    __table_args__ = (
+        # 书架列表按 id 键集分页（带 / 不带状态筛选）
+        Index("ix_bookshelves_user_status_id", "user_id", "status", "id"),
+        Index("ix_bookshelves_user_id_id", "user_id", "id"),
+        # 同一用户同一本书只有一条书架记录（加入书架时按此查重）
+        Index("uq_bookshelves_user_book", "user_id", "book_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -72,6 +103,9 @@ class Bookshelf(Base):
 class UserPreference(Base):
     """用户偏好模型（记录"不感兴趣"等反馈）"""
     __tablename__ = "user_preferences"
+    __table_args__ = (
+        Index("ix_user_preferences_user_type_book", "user_id", "preference_type", "book_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -87,6 +121,9 @@ class UserPreference(Base):
 class ChatSession(Base):
     """AI书童对话会话模型"""
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        Index("ix_chat_sessions_user_book", "user_id", "book_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -119,6 +156,9 @@ class ChatSessionSummary(Base):
 class UserInterestFact(Base):
     """用户兴趣事实（知识索引层）"""
     __tablename__ = "user_interest_facts"
+    __table_args__ = (
+        Index("ix_user_interest_facts_user_value", "user_id", "fact_value"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -150,6 +190,12 @@ class UserReadingProfile(Base):
 class ChatMessage(Base):
     """AI书童对话记录模型"""
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # 会话消息按 id 键集分页（向前 / 向后）
+        Index("ix_chat_messages_session_id_id", "session_id", "id"),
+        # 最近 N 条对话上下文按 created_at 倒序读取
+        Index("ix_chat_messages_session_created", "session_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False)  # 所属会话
@@ -163,3 +209,75 @@ class ChatMessage(Base):
     session = relationship("ChatSession", back_populates="messages")
     user = relationship("User", back_populates="chat_messages")
     book = relationship("Book", back_populates="chat_messages")
+
+
+class PopularReasonCache(Base):
+    """热门推荐语持久缓存（多 worker 共享，重启不丢失）"""
+    __tablename__ = "popular_reason_cache"
+    __table_args__ = (
+        UniqueConstraint("book_id", "prompt_version", "model", name="uq_popular_reason_cache_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, nullable=False)
+    prompt_version = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    reason = Column(Text, nullable=False)
+    created_at = Column(Float, nullable=False)  # Unix 时间戳，便于新鲜度计算
+
+
+class EmbeddingCacheEntry(Base):
+    """查询文本 embedding 持久缓存（key 为 提供方+模型+维度+缓存版本+规范化文本 的哈希）"""
+    __tablename__ = "embedding_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)
+    provider = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    dimensions = Column(Integer, nullable=False)
+    cache_version = Column(Integer, nullable=False)
+    dtype = Column(String(8), nullable=False)  # float16 / float32
+    vector = Column(LargeBinary, nullable=False)
+    created_at = Column(Float, nullable=False)
+
+
+class IntentCacheEntry(Base):
+    """查询意图提取结果持久缓存（多 worker 共享）"""
+    __tablename__ = "intent_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)
+    model = Column(String, nullable=False)
+    prompt_version = Column(String, nullable=False)
+    result = Column(JSON, nullable=False)  # {"keywords", "emotions", "scenarios", "book_types"}
+    created_at = Column(Float, nullable=False, index=True)
+
+
+class QueryTranslationCacheEntry(Base):
+    """搜索词中译英持久缓存（多 worker 共享），按 last_used_at 淘汰最久未用的条目"""
+    __tablename__ = "query_translation_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)
+    query = Column(String, nullable=False)  # 规范化后的中文查询
+    translation = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(Float, nullable=False, index=True)  # Unix 时间戳，TTL 从写入时算起
+    last_used_at = Column(Float, nullable=False, index=True)
+
+
+class BookStats(Base):
+    """书籍热度统计（物化表）：书架增删改与「不感兴趣」时增量更新，定期与明细表对账"""
+    __tablename__ = "book_stats"
+    
+    book_id = Column(Integer, ForeignKey("books.id"), primary_key=True)
+    shelf_count = Column(Integer, nullable=False, default=0)  # 在书架中的总次数（各状态之和）
+    to_read_count = Column(Integer, nullable=False, default=0)
+    reading_count = Column(Integer, nullable=False, default=0)
+    read_count = Column(Integer, nullable=False, default=0)
+    dropped_count = Column(Integer, nullable=False, default=0)
+    not_interested_count = Column(Integer, nullable=False, default=0)
+    popularity_score = Column(Float, nullable=False, default=0.0, index=True)
+    last_activity_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,47 @@
+"""
+SQL 语句计数（测试 / 排查 N+1 用）：在 with 块内统计经过指定引擎执行的语句。
+    with count_queries() as log:
+        ...
+    assert log.count == 2, log.statements
+默认监听全部读写引擎（含异步引擎底层的同步引擎）；块内其他并发请求的语句也会被计入。
+"""
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from sqlalchemy import event
+
+
+class QueryLog:
+    def __init__(self):
+        self.statements: List[str] = []
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.statements.append(statement)
+
+
+def _default_engines() -> list:
+    from app.db.database import async_engine, async_read_engine, engine, read_engine
+    engines = [engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine]
+    return list({id(e): e for e in engines}.values())
+
+
+@contextmanager
+def count_queries(*engines) -> Iterator[QueryLog]:
+    """统计 with 块内执行的 SQL 语句（不含 SQLite 建连时执行的 PRAGMA）"""
+    targets = list(engines) or _default_engines()
+    targets = [getattr(e, "sync_engine", e) for e in targets]
+    log = QueryLog()
+    for target in targets:
+        event.listen(target, "before_cursor_execute", log._record)
+    try:
+        yield log
+    finally:
+        for target in targets:
+            event.remove(target, "before_cursor_execute", log._record)
@@ -0,0 +1,192 @@
+"""
+作者索引：books.author 拆成每位作者一行（book_authors），并为规范化名与拼音生成后缀检索词（book_author_terms）
+- 规范化：去掉国籍 / 朝代前缀（[美]、（清））、间隔号与空白，转小写，「[美] 特德·姜」->「特德姜」
+- 子串查询：名字的每个后缀各存一行，查「慈欣」即在 term 上做前缀范围查询 ['慈欣', '慈欣\\U0010ffff')，走索引
+- 拼音：安装 pypinyin 时中文名额外生成全拼在音节边界的后缀与首字母（liucixin / cixin / xin / lcx），未安装时跳过
+通过 Book 的 ORM 事件同步维护；绕过 ORM 批量写入的书由 backfill_missing 在启动时补建，
+安装 pypinyin 后需运行 scripts/rebuild_author_index.py 为已有作者补拼音。
+"""
+import asyncio
+import importlib.util
+import logging
+import re
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import and_, delete, event, insert, inspect as sa_inspect, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.db.models import Book, BookAuthor, BookAuthorTerm
+
+logger = logging.getLogger(__name__)
+
+# 作者名中的国籍 / 朝代前缀：[美]、（英）、【清】等
+_AUTHOR_PREFIX = re.compile(r"^\s*[\[（(【〔][^\]）)】〕]{1,4}[\]）)】〕]\s*")
+_AUTHOR_SPLIT = re.compile(r"[,，;；、/&]|\s+and\s+")
+_AUTHOR_NOISE = re.compile(r"[\s·・.．•\-]")
+_CJK = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+_MAX_TERM_SOURCE = 32  # 超长「作者」（多为编委会名单）只取前 32 个字符生成后缀
+_TERM_UPPER = "\U0010ffff"
+_BATCH = 500
+
+PINYIN_AVAILABLE = importlib.util.find_spec("pypinyin") is not None
+
+_backfill_task: Optional[asyncio.Task] = None
+
+
+def split_authors(raw: Optional[str]) -> List[str]:
+    """books.author 按合著者分隔符拆开（, ， ; ； 、 / & and）"""
+    return [part.strip() for part in _AUTHOR_SPLIT.split(raw or "") if part and part.strip()]
+
+
+def normalize_author(name: Optional[str]) -> str:
+    """作者名规范化：去国籍前缀、间隔号、空白，转小写（「[英] J.K. 罗琳」->「jk罗琳」）"""
+    return _AUTHOR_NOISE.sub("", _AUTHOR_PREFIX.sub("", name or "")).lower()
+
+
+def pinyin_syllables(normalized: str) -> Optional[List[str]]:
+    """含汉字时返回逐字拼音（小写）；未安装 pypinyin 或不含汉字时返回 None"""
+    if not PINYIN_AVAILABLE or not _CJK.search(normalized):
+        return None
+    from pypinyin import lazy_pinyin
+    return [s.lower() for s in lazy_pinyin(normalized) if s.strip()]
+
+
+def author_terms(normalized: str, syllables: Optional[Sequence[str]] = None) -> Set[str]:
+    """检索词：规范化名的全部后缀；有拼音时加上音节边界处的拼音后缀与首字母缩写"""
+    source = normalized[:_MAX_TERM_SOURCE]
+    terms = {source[i:] for i in range(len(source))}
+    if syllables:
+        terms.update("".join(syllables[i:]) for i in range(len(syllables)))
+        if len(syllables) >= 2:
+            terms.add("".join(s[0] for s in syllables))
+    return terms
+
+
+def _index_rows(book_id: int, raw: Optional[str]) -> Tuple[List[dict], List[dict]]:
+    authors, terms = [], set()
+    for position, name in enumerate(split_authors(raw)):
+        normalized = normalize_author(name)
+        if not normalized:
+            continue
+        syllables = pinyin_syllables(normalized)
+        authors.append({
+            "book_id": book_id,
+            "position": position,
+            "name": name,
+            "normalized": normalized,
+            "pinyin": "".join(syllables) if syllables else None,
+        })
+        terms |= author_terms(normalized, syllables)
+    return authors, [{"book_id": book_id, "term": t} for t in sorted(terms)]
+
+
+def _write(conn: Connection, rows: Iterable[Tuple[int, Optional[str]]]) -> int:
+    authors, terms = [], []
+    for book_id, raw in rows:
+        a, t = _index_rows(book_id, raw)
+        authors += a
+        terms += t
+    if authors:
+        conn.execute(insert(BookAuthor), authors)
+    if terms:
+        conn.execute(insert(BookAuthorTerm), terms)
+    return len(authors)
+
+
+def _clear(conn: Connection, book_ids: Sequence[int]) -> None:
+    conn.execute(delete(BookAuthorTerm).where(BookAuthorTerm.book_id.in_(book_ids)))
+    conn.execute(delete(BookAuthor).where(BookAuthor.book_id.in_(book_ids)))
+
+
+def index_book(conn: Connection, book_id: int, raw: Optional[str]) -> None:
+    """重建单本书的作者索引（先删后写）"""
+    _clear(conn, [book_id])
+    _write(conn, [(book_id, raw)])
+
+
+def rebuild_author_index(conn: Connection) -> int:
+    """全量重建（迁移与 scripts/rebuild_author_index.py 调用），按 id 分批，返回作者行数"""
+    conn.execute(delete(BookAuthorTerm))
+    conn.execute(delete(BookAuthor))
+    last_id, written = 0, 0
+    while True:
+        batch = conn.execute(
+            select(Book.id, Book.author).where(Book.id > last_id, Book.author.isnot(None))
+            .order_by(Book.id).limit(_BATCH)
+        ).all()
+        if not batch:
+            break
+        written += _write(conn, batch)
+        last_id = batch[-1][0]
+    return written
+
+
+def backfill_missing(engine: Engine) -> int:
+    """为有作者却没有索引行的书补建（脚本绕过 ORM 批量导入的书），返回补建的书数"""
+    indexed = select(BookAuthor.book_id)
+    last_id, total = 0, 0
+    with engine.begin() as conn:
+        while True:
+            batch = conn.execute(
+                select(Book.id, Book.author)
+                .where(Book.id > last_id, Book.author.isnot(None), Book.author != "", Book.id.not_in(indexed))
+                .order_by(Book.id).limit(_BATCH)
+            ).all()
+            if not batch:
+                break
+            _write(conn, batch)
+            last_id = batch[-1][0]
+            total += len(batch)
+    if total:
+        logger.info("作者索引补建 %d 本书", total)
+    return total
+
+
+def _backfill_safely() -> None:
+    from app.db.database import engine
+    try:
+        backfill_missing(engine)
+    except Exception as e:
+        logger.warning("作者索引补建失败，作者搜索可能漏掉新导入的书: %s", e)
+
+
+def start_backfill() -> None:
+    """应用启动时调用：在线程中补建缺失的作者索引，不阻塞启动"""
+    global _backfill_task
+    if _backfill_task is not None and not _backfill_task.done():
+        return
+    _backfill_task = asyncio.create_task(asyncio.to_thread(_backfill_safely))
+
+
+def term_prefix(key: str) -> ColumnElement:
+    """检索词以 key 开头（= 规范化名或拼音中含子串 key），(term, book_id) 索引上的范围条件"""
+    return and_(BookAuthorTerm.term >= key, BookAuthorTerm.term < key + _TERM_UPPER)
+
+
+def author_condition(author: str) -> Optional[ColumnElement]:
+    """作者子串 / 拼音查询条件（Book.id IN 索引子查询）；规范化后为空时返回 None，由调用方回退到 LIKE"""
+    key = normalize_author(author)
+    if not key:
+        return None
+    return Book.id.in_(select(BookAuthorTerm.book_id).where(term_prefix(key)))
+
+
+def _after_insert(mapper, connection, target: Book) -> None:
+    if target.author:
+        _write(connection, [(target.id, target.author)])
+
+
+def _after_update(mapper, connection, target: Book) -> None:
+    if sa_inspect(target).attrs.author.history.has_changes():
+        index_book(connection, target.id, target.author)
+
+
+def _before_delete(mapper, connection, target: Book) -> None:
+    # 先删索引行（外键引用 books.id）
+    _clear(connection, [target.id])
+
+
+event.listen(Book, "after_insert", _after_insert)
+event.listen(Book, "after_update", _after_update)
+event.listen(Book, "before_delete", _before_delete)
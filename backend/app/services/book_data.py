@@ -7,6 +7,7 @@ import httpx
 from typing import List, Dict, Any, Optional
 
 from app.services.douban_service import DoubanBookService
+from app.services.http_client import get_http_client, PROVIDER_OPENLIBRARY
 
 logger = logging.getLogger(__name__)
 
@@ -30,23 +31,23 @@ class BookDataService:
         last_err = None
         for attempt in range(2):
             try:
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    response = await client.get(
-                        self.OPEN_LIBRARY_SEARCH_URL,
-                        params={"q": query, "limit": limit},
-                    )
-                    response.raise_for_status()
-                    data = response.json()
-                    books = []
-                    docs = data.get("docs", [])
-                    print(f"    API 返回 {len(docs)} 条结果")
-                    for doc in docs[:limit]:
-                        book = await self._parse_book_data(doc)
-                        if book:
-                            books.append(book)
-                        else:
-                            print(f"    ⚠️  解析失败: {doc.get('title', 'N/A')}")
-                    return books
+                client = get_http_client(PROVIDER_OPENLIBRARY)
+                response = await client.get(
+                    self.OPEN_LIBRARY_SEARCH_URL,
+                    params={"q": query, "limit": limit},
+                )
+                response.raise_for_status()
+                data = response.json()
+                books = []
+                docs = data.get("docs", [])
+                print(f"    API 返回 {len(docs)} 条结果")
+                for doc in docs[:limit]:
+                    book = await self._parse_book_data(doc)
+                    if book:
+                        books.append(book)
+                    else:
+                        print(f"    ⚠️  解析失败: {doc.get('title', 'N/A')}")
+                return books
             except (httpx.HTTPError, httpx.TimeoutException, Exception) as e:
                 last_err = e
                 print(f"    ⚠️  Open Library 请求失败 (尝试 {attempt + 1}/2): {e}")
@@ -57,18 +58,18 @@ class BookDataService:
     
     async def get_book_by_isbn(self, isbn: str) -> Optional[Dict[str, Any]]:
         """根据 ISBN 获取书籍"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                self.OPEN_LIBRARY_SEARCH_URL,
-                params={"isbn": isbn},
-                timeout=30.0
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("docs"):
-                return await self._parse_book_data(data["docs"][0])
-            return None
+        client = get_http_client(PROVIDER_OPENLIBRARY)
+        response = await client.get(
+            self.OPEN_LIBRARY_SEARCH_URL,
+            params={"isbn": isbn},
+            timeout=30.0
+        )
+        response.raise_for_status()
+        data = response.json()
+        
+        if data.get("docs"):
+            return await self._parse_book_data(data["docs"][0])
+        return None
     
     async def _parse_book_data(self, doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """解析 Open Library 数据"""
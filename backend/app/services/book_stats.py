@@ -0,0 +1,191 @@
+"""
+书籍热度物化表 book_stats 的维护
+- 书架增删改、标记「不感兴趣」提交后增量更新（UPDATE col = col + delta，行不存在时插入）
+- 后台定期从 bookshelves / user_preferences 重新聚合对账，修正并发写入或旁路写入（脚本、级联删除）造成的偏差
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import BookStats, Bookshelf, UserPreference
+
+logger = logging.getLogger(__name__)
+
+# 书架状态 -> 计数列
+STATUS_COLUMNS = {
+    "to_read": "to_read_count",
+    "reading": "reading_count",
+    "read": "read_count",
+    "dropped": "dropped_count",
+}
+COUNT_COLUMNS = ("shelf_count", *STATUS_COLUMNS.values(), "not_interested_count")
+
+_reconcile_task: Optional[asyncio.Task] = None
+
+
+def popularity_score(shelf_count: int) -> float:
+    """热度分：书架总次数（与原先对 bookshelves GROUP BY 计数的口径一致）"""
+    return float(shelf_count or 0)
+
+
+async def _apply_delta(db: AsyncSession, book_id: int, deltas: Dict[str, int]) -> None:
+    """在独立事务中累加计数；失败只记日志，由定期对账修正"""
+    deltas = {col: d for col, d in deltas.items() if d}
+    if not deltas:
+        return
+    now = datetime.now(timezone.utc)
+    values = {col: getattr(BookStats, col) + d for col, d in deltas.items()}
+    values["popularity_score"] = BookStats.shelf_count + deltas.get("shelf_count", 0)
+    values["last_activity_at"] = now
+    stmt = update(BookStats).where(BookStats.book_id == book_id).values(**values)
+    try:
+        for _ in range(2):
+            result = await db.execute(stmt)
+            if result.rowcount:
+                await db.commit()
+                return
+            counts = {col: max(deltas.get(col, 0), 0) for col in COUNT_COLUMNS}
+            db.add(BookStats(
+                book_id=book_id,
+                popularity_score=popularity_score(counts["shelf_count"]),
+                last_activity_at=now,
+                **counts,
+            ))
+            try:
+                await db.commit()
+                return
+            except IntegrityError:
+                # 并发请求已插入该行，回滚后改走 UPDATE
+                await db.rollback()
+    except Exception as e:
+        logger.warning("更新 book_stats 失败 (book_id=%s): %s", book_id, e)
+        await db.rollback()
+
+
+async def record_shelf_change(
+    db: AsyncSession,
+    book_id: int,
+    old_status: Optional[str],
+    new_status: Optional[str],
+) -> None:
+    """书架变更：old_status 为 None 表示新加入，new_status 为 None 表示移出"""
+    if old_status == new_status:
+        return
+    deltas: Dict[str, int] = {}
+    if old_status is None:
+        deltas["shelf_count"] = 1
+    elif new_status is None:
+        deltas["shelf_count"] = -1
+    if old_status in STATUS_COLUMNS:
+        deltas[STATUS_COLUMNS[old_status]] = deltas.get(STATUS_COLUMNS[old_status], 0) - 1
+    if new_status in STATUS_COLUMNS:
+        deltas[STATUS_COLUMNS[new_status]] = deltas.get(STATUS_COLUMNS[new_status], 0) + 1
+    await _apply_delta(db, book_id, deltas)
+
+
+async def record_not_interested(db: AsyncSession, book_id: int) -> None:
+    await _apply_delta(db, book_id, {"not_interested_count": 1})
+
+
+async def reconcile(db: AsyncSession) -> int:
+    """按明细表重新聚合并写回 book_stats，返回被修正（含新建）的行数"""
+    fresh: Dict[int, Dict[str, int]] = {}
+    last_activity: Dict[int, datetime] = {}
+
+    def _counts(book_id: int) -> Dict[str, int]:
+        return fresh.setdefault(book_id, {col: 0 for col in COUNT_COLUMNS})
+
+    def _touch(book_id: int, ts: Optional[datetime]) -> None:
+        if ts is not None and (book_id not in last_activity or ts > last_activity[book_id]):
+            last_activity[book_id] = ts
+
+    shelf_rows = (await db.execute(
+        select(
+            Bookshelf.book_id,
+            Bookshelf.status,
+            func.count(Bookshelf.id),
+            func.max(func.coalesce(Bookshelf.updated_at, Bookshelf.created_at)),
+        ).group_by(Bookshelf.book_id, Bookshelf.status)
+    )).all()
+    for book_id, status, cnt, ts in shelf_rows:
+        counts = _counts(book_id)
+        counts["shelf_count"] += cnt
+        if status in STATUS_COLUMNS:
+            counts[STATUS_COLUMNS[status]] += cnt
+        _touch(book_id, ts)
+
+    pref_rows = (await db.execute(
+        select(UserPreference.book_id, func.count(UserPreference.id), func.max(UserPreference.created_at))
+        .where(UserPreference.preference_type == "not_interested")
+        .group_by(UserPreference.book_id)
+    )).all()
+    for book_id, cnt, ts in pref_rows:
+        _counts(book_id)["not_interested_count"] += cnt
+        _touch(book_id, ts)
+
+    existing = {row.book_id: row for row in (await db.execute(select(BookStats))).scalars()}
+    zeros = {col: 0 for col in COUNT_COLUMNS}
+    corrected = 0
+    for book_id in set(fresh) | set(existing):
+        counts = fresh.get(book_id, zeros)
+        row = existing.get(book_id)
+        if row is None:
+            db.add(BookStats(
+                book_id=book_id,
+                popularity_score=popularity_score(counts["shelf_count"]),
+                last_activity_at=last_activity.get(book_id),
+                **counts,
+            ))
+        elif any(getattr(row, col) != counts[col] for col in COUNT_COLUMNS):
+            for col, value in counts.items():
+                setattr(row, col, value)
+            row.popularity_score = popularity_score(counts["shelf_count"])
+            if row.last_activity_at is None:
+                row.last_activity_at = last_activity.get(book_id)
+        else:
+            continue
+        corrected += 1
+    await db.commit()
+    return corrected
+
+
+async def _reconcile_loop(interval: float) -> None:
+    from app.db.database import AsyncSessionLocal
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                corrected = await reconcile(db)
+            if corrected:
+                logger.info("book_stats 对账完成，修正 %d 行", corrected)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("book_stats 对账失败: %s", e)
+        await asyncio.sleep(interval)
+
+
+def start_reconciliation() -> None:
+    """应用启动时调用：立即对账一次（补齐已有数据），之后按 BOOK_STATS_RECONCILE_SECONDS 周期执行"""
+    global _reconcile_task
+    interval = settings.BOOK_STATS_RECONCILE_SECONDS
+    if interval <= 0 or (_reconcile_task is not None and not _reconcile_task.done()):
+        return
+    _reconcile_task = asyncio.create_task(_reconcile_loop(interval))
+
+
+async def stop_reconciliation() -> None:
+    global _reconcile_task
+    if _reconcile_task is None:
+        return
+    _reconcile_task.cancel()
+    try:
+        await _reconcile_task
+    except asyncio.CancelledError:
+        pass
+    _reconcile_task = None
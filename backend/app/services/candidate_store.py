@@ -0,0 +1,209 @@
+"""
+「推荐你看」列式候选库：全量书目的评分 / 热度 / 作者与类别编码存为 NumPy 数组，
+个性化打分（相似度 + 作者/类别匹配 - 弃读惩罚，再与评分、热度加权）整体用数组运算完成，
+每次请求对全库打分也只需亚毫秒级。书目或 book_stats 变化后自动重建对应列。
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import LatencyStats
+from app.db.models import Book, BookStats
+
+logger = logging.getLogger(__name__)
+
+
+class Candidate(NamedTuple):
+    """打分结果中的一本书（多样性重排只需作者与类别，不必加载 ORM 对象）"""
+    id: int
+    author: str
+    category: str
+
+
+def _min_max(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """按 mask 内的取值做 Min-max 归一化到 [0, 1]；全部相同时取 0.5（与原 _normalize_scores 一致）"""
+    out = np.zeros_like(values)
+    if not mask.any():
+        return out
+    lo = values[mask].min()
+    hi = values[mask].max()
+    if hi <= lo:
+        out[:] = 0.5
+        return out
+    return (values - lo) / (hi - lo)
+
+
+class _Columns:
+    """一次构建后只读的列快照，刷新时整体替换，打分期间无需加锁"""
+
+    def __init__(self, ids, ratings, authors, categories, signature):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(self.ids, kind="stable")
+        self.ids = self.ids[order]
+        self.ratings = np.asarray(ratings, dtype=np.float32)[order] / 10.0
+        author_names = [authors[i] for i in order]
+        category_names = [categories[i] for i in order]
+        self.author_vocab: Dict[str, int] = {}
+        self.category_vocab: Dict[str, int] = {}
+        self.author_codes = self._encode(author_names, self.author_vocab)
+        self.category_codes = self._encode(category_names, self.category_vocab)
+        self.author_names = author_names
+        self.category_names = category_names
+        self.set_popularity(np.zeros(len(self.ids), dtype=np.float32))
+        self.signature = signature
+
+    def set_popularity(self, popularity: np.ndarray) -> None:
+        self.popularity = popularity
+        self.log_popularity = np.log1p(np.maximum(popularity, 0))
+
+    @staticmethod
+    def _encode(names: List[str], vocab: Dict[str, int]) -> np.ndarray:
+        codes = np.empty(len(names), dtype=np.int32)
+        for i, name in enumerate(names):
+            codes[i] = vocab.setdefault(name, len(vocab)) if name else -1
+        return codes
+
+    def positions(self, book_ids) -> Tuple[np.ndarray, np.ndarray]:
+        """book_id -> (行号, 是否存在)；行号只在对应位置为 True 时有效"""
+        wanted = np.asarray(book_ids, dtype=np.int64)
+        if not len(wanted) or not len(self.ids):
+            return np.zeros(len(wanted), dtype=np.int64), np.zeros(len(wanted), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.ids, wanted), len(self.ids) - 1)
+        return pos, self.ids[pos] == wanted
+
+    @staticmethod
+    def match(names: Set[str], vocab: Dict[str, int], codes: np.ndarray) -> np.ndarray:
+        """codes 中属于 names 的行：查表而非 np.isin，编码 -1（空值）落在表尾恒为 False"""
+        table = np.zeros(len(vocab) + 1, dtype=bool)
+        hits = [vocab[n] for n in names if n in vocab]
+        if not hits:
+            return np.zeros(len(codes), dtype=bool)
+        table[hits] = True
+        return table[codes]
+
+
+class CandidateStore:
+    """全库候选列存储（进程级单例）"""
+
+    _CHECK_INTERVAL = 5.0  # 检查书目 / 热度是否变化的最短间隔（秒）
+
+    def __init__(self):
+        self._columns: Optional[_Columns] = None
+        self._stats_signature = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self.scoring_latency = LatencyStats()
+        self.refreshes = 0
+
+    async def ensure_fresh(self, db: AsyncSession) -> _Columns:
+        """书目签名（数量 / 最大 id / 评分和）或 book_stats 签名变化时重建对应列"""
+        columns = self._columns
+        if columns is not None and time.monotonic() - self._checked_at < self._CHECK_INTERVAL:
+            return columns
+        async with self._lock:
+            if self._columns is not None and time.monotonic() - self._checked_at < self._CHECK_INTERVAL:
+                return self._columns
+            catalog_sig = tuple((await db.execute(
+                select(func.count(Book.id), func.max(Book.id), func.sum(Book.rating))
+            )).one())
+            stats_sig = tuple((await db.execute(
+                select(func.count(BookStats.book_id), func.max(BookStats.updated_at), func.sum(BookStats.shelf_count))
+            )).one())
+            columns = self._columns
+            if columns is None or columns.signature != catalog_sig:
+                rows = (await db.execute(select(Book.id, Book.rating, Book.author, Book.category))).all()
+                columns = _Columns(
+                    [r[0] for r in rows],
+                    [float(r[1] or 0) for r in rows],
+                    [(r[2] or "").strip() for r in rows],
+                    [(r[3] or "").strip() for r in rows],
+                    catalog_sig,
+                )
+                self._stats_signature = None
+                self.refreshes += 1
+                logger.info("候选列存储已重建: %d 本书", len(columns.ids))
+            if self._stats_signature != stats_sig:
+                stats = (await db.execute(select(BookStats.book_id, BookStats.shelf_count))).all()
+                popularity = np.zeros(len(columns.ids), dtype=np.float32)
+                if stats:
+                    pos, found = columns.positions([r[0] for r in stats])
+                    counts = np.array([r[1] or 0 for r in stats], dtype=np.float32)
+                    popularity[pos[found]] = counts[found]
+                columns.set_popularity(popularity)
+                self._stats_signature = stats_sig
+            self._columns = columns
+            self._checked_at = time.monotonic()
+            return columns
+
+    def score(
+        self,
+        columns: _Columns,
+        top_n: int,
+        excluded_ids: Set[int],
+        sim_map: Dict[int, float],
+        preferred_authors: Set[str],
+        preferred_categories: Set[str],
+        dropped_authors: Set[str],
+        personalized: bool,
+    ) -> np.ndarray:
+        """对全库打分，返回得分最高的 top_n 本的行号（按得分降序）"""
+        started = time.perf_counter()
+        n = len(columns.ids)
+        if not n:
+            return np.empty(0, dtype=np.int64)
+        mask = np.ones(n, dtype=bool)
+        if excluded_ids:
+            pos, found = columns.positions(list(excluded_ids))
+            mask[pos[found]] = False
+
+        r = _min_max(columns.ratings, mask)
+        p = _min_max(columns.log_popularity, mask)
+        if personalized:
+            sim = np.zeros(n, dtype=np.float32)
+            if sim_map:
+                pos, found = columns.positions(np.fromiter(sim_map.keys(), dtype=np.int64, count=len(sim_map)))
+                values = np.fromiter(sim_map.values(), dtype=np.float32, count=len(sim_map))
+                sim[pos[found]] = values[found]
+            author_match = columns.match(preferred_authors, columns.author_vocab, columns.author_codes)
+            cat_match = columns.match(preferred_categories, columns.category_vocab, columns.category_codes)
+            dropped = columns.match(dropped_authors, columns.author_vocab, columns.author_codes)
+            personal = np.clip(sim * 0.5 + 0.3 * author_match + 0.2 * cat_match - 0.4 * dropped, 0, 1)
+            final = 0.5 * personal + 0.3 * r + 0.2 * p
+        else:
+            # 新用户：评分 + 热度
+            final = 0.6 * r + 0.4 * p
+        final = np.where(mask, final, -np.inf)
+
+        k = min(top_n, int(mask.sum()))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-final, k - 1)[:k] if k < n else np.arange(n)
+        # 同分时评分高、id 大的在前（与原先候选池的排序一致）
+        top = top[np.lexsort((-columns.ids[top], -columns.ratings[top], -final[top]))]
+        self.scoring_latency.record(time.perf_counter() - started)
+        return top
+
+    @staticmethod
+    def candidates(columns: _Columns, rows: np.ndarray) -> List[Candidate]:
+        """行号 -> Candidate 列表（供多样性重排与分页）"""
+        authors, categories = columns.author_names, columns.category_names
+        return [
+            Candidate(book_id, authors[i], categories[i])
+            for book_id, i in zip(columns.ids[rows].tolist(), rows.tolist())
+        ]
+
+    def stats(self) -> Dict[str, object]:
+        columns = self._columns
+        return {
+            "books": int(len(columns.ids)) if columns is not None else 0,
+            "refreshes": self.refreshes,
+            "scoring": self.scoring_latency.snapshot(),
+        }
+
+
+candidate_store = CandidateStore()
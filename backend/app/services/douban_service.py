@@ -8,6 +8,7 @@ from typing import List, Dict, Any, Optional
 import httpx
 
 from app.core.config import settings
+from app.services.http_client import get_http_client, PROVIDER_DOUBAN
 
 logger = logging.getLogger(__name__)
 
@@ -37,12 +38,10 @@ class DoubanBookService:
         if getattr(settings, "DOUBAN_API_KEY", "") and str(settings.DOUBAN_API_KEY).strip():
             params["apikey"] = settings.DOUBAN_API_KEY.strip()
         try:
-            async with httpx.AsyncClient(
-                headers=DEFAULT_HEADERS, timeout=15.0
-            ) as client:
-                response = await client.get(self.SEARCH_URL, params=params)
-                response.raise_for_status()
-                data = response.json()
+            client = get_http_client(PROVIDER_DOUBAN)
+            response = await client.get(self.SEARCH_URL, params=params, headers=DEFAULT_HEADERS)
+            response.raise_for_status()
+            data = response.json()
 
             books_raw = data.get("books", [])
             result = []
@@ -77,14 +76,12 @@ class DoubanBookService:
         if getattr(settings, "DOUBAN_API_KEY", "") and str(settings.DOUBAN_API_KEY).strip():
             params["apikey"] = settings.DOUBAN_API_KEY.strip()
         try:
-            async with httpx.AsyncClient(
-                headers=DEFAULT_HEADERS, timeout=15.0
-            ) as client:
-                isbn_clean = str(isbn).replace("-", "").strip()
-                url = f"{self.BASE_URL}/isbn/{isbn_clean}"
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
+            client = get_http_client(PROVIDER_DOUBAN)
+            isbn_clean = str(isbn).replace("-", "").strip()
+            url = f"{self.BASE_URL}/isbn/{isbn_clean}"
+            response = await client.get(url, params=params, headers=DEFAULT_HEADERS)
+            response.raise_for_status()
+            data = response.json()
 
             return self._parse_book(data)
         except httpx.HTTPStatusError as e:
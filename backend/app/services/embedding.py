@@ -3,9 +3,10 @@ Embedding 服务：优先智谱 BigModel Embedding-3，其次 OpenAI，未配置
 """
 import asyncio
 import logging
-from typing import List
+from typing import List, Optional
 import httpx
 from app.core.config import settings
+from app.services.http_client import get_http_client, PROVIDER_EMBEDDING
 
 logger = logging.getLogger(__name__)
 
@@ -75,8 +76,15 @@ class EmbeddingService:
             self.dimensions = None
             logger.info("Embedding 使用本地 sentence-transformers（未配置 BIGMODEL_API_KEY / OPENAI_API_KEY）")
 
+        # 远程 API 结果缓存（本地模型计算便宜且可能回退为哈希向量，不缓存）
+        self._cache = None
+        if settings.EMBEDDING_CACHE_ENABLED and (self._use_bigmodel or self._use_openai):
+            from app.services.embedding_cache import EmbeddingCache
+            provider = "bigmodel" if self._use_bigmodel else "openai"
+            self._cache = EmbeddingCache(provider, self.model, self.dimensions)
+
     async def get_embedding(self, text: str) -> List[float]:
-        """获取单个文本的 embedding"""
+        """获取单个文本的 embedding（不走缓存：书籍入库 / 生成向量时的文档文本只算一次，且需全精度写入向量库）"""
         if self._use_bigmodel:
             return await self._get_embedding_bigmodel(text)
         if self._use_openai:
@@ -84,6 +92,21 @@ class EmbeddingService:
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(None, _encode_sync, text)
 
+    async def get_query_embedding(self, text: str) -> List[float]:
+        """用户查询文本的 embedding（语义推荐、混合检索）：远程 API 结果走缓存"""
+        if self._cache is None:
+            return await self.get_embedding(text)
+        cached = self._cache.get(text)
+        if cached is not None:
+            return cached
+        emb = await self.get_embedding(text)
+        self._cache.set(text, emb)
+        return emb
+
+    def cache_stats(self) -> Optional[dict]:
+        """embedding 缓存命中统计（未启用缓存时为 None）"""
+        return self._cache.stats() if self._cache is not None else None
+
     async def _get_embedding_bigmodel(self, text: str) -> List[float]:
         """调用智谱 BigModel Embedding-3 API"""
         if not text or not text.strip():
@@ -92,22 +115,21 @@ class EmbeddingService:
         if self.dimensions is not None:
             body["dimensions"] = self.dimensions
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self._embed_url,
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json=body,
-                    timeout=30.0,
-                )
-                response.raise_for_status()
-                data = response.json()
-                emb = (data.get("data") or [{}])[0].get("embedding")
-                if not emb:
-                    raise ValueError("BigModel 返回的 embedding 为空")
-                return list(emb)
+            client = get_http_client(PROVIDER_EMBEDDING)
+            response = await client.post(
+                self._embed_url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                json=body,
+            )
+            response.raise_for_status()
+            data = response.json()
+            emb = (data.get("data") or [{}])[0].get("embedding")
+            if not emb:
+                raise ValueError("BigModel 返回的 embedding 为空")
+            return list(emb)
         except httpx.HTTPStatusError as e:
             logger.warning("BigModel Embedding API 错误: %s %s", e.response.status_code, e.response.text[:200])
             raise
@@ -120,22 +142,21 @@ class EmbeddingService:
         if not text or not text.strip():
             text = " "
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self._embed_url,
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={"model": self.model, "input": text[:8191]},
-                    timeout=30.0,
-                )
-                response.raise_for_status()
-                data = response.json()
-                emb = (data.get("data") or [{}])[0].get("embedding")
-                if not emb:
-                    raise ValueError("OpenAI 返回的 embedding 为空")
-                return list(emb)
+            client = get_http_client(PROVIDER_EMBEDDING)
+            response = await client.post(
+                self._embed_url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                json={"model": self.model, "input": text[:8191]},
+            )
+            response.raise_for_status()
+            data = response.json()
+            emb = (data.get("data") or [{}])[0].get("embedding")
+            if not emb:
+                raise ValueError("OpenAI 返回的 embedding 为空")
+            return list(emb)
         except httpx.HTTPStatusError as e:
             logger.warning("OpenAI Embedding API 错误: %s %s", e.response.status_code, e.response.text[:200])
             raise
@@ -164,44 +185,44 @@ class EmbeddingService:
             if self.dimensions is not None:
                 body["dimensions"] = self.dimensions
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        self._embed_url,
-                        headers={
-                            "Authorization": f"Bearer {self.api_key}",
-                            "Content-Type": "application/json",
-                        },
-                        json=body,
-                        timeout=60.0,
-                    )
-                    response.raise_for_status()
-                    data = response.json()
-                    items = sorted((data.get("data") or []), key=lambda x: x.get("index", 0))
-                    all_embeddings.extend([list(item["embedding"]) for item in items if "embedding" in item])
-            except Exception as e:
-                logger.warning("BigModel 批量 Embedding 第 %d 批失败: %s，该批回退逐条", i // batch_size + 1, e)
-                for t in texts[i : i + len(batch)]:
-                    all_embeddings.append(await self.get_embedding(t))
-        return all_embeddings
-
-    async def _get_embeddings_openai(self, texts: List[str]) -> List[List[float]]:
-        """OpenAI 批量"""
-        inputs = [t[:8191] if t and t.strip() else " " for t in texts]
-        try:
-            async with httpx.AsyncClient() as client:
+                client = get_http_client(PROVIDER_EMBEDDING)
                 response = await client.post(
                     self._embed_url,
                     headers={
                         "Authorization": f"Bearer {self.api_key}",
                         "Content-Type": "application/json",
                     },
-                    json={"model": self.model, "input": inputs},
+                    json=body,
                     timeout=60.0,
                 )
                 response.raise_for_status()
                 data = response.json()
                 items = sorted((data.get("data") or []), key=lambda x: x.get("index", 0))
-                return [list(item["embedding"]) for item in items if "embedding" in item]
+                all_embeddings.extend([list(item["embedding"]) for item in items if "embedding" in item])
+            except Exception as e:
+                logger.warning("BigModel 批量 Embedding 第 %d 批失败: %s，该批回退逐条", i // batch_size + 1, e)
+                for t in texts[i : i + len(batch)]:
+                    all_embeddings.append(await self.get_embedding(t))
+        return all_embeddings
+
+    async def _get_embeddings_openai(self, texts: List[str]) -> List[List[float]]:
+        """OpenAI 批量"""
+        inputs = [t[:8191] if t and t.strip() else " " for t in texts]
+        try:
+            client = get_http_client(PROVIDER_EMBEDDING)
+            response = await client.post(
+                self._embed_url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                json={"model": self.model, "input": inputs},
+                timeout=60.0,
+            )
+            response.raise_for_status()
+            data = response.json()
+            items = sorted((data.get("data") or []), key=lambda x: x.get("index", 0))
+            return [list(item["embedding"]) for item in items if "embedding" in item]
         except Exception as e:
             logger.warning("OpenAI 批量 Embedding 失败，回退逐条: %s", e)
             return [await self.get_embedding(t) for t in texts]
@@ -0,0 +1,150 @@
+"""
+查询 embedding 两级缓存：进程内有界 LRU + SQLite 持久表（向量以 float16/float32 二进制存储）
+key = sha256(提供方 | 模型 | 维度 | 缓存版本 | 规范化文本)，维度或版本变化后旧条目自然失效并被清理
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """全角转半角、合并空白、去首尾空白并转小写，使「治愈 」与「治愈」命中同一条缓存"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+class EmbeddingCache:
+    """按 (提供方, 模型, 维度) 区分的 embedding 缓存"""
+
+    def __init__(self, provider: str, model: str, dimensions: Optional[int]):
+        self.provider = provider
+        self.model = model or "local"
+        self.dimensions = int(dimensions or 0)  # 0 表示由模型决定（OpenAI / 本地模型）
+        self.version = settings.EMBEDDING_CACHE_VERSION
+        self.dtype = "float16" if settings.EMBEDDING_CACHE_DTYPE == "float16" else "float32"
+        self._memory = LRUCache(maxsize=settings.EMBEDDING_CACHE_MEMORY_SIZE)
+        self._purge_lock = threading.Lock()
+        self._purged = False
+        self.db_hits = 0
+        self.misses = 0
+
+    def make_key(self, text: str) -> str:
+        raw = f"{self.provider}|{self.model}|{self.dimensions}|{self.version}|{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = self.make_key(text)
+        emb = self._memory.get(key)
+        if emb is not None:
+            return emb
+        emb = self._load(key)
+        if emb is None:
+            self.misses += 1
+            return None
+        self.db_hits += 1
+        self._memory.set(key, emb)
+        return emb
+
+    def set(self, text: str, embedding: List[float]) -> None:
+        if not embedding:
+            return
+        key = self.make_key(text)
+        self._memory.set(key, list(embedding))
+        self._purge_outdated()
+        blob = np.asarray(embedding, dtype=self.dtype).tobytes()
+        db = SessionLocal()
+        try:
+            row = db.query(EmbeddingCacheEntry).filter(EmbeddingCacheEntry.cache_key == key).first()
+            if row:
+                row.vector = blob
+                row.dtype = self.dtype
+                row.created_at = time.time()
+            else:
+                db.add(EmbeddingCacheEntry(
+                    cache_key=key,
+                    provider=self.provider,
+                    model=self.model,
+                    dimensions=self.dimensions,
+                    cache_version=self.version,
+                    dtype=self.dtype,
+                    vector=blob,
+                    created_at=time.time(),
+                ))
+            db.commit()
+        except Exception as e:
+            # 并发写入同一 key 时可能触发唯一约束，内存层已更新，忽略即可
+            logger.warning("写入 embedding 缓存失败: %s", e)
+            db.rollback()
+        finally:
+            db.close()
+
+    def _load(self, key: str) -> Optional[List[float]]:
+        db = SessionLocal()
+        try:
+            row = db.query(EmbeddingCacheEntry.vector, EmbeddingCacheEntry.dtype).filter(
+                EmbeddingCacheEntry.cache_key == key
+            ).first()
+            if not row:
+                return None
+            return np.frombuffer(row[0], dtype=row[1]).astype(np.float32).tolist()
+        except Exception as e:
+            logger.warning("读取 embedding 缓存失败: %s", e)
+            return None
+        finally:
+            db.close()
+
+    def _purge_outdated(self) -> None:
+        """删除同一提供方/模型下维度或缓存版本不一致的旧条目（每个进程首次写入时执行一次）"""
+        if self._purged:
+            return
+        with self._purge_lock:
+            if self._purged:
+                return
+            self._purged = True
+            db = SessionLocal()
+            try:
+                deleted = db.query(EmbeddingCacheEntry).filter(
+                    EmbeddingCacheEntry.provider == self.provider,
+                    EmbeddingCacheEntry.model == self.model,
+                    (EmbeddingCacheEntry.dimensions != self.dimensions)
+                    | (EmbeddingCacheEntry.cache_version != self.version),
+                ).delete(synchronize_session=False)
+                db.commit()
+                if deleted:
+                    logger.info("已清理 %d 条过期 embedding 缓存（维度或版本变化）", deleted)
+            except Exception as e:
+                logger.warning("清理 embedding 缓存失败: %s", e)
+                db.rollback()
+            finally:
+                db.close()
+
+    def stats(self) -> dict:
+        memory = self._memory.stats()
+        hits = memory["hits"] + self.db_hits
+        total = hits + self.misses
+        return {
+            "memory": memory,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "provider": self.provider,
+            "model": self.model,
+            "dimensions": self.dimensions,
+            "version": self.version,
+            "dtype": self.dtype,
+        }
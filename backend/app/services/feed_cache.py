@@ -0,0 +1,62 @@
+"""
+「推荐你看」每用户排序快照：首次请求时算好整条候选序列（最多 300 本），后续分页直接切片。
+失效条件：该用户书架或「不感兴趣」变化（接口内显式失效）、书目签名变化、超过 TTL。
+多 worker 部署时其他 worker 上的旧快照最迟在 TTL 后失效。
+"""
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+
+class FeedSnapshot:
+    __slots__ = ("feed_id", "book_ids", "catalog_signature", "created_at")
+
+    def __init__(self, book_ids: List[int], catalog_signature: Any):
+        self.feed_id = uuid.uuid4().hex[:12]
+        self.book_ids = book_ids
+        self.catalog_signature = catalog_signature
+        self.created_at = time.time()
+
+
+class FeedCache:
+    def __init__(self):
+        self._memory = LRUCache(maxsize=settings.FEED_CACHE_SIZE, ttl=settings.FEED_SNAPSHOT_TTL_SECONDS)
+        self._lock = threading.Lock()
+        self.invalidations = 0
+        self.rebuilds = 0
+
+    def get(self, user_id: int, catalog_signature: Any) -> Optional[FeedSnapshot]:
+        snapshot = self._memory.get(user_id)
+        if snapshot is None:
+            return None
+        if snapshot.catalog_signature != catalog_signature:
+            self._memory.pop(user_id)
+            return None
+        return snapshot
+
+    def put(self, user_id: int, book_ids: List[int], catalog_signature: Any) -> FeedSnapshot:
+        snapshot = FeedSnapshot(book_ids, catalog_signature)
+        self._memory.set(user_id, snapshot)
+        with self._lock:
+            self.rebuilds += 1
+        return snapshot
+
+    def invalidate(self, user_id: int) -> None:
+        self._memory.pop(user_id)
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "memory": self._memory.stats(),
+            "rebuilds": self.rebuilds,
+            "invalidations": self.invalidations,
+            "ttl_seconds": settings.FEED_SNAPSHOT_TTL_SECONDS,
+        }
+
+
+feed_cache = FeedCache()
@@ -1,196 +1,364 @@
 """
 SQLite FTS（全文搜索）服务
 用于精确搜索的性能优化：比 LIKE 查询快 10-100 倍
+
+中文分词：FTS5 默认的 unicode61 分词器把一整段连续汉字当成一个词，「三体」搜不到「三体II」。
+这里在写入索引前把每段连续汉字切成重叠的二元组（「三体全集」->「三体 体全 全集」），
+查询词做同样的切分后作为短语匹配，任意 ≥2 个汉字的子串都能走索引；英文、数字仍由 unicode61 分词，
+末尾词按前缀匹配。单个汉字无法用二元组表示，这类查询交给调用方回退到 LIKE；
+ISBN、英文 / 数字查询在 FTS 无结果时同样回退（词中间的片段不在索引里，见 empty_is_final）。
+books_fts 以 rowid = books.id 独立存储切分后的文本，通过 Book 的 ORM 事件保持同步；
+事件在任何进程里首次触发时自行检测 books_fts 是否存在，导入脚本等独立进程经 ORM 写入的书同样会被索引。
+
+生命周期：表结构由数据库迁移创建（app/db/migrations.py 004）；应用启动时 fts_service.start_background_build()
+比较索引与 books 的签名（行数 / 最大 id / id 之和），不一致（新库、旧库首次升级、脚本绕过 ORM 写入）时在后台线程中重建。
+重建完成前 ready 为 False，精确搜索直接走 LIKE，请求不会被建索引阻塞。
+绕过 ORM 批量写入 / 修改书籍的脚本结束时应调用 fts_service.check() 与 rebuild()（见 scripts/init_books.py）。
 """
+import asyncio
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from typing import List, Optional
+from sqlalchemy import event, func, inspect as sa_inspect, select, text
+from sqlalchemy.engine import Connection
+from typing import Dict, Iterable, List, Optional, Tuple
 from app.db.models import Book
 
+logger = logging.getLogger(__name__)
+
+# 索引列（顺序与 bm25 权重一致）：书名权重最高，其次作者
+FTS_COLUMNS = ("title", "author", "isbn", "description")
+_BM25_WEIGHTS = "10.0, 5.0, 2.0, 1.0"
+_REBUILD_BATCH = 500
+_LEGACY_TRIGGERS = ("books_fts_insert", "books_fts_update", "books_fts_delete")
+
+# CJK 统一表意文字（含扩展 A 与兼容区）
+_CJK_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+_LATIN_OR_DIGIT = re.compile(r"[0-9A-Za-z]")
+
+
+def _bigrams(run: str) -> str:
+    if len(run) < 2:
+        return run
+    return " ".join(run[i:i + 2] for i in range(len(run) - 1))
+
+
+def segment(value: Optional[str]) -> str:
+    """写入索引前的切分：连续汉字 -> 重叠二元组，其余字符原样交给 unicode61 分词"""
+    if not value:
+        return ""
+    return _CJK_RUN.sub(lambda m: f" {_bigrams(m.group(0))} ", value).strip()
+
+
+def _phrase(term: str, prefix: bool) -> Optional[str]:
+    """单个查询词 -> FTS5 短语；含单个汉字（无二元组可匹配）时返回 None"""
+    if any(len(run) == 1 for run in _CJK_RUN.findall(term)):
+        return None
+    segmented = segment(term).replace('"', '""')
+    if not segmented.strip():
+        return None
+    # 以英文 / 数字结尾时最后一个词按前缀匹配（输入到一半也能命中）
+    star = " *" if prefix and not _CJK_RUN.search(term[-1]) else ""
+    return f'"{segmented}"{star}'
+
+
+def _field_query(columns: str, value: str, prefix: bool = True) -> Optional[str]:
+    phrases = [_phrase(term, prefix) for term in value.split()]
+    if not phrases or any(p is None for p in phrases):
+        return None
+    return f"{columns} : ({' OR '.join(phrases)})"
+
+
+def empty_is_final(
+    isbn: Optional[str] = None,
+    title: Optional[str] = None,
+    author: Optional[str] = None,
+) -> bool:
+    """
+    FTS 无结果能否作为最终结果：汉字子串由二元组完整覆盖；ISBN 与英文 / 数字只能按整词或词首前缀匹配，
+    词中间的片段（ISBN 中段「6692930」、「otter」->「Potter」）索引答不了，调用方需再走 LIKE
+    """
+    if isbn and isbn.strip():
+        return False
+    return not any(value and _LATIN_OR_DIGIT.search(value) for value in (title, author))
+
+
+@lru_cache(maxsize=2048)
+def build_match_query(
+    isbn: Optional[str] = None,
+    title: Optional[str] = None,
+    author: Optional[str] = None,
+) -> Optional[str]:
+    """
+    组装 MATCH 表达式：任一字段命中即可（各字段之间 OR，与 LIKE 回退一致；前端以同一个词同时查书名与作者），
+    字段内空格分隔的多个词 OR。书名同时匹配简介。无法用索引回答时返回 None。
+    """
+    parts = []
+    for columns, value in (("isbn", isbn), ("{title description}", title), ("author", author)):
+        if value and value.strip():
+            query = _field_query(columns, value.strip())
+            if query is None:
+                return None
+            parts.append(query)
+    return " OR ".join(parts) or None
+
+
+@lru_cache(maxsize=2048)
+def build_phrase_query(values: Tuple[str, ...], title: bool = True, author: bool = True) -> Optional[str]:
+    """
+    整句短语查询（跨语言译名，如「Dream of the Red Chamber」）：每个译名作为一个短语、只有最后一个词按前缀匹配，
+    多个译名之间 OR；只查书名 / 作者、不查简介，避免 of / the 这类常见词逐个 OR 后几乎匹配全部英文书
+    """
+    fields = [name for name, wanted in (("title", title), ("author", author)) if wanted]
+    phrases = [_phrase(v.strip(), prefix=True) for v in values if v and v.strip()]
+    if not fields or not phrases or any(p is None for p in phrases):
+        return None
+    return f"{{{' '.join(fields)}}} : ({' OR '.join(phrases)})"
+
+
+@lru_cache(maxsize=2048)
+def build_text_query(query: str) -> Optional[str]:
+    """自由文本查询（混合搜索）：任一词命中书名 / 作者 / 简介即可，排序交给 bm25"""
+    if not query or not query.strip():
+        return None
+    return _field_query("{title author description}", query.strip())
+
+
+def _segment_row(book_id: int, values: Iterable[Optional[str]]) -> dict:
+    row = {col: segment(value) for col, value in zip(FTS_COLUMNS, values)}
+    row["rowid"] = book_id
+    return row
+
+
+def _index_row(book: Book) -> dict:
+    return _segment_row(book.id, (getattr(book, col) for col in FTS_COLUMNS))
+
+
+# 语句只构造一次，SQLAlchemy 按语句对象缓存编译结果
+# INSERT OR REPLACE：ORM 事件与后台重建并发写入同一 rowid 时以后写入者为准
+_INSERT_SQL = text(
+    f"INSERT OR REPLACE INTO books_fts(rowid, {', '.join(FTS_COLUMNS)}) "
+    f"VALUES (:rowid, {', '.join(':' + c for c in FTS_COLUMNS)})"
+)
+_DELETE_SQL = text("DELETE FROM books_fts WHERE rowid = :rowid")
+_SEARCH_STMT = select(Book).from_statement(text(f"""
+    SELECT books.*
+    FROM books_fts
+    JOIN books ON books.id = books_fts.rowid
+    WHERE books_fts MATCH :match
+    ORDER BY bm25(books_fts, {_BM25_WEIGHTS}), books.rating DESC NULLS LAST
+    LIMIT :limit
+"""))
+_RANK_SQL = text(f"""
+    SELECT rowid FROM books_fts
+    WHERE books_fts MATCH :match
+    ORDER BY bm25(books_fts, {_BM25_WEIGHTS})
+    LIMIT :limit
+""")
+
+
+def create_fts_table(conn: Connection) -> bool:
+    """
+    创建 books_fts（旧结构 book_id 列 + content='books' + 触发器会被删除后重建），供迁移调用。
+    SQLite 未编译 FTS5 时返回 False，精确搜索始终走 LIKE。
+    """
+    exists = conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='books_fts'"
+    )).fetchone()
+    if exists:
+        columns = tuple(row[1] for row in conn.execute(text("PRAGMA table_info(books_fts)")))
+        if columns == FTS_COLUMNS:
+            return True
+        for trigger in _LEGACY_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        conn.execute(text("DROP TABLE books_fts"))
+    try:
+        # 在 SAVEPOINT 中试建，FTS5 不可用时只回滚这一步
+        with conn.begin_nested():
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE books_fts USING fts5({', '.join(FTS_COLUMNS)}, tokenize='unicode61')"
+            ))
+    except Exception as e:
+        logger.warning("FTS5 不可用，精确搜索将使用普通 LIKE 搜索: %s", e)
+        return False
+    return True
+
 
 class FTSSearchService:
-    """SQLite FTS 全文搜索服务"""
-    
-    def __init__(self, db: Session):
-        self.db = db
-        self._ensure_fts_table()
-    
-    def _ensure_fts_table(self):
-        """确保 FTS 虚拟表存在（如果不存在则创建）"""
+    """SQLite FTS 全文搜索服务（进程级单例 fts_service，复用各请求传入的会话）"""
+
+    def __init__(self):
+        self.available: Optional[bool] = None  # books_fts 是否存在（ORM 事件据此同步写入；None 表示本进程尚未检测）
+        self.ready = False  # 索引已与 books 一致，可以用于搜索
+        self.building = False
+        self.last_build_seconds: Optional[float] = None
+        self.searches = 0
+        self.fallbacks = 0
+        self._build_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def check(self, db: Session) -> bool:
+        """检查表是否存在、索引签名（行数 / 最大 id / id 之和）与 books 是否一致，更新 available / ready，返回是否需要重建"""
+        exists = db.execute(text(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='books_fts'"
+        )).fetchone()
+        self.available = bool(exists)
+        if not self.available:
+            self.ready = False
+            return False
+        # 行数相同但 id 不同（删一本、脚本再插一本）时最大 id / id 之和会不同
+        indexed = tuple(db.execute(text("SELECT count(*), max(rowid), sum(rowid) FROM books_fts")).one())
+        total = tuple(db.execute(select(func.count(Book.id), func.max(Book.id), func.sum(Book.id))).one())
+        self.ready = indexed == total
+        return not self.ready
+
+    def rebuild(self, db: Session) -> int:
+        """全量重建索引（按 id 分批读取并切分），返回写入行数；书籍数据通过脚本 / 原生 SQL 批量更新后调用"""
+        with self._build_lock:
+            self.building = True
+            started = time.perf_counter()
+            try:
+                db.execute(text("DELETE FROM books_fts"))
+                last_id, rows = 0, 0
+                while True:
+                    batch = db.execute(
+                        select(Book.id, *(getattr(Book, c) for c in FTS_COLUMNS))
+                        .where(Book.id > last_id).order_by(Book.id).limit(_REBUILD_BATCH)
+                    ).all()
+                    if not batch:
+                        break
+                    db.execute(_INSERT_SQL, [_segment_row(row[0], row[1:]) for row in batch])
+                    last_id = batch[-1][0]
+                    rows += len(batch)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                self.building = False
+            self.available = True
+            self.ready = True
+            self.last_build_seconds = time.perf_counter() - started
+            logger.info("FTS 索引已重建: %d 本书，%.2fs", rows, self.last_build_seconds)
+            return rows
+
+    def _build_if_needed(self) -> None:
+        from app.db.database import SessionLocal
+        db = SessionLocal()
         try:
-            # 检查 FTS 表是否存在
-            result = self.db.execute(text(
-                "SELECT name FROM sqlite_master WHERE type='table' AND name='books_fts'"
-            )).fetchone()
-            
-            if not result:
-                # 创建 FTS5 虚拟表（SQLite 3.9+ 支持）
-                # FTS5 支持中文分词（需要编译时启用，但大多数 SQLite 版本都支持）
-                self.db.execute(text("""
-                    CREATE VIRTUAL TABLE books_fts USING fts5(
-                        book_id UNINDEXED,
-                        title,
-                        author,
-                        isbn,
-                        description,
-                        content='books',
-                        content_rowid='id'
-                    )
-                """))
-                
-                # 填充 FTS 表（从 books 表同步数据）
-                self.db.execute(text("""
-                    INSERT INTO books_fts(book_id, title, author, isbn, description)
-                    SELECT id, title, author, isbn, description FROM books
-                """))
-                
-                # 创建触发器，保持 FTS 表与 books 表同步
-                # INSERT 触发器
-                self.db.execute(text("""
-                    CREATE TRIGGER books_fts_insert AFTER INSERT ON books BEGIN
-                        INSERT INTO books_fts(book_id, title, author, isbn, description)
-                        VALUES (new.id, new.title, new.author, new.isbn, new.description);
-                    END
-                """))
-                
-                # UPDATE 触发器
-                self.db.execute(text("""
-                    CREATE TRIGGER books_fts_update AFTER UPDATE ON books BEGIN
-                        UPDATE books_fts SET
-                            title = new.title,
-                            author = new.author,
-                            isbn = new.isbn,
-                            description = new.description
-                        WHERE book_id = new.id;
-                    END
-                """))
-                
-                # DELETE 触发器
-                self.db.execute(text("""
-                    CREATE TRIGGER books_fts_delete AFTER DELETE ON books BEGIN
-                        DELETE FROM books_fts WHERE book_id = old.id;
-                    END
-                """))
-                
-                self.db.commit()
-                print("✅ FTS 全文搜索表已创建并同步数据")
+            if self.check(db):
+                self.rebuild(db)
         except Exception as e:
-            # 如果 FTS5 不可用（旧版 SQLite），回退到普通 LIKE 搜索
-            print(f"⚠️  FTS5 不可用: {e}，将使用普通 LIKE 搜索")
-            self.db.rollback()
-    
+            logger.warning("FTS 索引构建失败，精确搜索将使用普通 LIKE 搜索: %s", e)
+        finally:
+            db.close()
+
+    def start_background_build(self) -> None:
+        """应用启动时调用：在线程中检查并（必要时）重建索引，不阻塞启动与请求"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(asyncio.to_thread(self._build_if_needed))
+
     def search(
         self,
+        db: Session,
         isbn: Optional[str] = None,
         title: Optional[str] = None,
         author: Optional[str] = None,
         limit: int = 100
-    ) -> List[Book]:
-        """使用 FTS 全文搜索书籍"""
-        try:
-            # 构建 FTS 查询条件
-            conditions = []
-            params = {}
-            
-            if isbn:
-                # ISBN 精确匹配优先
-                conditions.append("isbn MATCH :isbn")
-                params["isbn"] = f'"{isbn}"'  # 双引号表示精确匹配
-            
-            if title:
-                # FTS5 支持中文分词，直接搜索即可
-                # 使用 OR 连接多个词（空格分隔）
-                title_terms = title.strip().split()
-                title_query = " OR ".join([f'title:{term}' for term in title_terms])
-                conditions.append(f"({title_query})")
-            
-            if author:
-                author_terms = author.strip().split()
-                author_query = " OR ".join([f'author:{term}' for term in author_terms])
-                conditions.append(f"({author_query})")
-            
-            if not conditions:
-                return []
-            
-            # 组合查询条件（用 AND 连接）
-            where_clause = " AND ".join(conditions)
-            
-            # FTS 查询（使用 rank 排序，相关性高的在前）
-            query = text(f"""
-                SELECT DISTINCT b.*
-                FROM books b
-                INNER JOIN books_fts fts ON b.id = fts.book_id
-                WHERE {where_clause}
-                ORDER BY rank, b.rating DESC NULLS LAST
-                LIMIT :limit
-            """)
-            
-            params["limit"] = limit
-            result = self.db.execute(query, params)
-            rows = result.fetchall()
-            
-            # 转换为 Book 对象
-            books = []
-            for row in rows:
-                book = Book(
-                    id=row.id,
-                    isbn=row.isbn,
-                    title=row.title,
-                    author=row.author,
-                    publisher=row.publisher,
-                    description=row.description,
-                    cover_url=row.cover_url,
-                    rating=row.rating,
-                    category=row.category,
-                    page_count=row.page_count,
-                )
-                books.append(book)
-            
-            return books
-            
-        except Exception as e:
-            # 如果 FTS 查询失败，回退到普通 LIKE 查询
-            print(f"⚠️  FTS 搜索失败: {e}，回退到普通搜索")
-            return self._fallback_search(isbn, title, author, limit)
-    
-    def _fallback_search(
+    ) -> Optional[List[Book]]:
+        """
+        使用 FTS 全文搜索书籍（按 bm25 相关性、评分排序）。
+        返回 None 表示该查询无法由索引回答（索引未就绪、含单个汉字等），调用方应回退到 LIKE；
+        返回空列表表示索引中确实没有匹配。
+        """
+        match = build_match_query(isbn, title, author) if self.ready else None
+        return self._search(db, match, limit)
+
+    def search_phrase(
         self,
-        isbn: Optional[str] = None,
-        title: Optional[str] = None,
-        author: Optional[str] = None,
+        db: Session,
+        values: Tuple[str, ...],
+        title: bool = True,
+        author: bool = True,
         limit: int = 100
-    ) -> List[Book]:
-        """回退到普通 LIKE 搜索（当 FTS 不可用时）"""
-        from sqlalchemy import or_
-        
-        conditions = []
-        if isbn:
-            conditions.append(Book.isbn.contains(isbn))
-        if title:
-            conditions.append(Book.title.contains(title))
-        if author:
-            conditions.append(Book.author.contains(author))
-        
-        if not conditions:
-            return []
-        
-        query = self.db.query(Book).filter(or_(*conditions))
-        return query.limit(limit).all()
-    
-    def rebuild_fts_index(self):
-        """重建 FTS 索引（当书籍数据更新后调用）"""
+    ) -> Optional[List[Book]]:
+        """按若干整句短语搜索书名 / 作者（见 build_phrase_query）；None 的含义同 search"""
+        match = build_phrase_query(tuple(values), title, author) if self.ready else None
+        return self._search(db, match, limit)
+
+    def _search(self, db: Session, match: Optional[str], limit: int) -> Optional[List[Book]]:
+        if match is None:
+            self.fallbacks += 1
+            return None
         try:
-            # 清空 FTS 表
-            self.db.execute(text("DELETE FROM books_fts"))
-            
-            # 重新填充
-            self.db.execute(text("""
-                INSERT INTO books_fts(book_id, title, author, isbn, description)
-                SELECT id, title, author, isbn, description FROM books
-            """))
-            
-            self.db.commit()
-            print("✅ FTS 索引已重建")
+            books = list(db.execute(_SEARCH_STMT, {"match": match, "limit": limit}).scalars().all())
         except Exception as e:
-            print(f"⚠️  重建 FTS 索引失败: {e}")
-            self.db.rollback()
+            logger.warning("FTS 搜索失败，回退到普通搜索: %s", e)
+            self.fallbacks += 1
+            return None
+        self.searches += 1
+        return books
+
+    def rank(self, db: Session, query: str, limit: int = 50) -> Optional[List[int]]:
+        """自由文本按 bm25 排序，只返回书籍 id（混合搜索的词法召回）；None 的含义同 search"""
+        match = build_text_query(query) if self.ready else None
+        if match is None:
+            self.fallbacks += 1
+            return None
+        try:
+            ids = [row[0] for row in db.execute(_RANK_SQL, {"match": match, "limit": limit})]
+        except Exception as e:
+            logger.warning("FTS 排序检索失败: %s", e)
+            self.fallbacks += 1
+            return None
+        self.searches += 1
+        return ids
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "available": self.available,
+            "ready": self.ready,
+            "building": self.building,
+            "last_build_seconds": self.last_build_seconds,
+            "searches": self.searches,
+            "fallbacks": self.fallbacks,
+        }
+
+
+fts_service = FTSSearchService()
+
+
+def _fts_available(connection: Connection) -> bool:
+    """本进程未运行过 check（导入脚本等）时，在首次写入时检测一次 books_fts 是否存在"""
+    if fts_service.available is None:
+        fts_service.available = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='books_fts'"
+        )).first() is not None
+    return fts_service.available
+
+
+def _after_insert(mapper, connection, target: Book) -> None:
+    if _fts_available(connection):
+        connection.execute(_INSERT_SQL, _index_row(target))
+
+
+def _after_update(mapper, connection, target: Book) -> None:
+    if not _fts_available(connection):
+        return
+    state = sa_inspect(target)
+    if any(state.attrs[col].history.has_changes() for col in FTS_COLUMNS):
+        connection.execute(_INSERT_SQL, _index_row(target))
+
+
+def _after_delete(mapper, connection, target: Book) -> None:
+    if _fts_available(connection):
+        connection.execute(_DELETE_SQL, {"rowid": target.id})
+
+
+event.listen(Book, "after_insert", _after_insert)
+event.listen(Book, "after_update", _after_update)
+event.listen(Book, "after_delete", _after_delete)
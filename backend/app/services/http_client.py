@@ -0,0 +1,136 @@
+"""
+共享 HTTP 客户端注册表：按提供方复用 httpx.AsyncClient 连接池
+FastAPI 启动时创建、关闭时释放；脚本等非 Web 场景首次使用时惰性创建
+"""
+import importlib.util
+import logging
+from typing import Dict, Any, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 提供方 -> 默认超时（秒）与额外请求头
+PROVIDER_LLM = "llm"
+PROVIDER_EMBEDDING = "embedding"
+PROVIDER_OPENLIBRARY = "openlibrary"
+PROVIDER_DOUBAN = "douban"
+
+
+def _provider_timeouts() -> Dict[str, float]:
+    return {
+        PROVIDER_LLM: settings.HTTP_TIMEOUT_LLM,
+        PROVIDER_EMBEDDING: settings.HTTP_TIMEOUT_EMBEDDING,
+        PROVIDER_OPENLIBRARY: settings.HTTP_TIMEOUT_OPENLIBRARY,
+        PROVIDER_DOUBAN: settings.HTTP_TIMEOUT_DOUBAN,
+    }
+
+
+def _http2_available() -> bool:
+    """HTTP/2 需要安装 h2（httpx[http2]），未安装时退回 HTTP/1.1 keep-alive"""
+    return importlib.util.find_spec("h2") is not None
+
+
+class HTTPClientRegistry:
+    """按提供方管理 httpx.AsyncClient：每个提供方一个连接池（对应一个上游主机）"""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._request_counts: Dict[str, int] = {}
+        self._http2 = bool(settings.HTTP2_ENABLED) and _http2_available()
+
+    def _create_client(self, provider: str) -> httpx.AsyncClient:
+        timeout = _provider_timeouts().get(provider, settings.HTTP_TIMEOUT_LLM)
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+
+        async def _count_request(request: httpx.Request):
+            self._request_counts[provider] = self._request_counts.get(provider, 0) + 1
+
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=min(10.0, timeout)),
+            limits=limits,
+            http2=self._http2,
+            event_hooks={"request": [_count_request]},
+        )
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        """获取提供方对应的客户端（不存在或已关闭时创建）"""
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = self._create_client(provider)
+            self._clients[provider] = client
+        return client
+
+    async def startup(self):
+        """预创建所有提供方的客户端"""
+        for provider in _provider_timeouts():
+            self.get(provider)
+        logger.info(
+            "HTTP 连接池已就绪: providers=%s, http2=%s, max_connections=%s",
+            list(self._clients), self._http2, settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+        )
+
+    async def shutdown(self):
+        """关闭所有客户端，释放连接"""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning("关闭 HTTP 客户端失败: %s", e)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """连接池占用情况：连接数、活跃/空闲连接、排队请求数、累计请求数"""
+        out: Dict[str, Any] = {}
+        for provider, client in self._clients.items():
+            pool = _get_pool(client)
+            connections = list(getattr(pool, "connections", []) or []) if pool is not None else []
+            idle = sum(1 for c in connections if _safe_call(c, "is_idle"))
+            out[provider] = {
+                "connections": len(connections),
+                "active": len(connections) - idle,
+                "idle": idle,
+                "queued_requests": _queued_requests(pool),
+                "max_connections": settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+                "requests_total": self._request_counts.get(provider, 0),
+                "http2": self._http2,
+            }
+        return out
+
+
+def _get_pool(client: httpx.AsyncClient) -> Optional[Any]:
+    transport = getattr(client, "_transport", None)
+    return getattr(transport, "_pool", None)
+
+
+def _safe_call(obj: Any, name: str) -> bool:
+    try:
+        return bool(getattr(obj, name)())
+    except Exception:
+        return False
+
+
+def _queued_requests(pool: Any) -> int:
+    """httpcore 连接池中尚未分配到连接的请求数"""
+    if pool is None:
+        return 0
+    requests = getattr(pool, "_requests", None) or []
+    try:
+        return sum(1 for r in requests if getattr(r, "connection", None) is None)
+    except Exception:
+        return 0
+
+
+http_clients = HTTPClientRegistry()
+
+
+def get_http_client(provider: str) -> httpx.AsyncClient:
+    """获取共享客户端（各服务统一入口）"""
+    return http_clients.get(provider)
@@ -0,0 +1,281 @@
+"""
+混合检索：一次查询同时走三路召回，按倒数排名融合（RRF）后返回
+- bm25：books_fts 全文索引（中文二元组），索引未就绪时退化为 LIKE
+- ann：查询向量 + VectorDBService 近邻检索（与语义推荐共用 embedding 缓存与向量后端）
+- author：book_authors / book_author_terms 作者索引上的完全相同、子串（含拼音）匹配；没有完全相同的作者时，
+  对共享 n 元组的少量候选作者做 difflib 相似度，容忍错别字与译名差异
+
+向量检索不依赖数据库会话，与 bm25 / author 两路并发执行；bm25 与 author 共用同一个 AsyncSession，依次执行。
+任一路失败或超时只记入 degraded，不影响其余两路的结果。
+RRF：score(d) = Σ weight_s / (k + rank_s(d))，只看名次、不看原始分数，bm25 与向量距离无需归一化。
+"""
+import asyncio
+import difflib
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, func, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import LatencyStats
+from app.db.models import Book, BookAuthor, BookAuthorTerm
+from app.services.author_index import normalize_author, term_prefix
+from app.services.fts_search import fts_service
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("bm25", "author", "embedding", "ann", "fusion", "hydrate", "total")
+
+# 三字中文名错一个字约为 0.67；两字名错一个字（0.5）不算匹配
+_AUTHOR_MIN_SIMILARITY = 0.66
+_MAX_KEY_LENGTH = 32
+_SUBSTRING_ROWS = 500  # 子串命中的作者名上限（常见字组合如「小明」）
+_FUZZY_ROWS = 200  # 每类模糊候选的作者名上限，difflib 只在这几百个名字上计算
+_FUZZY_ROWS_PER_GRAM = 50
+_TERM_UPPER = "\U0010ffff"
+_CJK = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+
+
+def rrf_fuse(
+    rankings: Dict[str, Sequence[int]],
+    k: int = 60,
+    weights: Optional[Dict[str, float]] = None,
+) -> List[Tuple[int, float, List[str]]]:
+    """倒数排名融合：返回 [(book_id, score, 命中的召回路)]，按分数降序，同分按首次出现的名次"""
+    scores: Dict[int, float] = {}
+    sources: Dict[int, List[str]] = {}
+    best_rank: Dict[int, int] = {}
+    for source, ids in rankings.items():
+        weight = (weights or {}).get(source, 1.0)
+        for rank, book_id in enumerate(ids, start=1):
+            if book_id in sources and source in sources[book_id]:
+                continue
+            scores[book_id] = scores.get(book_id, 0.0) + weight / (k + rank)
+            sources.setdefault(book_id, []).append(source)
+            best_rank[book_id] = min(best_rank.get(book_id, rank), rank)
+    ordered = sorted(scores, key=lambda b: (-scores[b], best_rank[b]))
+    return [(b, scores[b], sources[b]) for b in ordered]
+
+
+@dataclass
+class HybridHit:
+    book: Book
+    score: float
+    sources: List[str]
+
+
+@dataclass
+class HybridResult:
+    hits: List[HybridHit]
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+    degraded: List[str] = field(default_factory=list)
+
+
+class HybridSearchService:
+    """混合检索服务：embedding_service 与向量库由调用方注入（复用推荐接口的实例与缓存）"""
+
+    def __init__(self, embedding_service, vector_db_provider: Callable[[], object]):
+        self.embedding_service = embedding_service
+        self._vector_db_provider = vector_db_provider
+        self._stage_stats: Dict[str, LatencyStats] = {name: LatencyStats() for name in STAGES}
+        self._degraded_counts: Dict[str, int] = {}
+
+    async def _timed(self, stage: str, timings: Dict[str, float], awaitable: Awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            elapsed = time.perf_counter() - started
+            timings[stage] = round(elapsed * 1000, 2)
+            self._stage_stats[stage].record(elapsed)
+
+    def _degrade(self, degraded: List[str], stage: str, error: BaseException) -> None:
+        degraded.append(stage)
+        self._degraded_counts[stage] = self._degraded_counts.get(stage, 0) + 1
+        logger.warning("混合检索 %s 阶段失败，跳过: %r", stage, error)
+
+    # ---------- bm25 ----------
+
+    async def _bm25_ids(self, db: AsyncSession, query: str, depth: int) -> List[int]:
+        ids = None
+        if fts_service.ready:
+            ids = await db.run_sync(lambda s: fts_service.rank(s, query, depth))
+        if ids is not None:
+            return ids
+        # 索引未就绪或查询无法由二元组表示（单个汉字）：LIKE 兜底，按评分排序
+        terms = query.split()
+        conditions = [or_(Book.title.contains(t), Book.author.contains(t)) for t in terms]
+        rows = await db.execute(
+            select(Book.id).where(or_(*conditions))
+            .order_by(Book.rating.desc().nulls_last(), Book.id).limit(depth)
+        )
+        return list(rows.scalars().all())
+
+    # ---------- author ----------
+
+    @staticmethod
+    def _author_keys(query: str) -> List[str]:
+        """参与匹配的查询键：整句规范化与空格分开的每个词（≥2 个字符）"""
+        keys = [normalize_author(query)] + [normalize_author(t) for t in query.split()]
+        return [k[:_MAX_KEY_LENGTH] for k in dict.fromkeys(keys) if len(k) >= 2]
+
+    @staticmethod
+    async def _names(db: AsyncSession, condition, limit: int) -> List[Tuple[str, Optional[str]]]:
+        rows = await db.execute(
+            select(BookAuthor.normalized, BookAuthor.pinyin).where(condition).distinct().limit(limit)
+        )
+        return list(rows.all())
+
+    async def _substring_names(self, db: AsyncSession, key: str) -> Dict[str, float]:
+        """作者名（或拼音）包含 key：book_author_terms 前缀范围；key 包含作者名：规范化名等值查询"""
+        contains = BookAuthor.book_id.in_(select(BookAuthorTerm.book_id).where(term_prefix(key)))
+        pieces = {key[i:j] for i in range(len(key)) for j in range(i + 2, len(key) + 1)} - {key}
+        scored: Dict[str, float] = {}
+        for name, pinyin in await self._names(db, contains, _SUBSTRING_ROWS):
+            # 合著书的其他作者也会被子查询带出来，这里按名字本身过滤
+            for text in (name, pinyin):
+                if text and key in text:
+                    score = 1.0 if text == key else 0.9 * len(key) / len(text) + 0.05
+                    scored[name] = max(scored.get(name, 0.0), score)
+        if pieces:
+            for name, _ in await self._names(db, BookAuthor.normalized.in_(pieces), _SUBSTRING_ROWS):
+                scored[name] = max(scored.get(name, 0.0), 0.9 * len(name) / len(key) + 0.05)
+        return scored
+
+    async def _fuzzy_names(self, db: AsyncSession, key: str) -> Dict[str, float]:
+        """
+        错别字 / 译名差异：只对候选集做 difflib —— 与 key 共享一个 n 元组（汉字二元、拉丁字母三元，
+        走 book_author_terms 前缀范围）的作者，短名再加上首尾字相同、长度相差 ≤1 的作者（「刘磁欣」->「刘慈欣」）
+        """
+        n = 2 if _CJK.search(key) else 3
+        grams = list(dict.fromkeys(key[i:i + n] for i in range(max(1, len(key) - n + 1))))
+        # 每个 n 元组只取有限条，常见组合（ing / son）不会把候选集撑到整个作者表
+        per_gram = union_all(*(
+            select(BookAuthorTerm.book_id).where(term_prefix(g)).limit(_FUZZY_ROWS_PER_GRAM).subquery().select()
+            for g in grams
+        )).subquery()
+        candidates = await self._names(db, BookAuthor.book_id.in_(select(per_gram.c.book_id)), _FUZZY_ROWS)
+        if len(key) <= 4:
+            candidates += await self._names(db, and_(
+                BookAuthor.normalized >= key[0],
+                BookAuthor.normalized < key[0] + _TERM_UPPER,
+                func.substr(BookAuthor.normalized, -1) == key[-1],
+                func.length(BookAuthor.normalized).between(len(key) - 1, len(key) + 1),
+            ), _FUZZY_ROWS)
+        scored: Dict[str, float] = {}
+        for name, pinyin in candidates:
+            for text in (name, pinyin):
+                if not text:
+                    continue
+                matcher = difflib.SequenceMatcher(None, key, text)
+                if matcher.real_quick_ratio() < _AUTHOR_MIN_SIMILARITY or matcher.quick_ratio() < _AUTHOR_MIN_SIMILARITY:
+                    continue
+                score = matcher.ratio()
+                if score >= _AUTHOR_MIN_SIMILARITY:
+                    scored[name] = max(scored.get(name, 0.0), score * 0.85)
+        return scored
+
+    async def _match_authors(self, db: AsyncSession, query: str, limit: int = 10) -> List[str]:
+        """返回按相似度排序的规范化作者名：完全相同 > 子串 > difflib 相似度（仅在没有完全相同的作者时计算）"""
+        scored: Dict[str, float] = {}
+        for key in self._author_keys(query):
+            matched = await self._substring_names(db, key)
+            if 1.0 not in matched.values():
+                for name, score in (await self._fuzzy_names(db, key)).items():
+                    matched[name] = max(matched.get(name, 0.0), score)
+            for name, score in matched.items():
+                scored[name] = max(scored.get(name, 0.0), score)
+        return sorted(scored, key=lambda name: (-scored[name], name))[:limit]
+
+    async def _author_ids(self, db: AsyncSession, query: str, depth: int) -> List[int]:
+        authors = await self._match_authors(db, query)
+        if not authors:
+            return []
+        # 在 SQL 中先按作者相似度名次、再按评分排序后再 LIMIT，
+        # 高产且高分的模糊匹配作者不会把完全匹配作者的书挤出候选
+        position = case({name: i for i, name in enumerate(authors)}, value=BookAuthor.normalized)
+        rows = await db.execute(
+            select(BookAuthor.book_id)
+            .join(Book, Book.id == BookAuthor.book_id)
+            .where(BookAuthor.normalized.in_(authors))
+            .group_by(BookAuthor.book_id)
+            .order_by(func.min(position), Book.rating.desc().nulls_last(), BookAuthor.book_id)
+            .limit(depth)
+        )
+        return list(rows.scalars().all())
+
+    async def _lexical(self, db: AsyncSession, query: str, depth: int, timings, degraded) -> Dict[str, List[int]]:
+        rankings: Dict[str, List[int]] = {}
+        for stage, fn in (("bm25", self._bm25_ids), ("author", self._author_ids)):
+            try:
+                rankings[stage] = await self._timed(stage, timings, fn(db, query, depth))
+            except Exception as e:
+                self._degrade(degraded, stage, e)
+        return rankings
+
+    # ---------- ann ----------
+
+    async def _ann_ids(self, query: str, depth: int, timings, degraded) -> List[int]:
+        try:
+            embedding = await self._timed("embedding", timings, asyncio.wait_for(
+                self.embedding_service.get_query_embedding(query),
+                timeout=settings.HYBRID_EMBEDDING_TIMEOUT_SECONDS
+            ))
+            results = await self._timed("ann", timings, asyncio.wait_for(
+                self._vector_db_provider().search_similar(query_embedding=embedding, top_k=depth),
+                timeout=settings.HYBRID_ANN_TIMEOUT_SECONDS
+            ))
+        except Exception as e:  # 含超时
+            self._degrade(degraded, "ann", e)
+            return []
+        ids = []
+        for item in results:
+            try:
+                ids.append(int(item.get("book_id")))
+            except (TypeError, ValueError):
+                continue
+        return ids
+
+    # ---------- 入口 ----------
+
+    async def search(self, db: AsyncSession, query: str, limit: int = 20) -> HybridResult:
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        degraded: List[str] = []
+        depth = max(limit, settings.HYBRID_CANDIDATES_PER_SOURCE)
+
+        lexical, ann = await asyncio.gather(
+            self._lexical(db, query, depth, timings, degraded),
+            self._ann_ids(query, depth, timings, degraded),
+        )
+        rankings = {**lexical, "ann": ann}
+
+        fusion_started = time.perf_counter()
+        fused = rrf_fuse(rankings, k=settings.HYBRID_RRF_K)[:limit]
+        elapsed = time.perf_counter() - fusion_started
+        timings["fusion"] = round(elapsed * 1000, 2)
+        self._stage_stats["fusion"].record(elapsed)
+
+        hits: List[HybridHit] = []
+        if fused:
+            books = await self._timed("hydrate", timings, db.execute(
+                select(Book).where(Book.id.in_([book_id for book_id, _, _ in fused]))
+            ))
+            by_id = {b.id: b for b in books.scalars().all()}
+            # 向量库中可能残留已删除的书，这里按数据库结果过滤
+            hits = [HybridHit(by_id[b], score, sources) for b, score, sources in fused if b in by_id]
+
+        elapsed = time.perf_counter() - started
+        timings["total"] = round(elapsed * 1000, 2)
+        self._stage_stats["total"].record(elapsed)
+        return HybridResult(hits=hits, timings_ms=timings, degraded=degraded)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "stages": {name: s.snapshot() for name, s in self._stage_stats.items()},
+            "degraded": dict(self._degraded_counts),
+        }
@@ -0,0 +1,94 @@
+"""
+意图提取结果两级缓存：进程内 LRU（带 TTL）+ SQLite 持久表，多 worker 共享
+key = sha256(模型 | prompt 版本 | 规范化查询)
+"""
+import copy
+import hashlib
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import IntentCacheEntry
+from app.services.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class IntentCache:
+    """extract_keywords 结果缓存"""
+
+    def __init__(self, prompt_version: str):
+        self.prompt_version = prompt_version
+        self.ttl = settings.INTENT_CACHE_TTL_SECONDS
+        self._memory = LRUCache(maxsize=settings.INTENT_CACHE_MEMORY_SIZE, ttl=self.ttl)
+        self.db_hits = 0
+
+    def make_key(self, model: str, query: str) -> str:
+        raw = f"{model or 'mock'}|{self.prompt_version}|{normalize_text(query)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, query: str) -> Optional[Dict[str, Any]]:
+        key = self.make_key(model, query)
+        result = self._memory.get(key)
+        if result is not None:
+            return copy.deepcopy(result)
+        db = SessionLocal()
+        try:
+            row = db.query(IntentCacheEntry.result, IntentCacheEntry.created_at).filter(
+                IntentCacheEntry.cache_key == key
+            ).first()
+        except Exception as e:
+            logger.warning("读取意图缓存失败: %s", e)
+            return None
+        finally:
+            db.close()
+        if not row:
+            return None
+        age = time.time() - float(row[1])
+        if age > self.ttl:
+            return None
+        self.db_hits += 1
+        # 内存层只保留持久层剩余的有效期
+        self._memory.set(key, row[0], ttl=self.ttl - age)
+        return copy.deepcopy(row[0])
+
+    def set(self, model: str, query: str, result: Dict[str, Any]) -> None:
+        key = self.make_key(model, query)
+        self._memory.set(key, copy.deepcopy(result))
+        now = time.time()
+        db = SessionLocal()
+        try:
+            row = db.query(IntentCacheEntry).filter(IntentCacheEntry.cache_key == key).first()
+            if row:
+                row.result = result
+                row.created_at = now
+            else:
+                db.add(IntentCacheEntry(
+                    cache_key=key,
+                    model=model or "mock",
+                    prompt_version=self.prompt_version,
+                    result=result,
+                    created_at=now,
+                ))
+            # 顺带清理已过期条目，避免表无限增长
+            db.query(IntentCacheEntry).filter(
+                IntentCacheEntry.created_at < now - self.ttl
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            # 并发 worker 同时写入同一 key 时可能触发唯一约束，内存层已更新，忽略即可
+            logger.warning("写入意图缓存失败: %s", e)
+            db.rollback()
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "memory": self._memory.stats(),
+            "db_hits": self.db_hits,
+            "prompt_version": self.prompt_version,
+            "ttl_seconds": self.ttl,
+        }
@@ -1,13 +1,278 @@
 """
 LLM 服务
 """
+import asyncio
+import heapq
+import itertools
+import json
 import logging
+import re
+import time
+from contextlib import asynccontextmanager
 import httpx
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional, AsyncIterator
 from app.core.config import settings
+from app.core.metrics import LatencyStats
+from app.services.http_client import get_http_client, PROVIDER_LLM
 
 logger = logging.getLogger(__name__)
 
+# 调度优先级：数值越小越先执行（交互式对话 > 推荐语 > 热门推荐理由）
+PRIORITY_CHAT = 0
+PRIORITY_RECOMMENDATION = 1
+PRIORITY_POPULAR = 2
+# 热门推荐语 prompt 版本：修改 generate_popular_reasons 的 prompt 时递增，使持久缓存自动失效
+POPULAR_REASON_PROMPT_VERSION = "popular-v1"
+
+_PRIORITY_NAMES = {
+    PRIORITY_CHAT: "chat",
+    PRIORITY_RECOMMENDATION: "recommendation",
+    PRIORITY_POPULAR: "popular",
+}
+
+
+class _TokenBucket:
+    """令牌桶限流：每秒补充 rate 个令牌，最多积累 burst 个"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(0.001, float(rate))
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class LLMScheduler:
+    """
+    进程级 LLM 调度器：全局并发上限 + 按提供方令牌桶限流 + 优先级排队。
+    有空闲名额时直接执行，否则按 (优先级, 到达顺序) 出队，避免单个请求瞬间打出几十个并发调用。
+    """
+
+    def __init__(self, max_concurrency: int, rate_per_second: float, burst: int):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self._active = 0
+        self._waiters: List[tuple] = []  # heap: (priority, seq, future)
+        self._seq = itertools.count()
+        self._buckets: Dict[str, _TokenBucket] = {}
+        self._queued: Dict[int, int] = {p: 0 for p in _PRIORITY_NAMES}
+        self._wait_stats: Dict[int, LatencyStats] = {p: LatencyStats() for p in _PRIORITY_NAMES}
+        self._run_stats: Dict[int, LatencyStats] = {p: LatencyStats() for p in _PRIORITY_NAMES}
+
+    def _bucket(self, provider: str) -> _TokenBucket:
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            bucket = _TokenBucket(self.rate_per_second, self.burst)
+            self._buckets[provider] = bucket
+        return bucket
+
+    async def _acquire(self, priority: int) -> None:
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), fut)
+        heapq.heappush(self._waiters, entry)
+        self._queued[priority] = self._queued.get(priority, 0) + 1
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # 名额已移交给本任务但任务被取消（如外层 wait_for 超时），归还名额
+                self._release()
+            else:
+                try:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                except ValueError:
+                    pass
+            raise
+        finally:
+            self._queued[priority] -= 1
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)  # 名额直接移交，_active 不变
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, provider: str, priority: int = PRIORITY_RECOMMENDATION):
+        """占用一个调用名额：先按优先级排队，再过提供方限流"""
+        t0 = time.monotonic()
+        await self._acquire(priority)
+        try:
+            await self._bucket(provider).acquire()
+            t1 = time.monotonic()
+            self._wait_stats.setdefault(priority, LatencyStats()).record(t1 - t0)
+            try:
+                yield
+            finally:
+                self._run_stats.setdefault(priority, LatencyStats()).record(time.monotonic() - t1)
+        finally:
+            self._release()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queue_depth": len(self._waiters),
+            "rate_per_second": self.rate_per_second,
+            "by_priority": {
+                name: {
+                    "queued": self._queued.get(p, 0),
+                    "wait": self._wait_stats[p].snapshot(),
+                    "run": self._run_stats[p].snapshot(),
+                }
+                for p, name in _PRIORITY_NAMES.items()
+            },
+        }
+
+
+llm_scheduler = LLMScheduler(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    rate_per_second=settings.LLM_RATE_LIMIT_PER_SECOND,
+    burst=settings.LLM_RATE_LIMIT_BURST,
+)
+
+
+def _parse_batch_items(text: str) -> Dict[int, str]:
+    """解析批量生成的 JSON：{"items": [{"id": 0, "text": "..."}]}，返回 id -> 文本"""
+    import json
+    import re
+    text = (text or "").strip()
+    if "```" in text:
+        text = text.split("```json")[-1] if "```json" in text else text.split("```")[1]
+        text = text.split("```")[0].strip()
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group())
+    except (ValueError, TypeError):
+        return {}
+    out: Dict[int, str] = {}
+    for item in data.get("items") or []:
+        try:
+            text_value = str(item.get("text") or "").strip().strip('"').strip("'")
+            if text_value:
+                out[int(item.get("id"))] = text_value
+        except (AttributeError, TypeError, ValueError):
+            continue
+    return out
+
+
+def _parse_stream_line(line: str) -> Optional[str]:
+    """解析 SSE 行 `data: {...}`，返回增量文本；返回 None 表示流结束（[DONE]）"""
+    line = (line or "").strip()
+    if not line.startswith("data:"):
+        return ""
+    payload = line[5:].strip()
+    if payload == "[DONE]":
+        return None
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        return ""
+    delta = ((data.get("choices") or [{}])[0].get("delta") or {}).get("content")
+    return delta if isinstance(delta, str) else ""
+
+
+# 规则提取词典（未配置 LLM 时使用，也用于 extract_keywords 的快速路径）
+_EMOTION_KEYWORDS = {
+    "压力": "压力", "放松": "放松", "治愈": "治愈", "温暖": "温暖",
+    "悲伤": "悲伤", "快乐": "快乐", "孤独": "孤独", "陪伴": "陪伴"
+}
+# 书籍类型关键词（含推理、悬疑等，便于「推理小说」等查询匹配）
+_TYPE_KEYWORDS = {
+    "科幻": "科幻", "小说": "小说", "文学": "文学", "历史": "历史",
+    "哲学": "哲学", "心理学": "心理学", "传记": "传记",
+    "推理": "推理", "推理小说": "推理小说", "悬疑": "悬疑", "侦探": "侦探",
+}
+# 不携带意图的常见口语（判断查询是否被词典完全覆盖时剔除），按长度降序匹配
+_FILLER_WORDS = sorted([
+    "我想看", "我想读", "想看", "想读", "我想", "推荐", "来点", "来一些", "一些", "几本", "一本",
+    "有没有", "关于", "类的", "类", "的", "书籍", "书", "吗", "呢", "请", "给我", "帮我", "一下",
+], key=len, reverse=True)
+_PUNCT_RE = re.compile(r"[\s,，。.!！?？、;；:：~～\"'“”‘’]+")
+
+# 意图提取 prompt 版本：修改 extract_keywords 的 prompt 时递增，使持久缓存自动失效
+INTENT_PROMPT_VERSION = "intent-v1"
+_intent_cache = None
+_intent_stats = {"fast_path": 0, "cache": 0, "llm": 0}
+
+
+def _rule_based_extract(user_input: str) -> Dict[str, Any]:
+    """基于情绪 / 类型词典的关键词提取"""
+    keywords = []
+    emotions = []
+    book_types = []
+
+    for word, emotion in _EMOTION_KEYWORDS.items():
+        if word in user_input:
+            emotions.append(emotion)
+            keywords.append(word)
+
+    for word, book_type in _TYPE_KEYWORDS.items():
+        if word in user_input:
+            book_types.append(book_type)
+            keywords.append(word)
+
+    # 提取其他关键词
+    words = user_input.split()
+    keywords.extend([w for w in words if len(w) > 1 and w not in keywords])
+
+    return {
+        "keywords": keywords[:10],
+        "emotions": emotions,
+        "scenarios": [],
+        "book_types": book_types
+    }
+
+
+def _rule_covers(user_input: str, result: Dict[str, Any]) -> bool:
+    """去掉命中的词典词与口语虚词后不剩任何内容，说明规则提取已完整覆盖查询"""
+    matched = result.get("emotions", []) + result.get("book_types", [])
+    if not matched:
+        return False
+    rest = user_input
+    for word in sorted(set(matched), key=len, reverse=True):
+        rest = rest.replace(word, " ")
+    for word in _FILLER_WORDS:
+        rest = rest.replace(word, " ")
+    return not _PUNCT_RE.sub("", rest)
+
+
+def get_intent_cache():
+    """意图提取结果缓存（进程内单例，持久层多 worker 共享）"""
+    global _intent_cache
+    if _intent_cache is None:
+        from app.services.intent_cache import IntentCache
+        _intent_cache = IntentCache(INTENT_PROMPT_VERSION)
+    return _intent_cache
+
+
+def get_intent_metrics() -> Dict[str, Any]:
+    """extract_keywords 各路径命中次数 + 缓存统计"""
+    return {
+        **_intent_stats,
+        "cache_stats": _intent_cache.stats() if _intent_cache is not None else None,
+    }
+
 
 class LLMService:
     """LLM 服务：支持 OpenAI 与 DeepSeek 公开接口，未配置时使用内置简单回复"""
@@ -39,14 +304,16 @@ class LLMService:
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
         max_tokens: int = 1000,
-        timeout: float = 10.0
+        timeout: float = 10.0,
+        priority: int = PRIORITY_RECOMMENDATION
     ) -> Tuple[str, bool]:
-        """调用 LLM 生成回复。返回 (回复内容, 是否使用了内置兜底)。"""
+        """调用 LLM 生成回复。返回 (回复内容, 是否使用了内置兜底)。经 llm_scheduler 排队限流。"""
         if not self.api_key:
             return (await self._mock_completion(messages), True)
         
         try:
-            async with httpx.AsyncClient() as client:
+            client = get_http_client(PROVIDER_LLM)
+            async with llm_scheduler.slot(self._provider, priority):
                 response = await client.post(
                     f"{self.base_url.rstrip('/')}/v1/chat/completions",
                     headers={
@@ -59,24 +326,23 @@ class LLMService:
                         "temperature": temperature,
                         "max_tokens": max_tokens
                     },
-                    timeout=60.0
                 )
-                if response.status_code != 200:
-                    body = (response.text or "")[:500]
-                    logger.warning(
-                        "LLM API 返回非 200: status=%s, body=%s",
-                        response.status_code, body
-                    )
-                    if response.status_code == 402:
-                        logger.warning("DeepSeek 返回 402：账户需充值，请到 https://platform.deepseek.com 充值")
-                    response.raise_for_status()
-                data = response.json()
-                content = (data.get("choices") or [{}])[0].get("message") or {}
-                text = content.get("content")
-                if text is None or (isinstance(text, str) and not text.strip()):
-                    logger.warning("LLM API 返回的 content 为空: %s", data)
-                    return (await self._mock_completion(messages), True)
-                return (text if isinstance(text, str) else str(text), False)
+            if response.status_code != 200:
+                body = (response.text or "")[:500]
+                logger.warning(
+                    "LLM API 返回非 200: status=%s, body=%s",
+                    response.status_code, body
+                )
+                if response.status_code == 402:
+                    logger.warning("DeepSeek 返回 402：账户需充值，请到 https://platform.deepseek.com 充值")
+                response.raise_for_status()
+            data = response.json()
+            content = (data.get("choices") or [{}])[0].get("message") or {}
+            text = content.get("content")
+            if text is None or (isinstance(text, str) and not text.strip()):
+                logger.warning("LLM API 返回的 content 为空: %s", data)
+                return (await self._mock_completion(messages), True)
+            return (text if isinstance(text, str) else str(text), False)
         except httpx.HTTPStatusError as e:
             body = (e.response.text or "")[:500]
             logger.warning(
@@ -91,13 +357,29 @@ class LLMService:
             )
             return (await self._mock_completion(messages), True)
     
-    async def test_api_call(self) -> dict:
-        """发起一次真实 API 调用用于诊断（不落库）。返回 { ok, reply? | error?, status_code? }"""
+    async def chat_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        priority: int = PRIORITY_CHAT
+    ) -> AsyncIterator[Tuple[str, bool]]:
+        """
+        流式调用 LLM（stream: true），逐段产出 (增量文本, 是否使用了内置兜底)。
+        首个 token 之前出错时回退为内置回复的分段输出；流中途出错则在已输出内容处结束。
+        整个流期间占用一个调度槽位。
+        """
         if not self.api_key:
-            return {"ok": False, "error": "未配置 API Key（请在 backend/.env 中配置 DEEPSEEK_API_KEY）"}
+            async for chunk in self._mock_completion_stream(messages):
+                yield chunk
+            return
+
+        emitted = False
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
+            client = get_http_client(PROVIDER_LLM)
+            async with llm_scheduler.slot(self._provider, priority):
+                async with client.stream(
+                    "POST",
                     f"{self.base_url.rstrip('/')}/v1/chat/completions",
                     headers={
                         "Authorization": f"Bearer {self.api_key}",
@@ -105,31 +387,90 @@ class LLMService:
                     },
                     json={
                         "model": self.model,
-                        "messages": [{"role": "user", "content": "你好，请用一句话介绍你自己。"}],
-                        "temperature": 0.7,
-                        "max_tokens": 100
+                        "messages": messages,
+                        "temperature": temperature,
+                        "max_tokens": max_tokens,
+                        "stream": True
                     },
-                    timeout=30.0
-                )
-                if response.status_code != 200:
-                    body = (response.text or "")[:300]
-                    if response.status_code == 402:
-                        return {
-                            "ok": False,
-                            "error": "DeepSeek 返回 402 Payment Required，账户需充值。请到 https://platform.deepseek.com 充值后重试。",
-                            "status_code": 402,
-                            "response_body": body
-                        }
+                ) as response:
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode("utf-8", "ignore")[:500]
+                        logger.warning(
+                            "LLM 流式 API 返回非 200: status=%s, body=%s",
+                            response.status_code, body
+                        )
+                        if response.status_code == 402:
+                            logger.warning("DeepSeek 返回 402：账户需充值，请到 https://platform.deepseek.com 充值")
+                        response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        delta = _parse_stream_line(line)
+                        if delta is None:
+                            break
+                        if delta:
+                            emitted = True
+                            yield (delta, False)
+        except Exception as e:
+            if emitted:
+                logger.warning("LLM 流式输出中断（%s）: %s", self._provider, e)
+                return
+            logger.warning(
+                "LLM 流式 API 调用失败（%s），已回退到简单回复。错误: %s",
+                self._provider, e
+            )
+        if not emitted:
+            async for chunk in self._mock_completion_stream(messages):
+                yield chunk
+
+    async def _mock_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        chunk_size: int = 8
+    ) -> AsyncIterator[Tuple[str, bool]]:
+        """把内置回复切成小段输出，与真实流式接口保持一致的前端体验"""
+        text = await self._mock_completion(messages)
+        for i in range(0, len(text), chunk_size):
+            yield (text[i:i + chunk_size], True)
+            await asyncio.sleep(0)
+
+    async def test_api_call(self) -> dict:
+        """发起一次真实 API 调用用于诊断（不落库）。返回 { ok, reply? | error?, status_code? }"""
+        if not self.api_key:
+            return {"ok": False, "error": "未配置 API Key（请在 backend/.env 中配置 DEEPSEEK_API_KEY）"}
+        try:
+            client = get_http_client(PROVIDER_LLM)
+            response = await client.post(
+                f"{self.base_url.rstrip('/')}/v1/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": self.model,
+                    "messages": [{"role": "user", "content": "你好，请用一句话介绍你自己。"}],
+                    "temperature": 0.7,
+                    "max_tokens": 100
+                },
+                timeout=30.0
+            )
+            if response.status_code != 200:
+                body = (response.text or "")[:300]
+                if response.status_code == 402:
                     return {
                         "ok": False,
-                        "error": f"API 返回 {response.status_code}",
-                        "status_code": response.status_code,
+                        "error": "DeepSeek 返回 402 Payment Required，账户需充值。请到 https://platform.deepseek.com 充值后重试。",
+                        "status_code": 402,
                         "response_body": body
                     }
-                data = response.json()
-                content = (data.get("choices") or [{}])[0].get("message") or {}
-                reply = content.get("content") or ""
-                return {"ok": True, "reply": (reply[:200] + "…") if len(reply) > 200 else reply, "provider": self._provider}
+                return {
+                    "ok": False,
+                    "error": f"API 返回 {response.status_code}",
+                    "status_code": response.status_code,
+                    "response_body": body
+                }
+            data = response.json()
+            content = (data.get("choices") or [{}])[0].get("message") or {}
+            reply = content.get("content") or ""
+            return {"ok": True, "reply": (reply[:200] + "…") if len(reply) > 200 else reply, "provider": self._provider}
         except httpx.HTTPStatusError as e:
             body = (e.response.text or "")[:300]
             return {
@@ -208,45 +549,23 @@ class LLMService:
         """从用户输入中提取关键词和情绪因子"""
         # 简单的关键词提取（当没有 API Key 时）
         if not self.api_key:
-            keywords = []
-            emotions = []
-            scenarios = []
-            book_types = []
-            
-            # 情绪关键词
-            emotion_keywords = {
-                "压力": "压力", "放松": "放松", "治愈": "治愈", "温暖": "温暖",
-                "悲伤": "悲伤", "快乐": "快乐", "孤独": "孤独", "陪伴": "陪伴"
-            }
-            
-            # 书籍类型关键词（含推理、悬疑等，便于「推理小说」等查询匹配）
-            type_keywords = {
-                "科幻": "科幻", "小说": "小说", "文学": "文学", "历史": "历史",
-                "哲学": "哲学", "心理学": "心理学", "传记": "传记",
-                "推理": "推理", "推理小说": "推理小说", "悬疑": "悬疑", "侦探": "侦探",
-            }
-            
-            for word, emotion in emotion_keywords.items():
-                if word in user_input:
-                    emotions.append(emotion)
-                    keywords.append(word)
-            
-            for word, book_type in type_keywords.items():
-                if word in user_input:
-                    book_types.append(book_type)
-                    keywords.append(word)
-            
-            # 提取其他关键词
-            words = user_input.split()
-            keywords.extend([w for w in words if len(w) > 1 and w not in keywords])
-            
-            return {
-                "keywords": keywords[:10],
-                "emotions": emotions,
-                "scenarios": [],
-                "book_types": book_types
-            }
-        
+            return _rule_based_extract(user_input)
+
+        # 快速路径：查询完全由已知情绪 / 类型词构成时，规则提取已足够，跳过 LLM
+        if settings.INTENT_FAST_PATH:
+            rule_result = _rule_based_extract(user_input)
+            if _rule_covers(user_input, rule_result):
+                _intent_stats["fast_path"] += 1
+                return rule_result
+
+        cache = get_intent_cache() if settings.INTENT_CACHE_ENABLED else None
+        if cache is not None:
+            cached = cache.get(self.model, user_input)
+            if cached is not None:
+                _intent_stats["cache"] += 1
+                return cached
+        _intent_stats["llm"] += 1
+
         # 使用 LLM API
         prompt = f"""请分析以下用户输入，提取关键词和情绪因子。用户输入："{user_input}"
 
@@ -263,7 +582,7 @@ class LLMService:
             {"role": "user", "content": prompt}
         ]
         
-        content, _ = await self.chat_completion(messages, temperature=0.3)
+        content, used_fallback = await self.chat_completion(messages, temperature=0.3, priority=PRIORITY_CHAT)
         response = content
         # 这里需要解析 JSON，简化处理
         import json
@@ -272,7 +591,10 @@ class LLMService:
             import re
             json_match = re.search(r'\{.*\}', response, re.DOTALL)
             if json_match:
-                return json.loads(json_match.group())
+                result = json.loads(json_match.group())
+                if cache is not None and not used_fallback and isinstance(result, dict):
+                    cache.set(self.model, user_input, result)
+                return result
         except:
             pass
         
@@ -284,78 +606,197 @@ class LLMService:
             "book_types": []
         }
     
-    async def generate_recommendation_text(
+    def _recommendation_text_batcher(self, user_input: str, books: List[Dict[str, Any]], timeout: float):
+        """推荐语批量生成的组成部分：(兜底模板, 单本渲染, 单批调用)"""
+        from app.services.recommendation_templates import get_recommendation_template
+
+        def fallback(book: Dict[str, Any]) -> str:
+            return get_recommendation_template(
+                user_input, book.get("title") or "", book.get("author") or "", book.get("description") or ""
+            )
+
+        def render(i: int, book: Dict[str, Any]) -> str:
+            author = book.get("author") or ""
+            desc = (book.get("description") or "暂无简介")[:200]
+            return f"[{i}] 《{book.get('title') or ''}》{author and f'（{author}）' or ''}\n简介：{desc}"
+
+        async def run_chunk(chunk: List[int]) -> Dict[int, str]:
+            items_text = "\n\n".join(render(i, books[i]) for i in chunk)
+            prompt = f"""用户需求："{user_input}"
+
+以下是 {len(chunk)} 本书：
+{items_text}
+
+为每本书生成50-100字推荐语，说明这本书如何满足用户需求，语言温暖有感染力。
+请严格输出 JSON，不要其他文字：
+{{"items": [{{"id": 书籍编号, "text": "推荐语"}}]}}"""
+            messages = [
+                {"role": "system", "content": "你是一个专业的阅读推荐助手，擅长深度分析用户情绪，并根据情绪推荐合适的书籍。你的推荐语要温暖、具体、有针对性。"},
+                {"role": "user", "content": prompt}
+            ]
+            content, used_fallback = await asyncio.wait_for(
+                self.chat_completion(
+                    messages, temperature=0.8, max_tokens=min(4000, 180 * len(chunk) + 100),
+                    priority=PRIORITY_RECOMMENDATION
+                ),
+                timeout=timeout
+            )
+            return {} if used_fallback else _parse_batch_items(content)
+
+        return fallback, render, run_chunk
+
+    async def generate_recommendation_texts(
         self,
         user_input: str,
-        book_title: str,
-        book_author: str,
-        book_description: str
-    ) -> str:
-        """生成推荐语（50-100字）"""
-        # 如果没有 API Key，使用模板库生成推荐语
+        books: List[Dict[str, Any]],
+        timeout: float = 15.0
+    ) -> List[str]:
+        """
+        批量生成推荐语：一次结构化(JSON)调用返回 N 条，与 books 顺序一一对应。
+        books 每项含 title / author / description；prompt 过长时自动拆成多批并发请求，
+        缺失或过短的条目回退到 recommendation_templates 模板。
+        """
+        if not books:
+            return []
+        fallback, render, run_chunk = self._recommendation_text_batcher(user_input, books, timeout)
         if not self.api_key:
-            from app.services.recommendation_templates import get_recommendation_template
-            return get_recommendation_template(user_input, book_title, book_author, book_description)
-            # 分析用户输入中的情绪关键词
-            emotion_map = {
-                "压力": "缓解压力", "放松": "带来放松", "治愈": "治愈心灵", "温暖": "带来温暖",
-                "悲伤": "抚慰悲伤", "快乐": "带来快乐", "孤独": "陪伴孤独", "陪伴": "给予陪伴",
-                "迷茫": "指引方向", "疲惫": "恢复精力", "焦虑": "平复焦虑", "低落": "提升心情"
-            }
-            
-            # 提取情绪关键词
-            detected_emotion = None
-            for keyword, emotion_desc in emotion_map.items():
-                if keyword in user_input:
-                    detected_emotion = emotion_desc
-                    break
-            
-            # 构建详细的推荐语（确保50-100字）
-            book_desc_snippet = book_description[:80] if book_description else ""
-            author_info = f"由{book_author}创作" if book_author else "这是一本"
-            
-            if detected_emotion:
-                recommendation = f"当你感到{user_input[:15]}时，《{book_title}》或许正是你需要的。{author_info}的作品，{book_desc_snippet}。这本书能够{detected_emotion}，通过{book_title}中{book_desc_snippet[:30] if book_desc_snippet else '深刻的内容'}，为你带来心灵的慰藉和启发。相信在阅读的过程中，你会找到内心的平静与力量。"
-            else:
-                # 如果没有检测到特定情绪，根据用户输入生成
-                user_needs = user_input[:20] if len(user_input) > 20 else user_input
-                recommendation = f"如果你正在寻找{user_needs}，那么《{book_title}》或许正是你需要的。{author_info}的这部作品，{book_desc_snippet}。这本书不仅内容丰富、引人入胜，更能够满足你当前的阅读期待。通过{book_title}中{book_desc_snippet[:30] if book_desc_snippet else '深刻的故事和思考'}，相信会为你带来深刻的思考和愉悦的阅读体验，让你在阅读中找到共鸣与启发。"
-            
-            # 确保推荐语长度在50-100字之间
-            if len(recommendation) < 50:
-                recommendation += f"这本书值得你细细品味，相信会给你带来意想不到的收获和感悟。"
-            elif len(recommendation) > 100:
-                recommendation = recommendation[:97] + "..."
-            
-            return recommendation
-        
-        # 使用 LLM API - 优化prompt使其更简洁，加快响应速度
-        desc_snippet = book_description[:200] if book_description else '暂无简介'
-        prompt = f"""用户需求："{user_input}"
+            return [fallback(b) for b in books]
 
-书籍：《{book_title}》{book_author and f'（{book_author}）' or ''}
-简介：{desc_snippet}
+        texts = await self._run_batches(books, render, run_chunk)
+        return [t if t and len(t) > 10 else fallback(books[i]) for i, t in enumerate(texts)]
 
-生成50-100字推荐语，说明这本书如何满足用户需求。语言温暖有感染力，直接返回推荐语。"""
-        
-        messages = [
-            {"role": "system", "content": "你是一个专业的阅读推荐助手，擅长深度分析用户情绪，并根据情绪推荐合适的书籍。你的推荐语要温暖、具体、有针对性。"},
-            {"role": "user", "content": prompt}
-        ]
-        
-        # 优化：减少 max_tokens 以加快响应速度，同时保持推荐语质量
-        content, _ = await self.chat_completion(messages, temperature=0.8, max_tokens=200)
-        return content.strip()
+    async def generate_recommendation_texts_stream(
+        self,
+        user_input: str,
+        books: List[Dict[str, Any]],
+        timeout: float = 15.0
+    ) -> AsyncIterator[Tuple[int, str]]:
+        """
+        流式版 generate_recommendation_texts：按 LLM_STREAM_BATCH_MAX_ITEMS 拆成小批并发请求，
+        每批完成即按完成顺序产出 (books 下标, 推荐语)，缺失条目同样回退模板。
+        """
+        if not books:
+            return
+        fallback, render, run_chunk = self._recommendation_text_batcher(user_input, books, timeout)
+        if not self.api_key:
+            for i, book in enumerate(books):
+                yield i, fallback(book)
+            return
+
+        chunks = self._split_batches(books, render, settings.LLM_STREAM_BATCH_MAX_ITEMS)
+        tasks = {asyncio.ensure_future(run_chunk(chunk)): chunk for chunk in chunks}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    chunk = tasks[task]
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.warning("批量生成推荐语失败（%d 条），回退兜底: %r", len(chunk), e)
+                        result = {}
+                    for i in chunk:
+                        text = result.get(i)
+                        yield i, text if text and len(text) > 10 else fallback(books[i])
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def generate_popular_reasons(
+        self,
+        books: List[Dict[str, Any]],
+        timeout: float = 15.0
+    ) -> List[Optional[str]]:
+        """
+        批量生成热门推荐语（50-100字），一次调用覆盖多本书，与 books 顺序对应。
+        books 每项含 title / author / description / rating；未生成的条目返回 None，由调用方兜底。
+        """
+        if not books or not self.api_key:
+            return [None] * len(books)
+
+        def render(i: int, book: Dict[str, Any]) -> str:
+            line = f"[{i}] 书名：《{book.get('title') or ''}》"
+            if book.get("author"):
+                line += f"\n作者：{book['author']}"
+            if book.get("description"):
+                line += f"\n简介：{book['description'][:300]}"
+            if book.get("rating"):
+                line += f"\n评分：{book['rating']:.1f}分"
+            return line
+
+        async def run_chunk(chunk: List[int]) -> Dict[int, str]:
+            items_text = "\n\n".join(render(i, books[i]) for i in chunk)
+            prompt = f"""请为以下 {len(chunk)} 本书各生成一段50-100字的推荐语，要求：
+1. 风格温暖、有感染力，能够引起读者的共鸣
+2. 突出书籍的核心价值和独特之处
+3. 语言优美、有诗意，但不过于华丽
+4. 能够激发读者的阅读兴趣
+5. 不要使用"这本书"、"这部作品"等词汇，直接描述内容
+
+书籍信息：
+{items_text}
+
+请严格输出 JSON，不要其他文字：
+{{"items": [{{"id": 书籍编号, "text": "推荐语"}}]}}"""
+            messages = [
+                {"role": "system", "content": "你是一个专业的阅读推荐助手，擅长用温暖、有感染力的语言推荐书籍。"},
+                {"role": "user", "content": prompt}
+            ]
+            content, used_fallback = await asyncio.wait_for(
+                self.chat_completion(
+                    messages, temperature=0.8, max_tokens=min(4000, 180 * len(chunk) + 100),
+                    priority=PRIORITY_POPULAR
+                ),
+                timeout=timeout
+            )
+            return {} if used_fallback else _parse_batch_items(content)
+
+        texts = await self._run_batches(books, render, run_chunk)
+        return [t if t and len(t) > 10 else None for t in texts]
+
+    @staticmethod
+    def _split_batches(books: List[Dict[str, Any]], render, max_items: int) -> List[List[int]]:
+        """按条数与 prompt 长度拆批，返回每批的 books 下标"""
+        chunks: List[List[int]] = []
+        current: List[int] = []
+        size = 0
+        for i, book in enumerate(books):
+            length = len(render(i, book))
+            if current and (
+                len(current) >= max_items
+                or size + length > settings.LLM_BATCH_MAX_PROMPT_CHARS
+            ):
+                chunks.append(current)
+                current, size = [], 0
+            current.append(i)
+            size += length
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _run_batches(self, books: List[Dict[str, Any]], render, run_chunk) -> List[Optional[str]]:
+        """按条数与 prompt 长度拆批并发执行，单批失败或超时只影响该批"""
+        chunks = self._split_batches(books, render, settings.LLM_BATCH_MAX_ITEMS)
+        results = await asyncio.gather(*[run_chunk(c) for c in chunks], return_exceptions=True)
+        texts: List[Optional[str]] = [None] * len(books)
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, BaseException):
+                logger.warning("批量生成推荐语失败（%d 条），回退兜底: %r", len(chunk), result)
+                continue
+            for i in chunk:
+                texts[i] = result.get(i)
+        return texts
     
-    async def generate_agent_response(
+    def _build_agent_messages(
         self,
         user_message: str,
         book_context: str = "",
         conversation_history: List[Dict[str, str]] = None,
         session_summary: str = "",
         user_interests: List[str] = None
-    ) -> Tuple[str, bool]:
-        """生成 AI 书童回复。返回 (回复内容, 是否使用了内置兜底未走 DeepSeek)。"""
+    ) -> List[Dict[str, str]]:
+        """组装 AI 书童对话的 messages（system 人设 + 书籍 / 摘要 / 兴趣上下文 + 历史 + 本轮输入）"""
         system_prompt = """你是"苏童童"，一个温暖、智慧、有思想的AI阅读伴侣。你不仅是介绍书的助手，更是可以一起聊书、聊人生、聊理想的伙伴。
 
 你的能力与风格：
@@ -389,11 +830,43 @@ class LLMService:
             messages.extend(conversation_history)
         
         messages.append({"role": "user", "content": user_message})
-        
+        return messages
+
+    async def generate_agent_response(
+        self,
+        user_message: str,
+        book_context: str = "",
+        conversation_history: List[Dict[str, str]] = None,
+        session_summary: str = "",
+        user_interests: List[str] = None
+    ) -> Tuple[str, bool]:
+        """生成 AI 书童回复。返回 (回复内容, 是否使用了内置兜底未走 DeepSeek)。"""
+        messages = self._build_agent_messages(
+            user_message, book_context, conversation_history, session_summary, user_interests
+        )
         # 提高 max_tokens，便于大模型返回更完整的介绍
-        content, used_fallback = await self.chat_completion(messages, temperature=0.7, max_tokens=1024)
+        content, used_fallback = await self.chat_completion(
+            messages, temperature=0.7, max_tokens=1024, priority=PRIORITY_CHAT
+        )
         return (content.strip(), used_fallback)
 
+    async def generate_agent_response_stream(
+        self,
+        user_message: str,
+        book_context: str = "",
+        conversation_history: List[Dict[str, str]] = None,
+        session_summary: str = "",
+        user_interests: List[str] = None
+    ) -> AsyncIterator[Tuple[str, bool]]:
+        """流式生成 AI 书童回复，逐段产出 (增量文本, 是否使用了内置兜底)"""
+        messages = self._build_agent_messages(
+            user_message, book_context, conversation_history, session_summary, user_interests
+        )
+        async for chunk in self.chat_completion_stream(
+            messages, temperature=0.7, max_tokens=1024, priority=PRIORITY_CHAT
+        ):
+            yield chunk
+
     async def generate_session_summary(
         self, messages_text: List[str]
     ) -> Dict[str, Any]:
@@ -416,7 +889,8 @@ class LLMService:
                 [{"role": "user", "content": prompt}],
                 temperature=0.3,
                 max_tokens=300,
-                timeout=8.0
+                timeout=8.0,
+                priority=PRIORITY_POPULAR
             )
             import json
             text = content.strip()
@@ -508,5 +982,5 @@ class LLMService:
             {"role": "user", "content": prompt}
         ]
         
-        content, _ = await self.chat_completion(messages, temperature=0.7, max_tokens=100)
+        content, _ = await self.chat_completion(messages, temperature=0.7, max_tokens=100, priority=PRIORITY_POPULAR)
         return content.strip()
@@ -0,0 +1,269 @@
+"""
+内存 NumPy 向量索引（VectorBackend 的暴力检索实现）
+行向量预先 L2 归一化存为连续 float32 矩阵，top-k 只需一次矩阵-向量乘 + argpartition；
+持久化为 vectors.npy（以 mmap 方式载入）+ ids.json + metadata.json
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from app.services.vector_db import VectorBackend
+
+logger = logging.getLogger(__name__)
+
+_VECTORS_FILE = "vectors.npy"
+_IDS_FILE = "ids.json"
+_METADATA_FILE = "metadata.json"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class NumpyVectorBackend(VectorBackend):
+    """
+    暴力检索后端：几千到几万条向量时比 Chroma 查询快一个数量级。
+    distance 为余弦距离（1 - cos），与 Chroma 一样越小越相似。
+    """
+
+    name = "numpy"
+    _RELOAD_CHECK_INTERVAL = 5.0  # 检查磁盘文件是否被其他进程（如 init_books）更新的间隔
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self._lock = threading.RLock()
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._ids: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._pending: List[Tuple[str, np.ndarray, Dict[str, Any]]] = []
+        self._mask_cache: Dict[Any, np.ndarray] = {}
+        self._loaded_mtime = 0.0
+        self._checked_at = 0.0
+        self._load()
+
+    # ---------- 持久化 ----------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _disk_mtime(self) -> float:
+        try:
+            return os.path.getmtime(self._path(_IDS_FILE))
+        except OSError:
+            return 0.0
+
+    def _load(self) -> None:
+        mtime = self._disk_mtime()
+        if not mtime:
+            return
+        try:
+            matrix = np.load(self._path(_VECTORS_FILE), mmap_mode="r")
+            with open(self._path(_IDS_FILE), encoding="utf-8") as f:
+                ids = json.load(f)
+            with open(self._path(_METADATA_FILE), encoding="utf-8") as f:
+                metadatas = json.load(f)
+        except Exception as e:
+            logger.warning("载入 NumPy 向量索引失败（%s）: %s", self.index_dir, e)
+            return
+        with self._lock:
+            self._matrix = matrix
+            self._ids = [str(i) for i in ids]
+            self._metadatas = metadatas
+            self._id_to_row = {bid: i for i, bid in enumerate(self._ids)}
+            self._mask_cache.clear()
+            self._loaded_mtime = mtime
+        logger.info("NumPy 向量索引已载入: %d 条, dim=%s", len(self._ids), matrix.shape[1] if matrix.ndim == 2 else 0)
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self._RELOAD_CHECK_INTERVAL or self._pending:
+            return
+        self._checked_at = now
+        if self._disk_mtime() > self._loaded_mtime:
+            self._load()
+
+    def persist(self) -> None:
+        """原子写入磁盘（先写临时文件再 rename），写完后以 mmap 重新载入"""
+        with self._lock:
+            self._compact()
+            os.makedirs(self.index_dir, exist_ok=True)
+            tmp_vectors = self._path(_VECTORS_FILE + ".tmp")
+            with open(tmp_vectors, "wb") as f:
+                np.save(f, np.ascontiguousarray(self._matrix, dtype=np.float32))
+            for name, payload in ((_METADATA_FILE, self._metadatas), (_IDS_FILE, self._ids)):
+                with open(self._path(name + ".tmp"), "w", encoding="utf-8") as f:
+                    json.dump(payload, f, ensure_ascii=False)
+            # ids.json 最后替换：其 mtime 作为其他进程的重新载入信号
+            os.replace(tmp_vectors, self._path(_VECTORS_FILE))
+            os.replace(self._path(_METADATA_FILE + ".tmp"), self._path(_METADATA_FILE))
+            os.replace(self._path(_IDS_FILE + ".tmp"), self._path(_IDS_FILE))
+        self._load()
+
+    # ---------- 写入 ----------
+
+    def add(self, book_id: str, embedding: List[float], metadata: Dict[str, Any]) -> None:
+        """写入内存（同 id 覆盖），调用 persist() 后落盘"""
+        vec = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            self._pending.append((str(book_id), _normalize_rows(vec)[0], dict(metadata)))
+
+    def _compact(self) -> None:
+        """把待写入条目合并进连续矩阵（调用方持有锁）"""
+        if not self._pending:
+            return
+        # mmap 载入的矩阵是只读的，复制一份再原地更新
+        matrix = np.array(self._matrix, dtype=np.float32) if self._matrix.size else None
+        existing = matrix.shape[0] if matrix is not None else 0
+        ids = list(self._ids)
+        metadatas = list(self._metadatas)
+        id_to_row = dict(self._id_to_row)
+        new_rows: List[np.ndarray] = []
+        for bid, vec, meta in self._pending:
+            dim = matrix.shape[1] if matrix is not None else (new_rows[0].shape[0] if new_rows else vec.shape[0])
+            if vec.shape[0] != dim:
+                raise ValueError(f"向量维度不一致: 索引为 {dim}，新增为 {vec.shape[0]}")
+            row = id_to_row.get(bid)
+            if row is None:
+                id_to_row[bid] = len(ids)
+                ids.append(bid)
+                metadatas.append(meta)
+                new_rows.append(vec)
+            elif row < existing:
+                matrix[row] = vec
+                metadatas[row] = meta
+            else:
+                # 同一批次内重复的 id：覆盖尚未并入矩阵的新行
+                new_rows[row - existing] = vec
+                metadatas[row] = meta
+        if new_rows:
+            stacked = np.vstack(new_rows).astype(np.float32)
+            matrix = stacked if matrix is None else np.vstack([matrix, stacked])
+        self._matrix = np.ascontiguousarray(matrix) if matrix is not None else self._matrix
+        self._ids = ids
+        self._metadatas = metadatas
+        self._id_to_row = id_to_row
+        self._pending = []
+        self._mask_cache.clear()
+
+    # ---------- 查询 ----------
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._ids) + len(self._pending)
+
+    def _snapshot(self) -> Tuple[np.ndarray, List[str], List[Dict[str, Any]]]:
+        with self._lock:
+            self._compact()
+            self._maybe_reload()
+            return self._matrix, self._ids, self._metadatas
+
+    def _mask_for(self, where: Dict[str, Any], metadatas: List[Dict[str, Any]]) -> np.ndarray:
+        """把 Chroma 风格的 where 条件转为布尔掩码；单字段条件的掩码按 (字段, 操作, 值) 缓存"""
+        n = len(metadatas)
+        if not where:
+            return np.ones(n, dtype=bool)
+        masks = []
+        for key, cond in where.items():
+            if key == "$and":
+                masks.append(np.logical_and.reduce([self._mask_for(c, metadatas) for c in cond]) if cond else np.ones(n, dtype=bool))
+            elif key == "$or":
+                masks.append(np.logical_or.reduce([self._mask_for(c, metadatas) for c in cond]) if cond else np.zeros(n, dtype=bool))
+            else:
+                if isinstance(cond, dict):
+                    op, value = next(iter(cond.items()))
+                else:
+                    op, value = "$eq", cond
+                cache_key = (key, op, tuple(value) if isinstance(value, list) else value)
+                mask = self._mask_cache.get(cache_key)
+                if mask is None or len(mask) != n:
+                    mask = np.fromiter((_match(m.get(key), op, value) for m in metadatas), dtype=bool, count=n)
+                    self._mask_cache[cache_key] = mask
+                masks.append(mask)
+        return np.logical_and.reduce(masks) if len(masks) > 1 else masks[0]
+
+    def query(self, query_embedding, top_k, where=None):
+        return self.query_batch([query_embedding], top_k, where)[0]
+
+    def query_batch(self, query_embeddings, top_k, where=None):
+        """所有查询向量堆成矩阵，一次矩阵-矩阵乘得到 (n_queries, n_books) 相似度"""
+        matrix, ids, metadatas = self._snapshot()
+        if not ids or not len(query_embeddings):
+            return [[] for _ in query_embeddings]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != matrix.shape[1]:
+            raise ValueError(f"查询向量维度 {queries.shape[-1]} 与索引维度 {matrix.shape[1]} 不一致")
+        scores = _normalize_rows(queries) @ matrix.T
+        if where:
+            mask = self._mask_for(where, metadatas)
+            scores[:, ~mask] = -np.inf
+            valid = int(mask.sum())
+        else:
+            valid = len(ids)
+        k = min(int(top_k), valid)
+        if k <= 0:
+            return [[] for _ in query_embeddings]
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [
+                {
+                    "book_id": ids[i],
+                    "metadata": metadatas[i],
+                    "distance": float(1.0 - s),
+                }
+                for i, s in zip(row_ids, row_scores)
+            ]
+            for row_ids, row_scores in zip(top, top_scores)
+        ]
+
+    def get_metadata(self, book_id: str) -> Optional[Dict[str, Any]]:
+        _, _, metadatas = self._snapshot()
+        row = self._id_to_row.get(str(book_id))
+        return metadatas[row] if row is not None and row < len(metadatas) else None
+
+    def get_embeddings(self, book_ids: List[str]) -> Dict[str, List[float]]:
+        """返回归一化后的向量（存储时已归一化）"""
+        matrix, _, _ = self._snapshot()
+        out = {}
+        for bid in book_ids:
+            row = self._id_to_row.get(str(bid))
+            if row is not None and row < matrix.shape[0]:
+                out[str(bid)] = matrix[row].tolist()
+        return out
+
+
+def _match(actual: Any, op: str, value: Any) -> bool:
+    if op == "$eq":
+        return actual == value
+    if op == "$ne":
+        return actual != value
+    if op == "$in":
+        return actual in value
+    if op == "$nin":
+        return actual not in value
+    try:
+        if op == "$gt":
+            return actual > value
+        if op == "$gte":
+            return actual >= value
+        if op == "$lt":
+            return actual < value
+        if op == "$lte":
+            return actual <= value
+    except TypeError:
+        return False
+    raise ValueError(f"不支持的过滤操作: {op}")
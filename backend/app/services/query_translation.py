@@ -0,0 +1,272 @@
+"""
+搜索词中译英：精确搜索的跨语言扩展（书库以 Open Library 英文书为主，中文查询需要英文译名才能命中）
+按代价从低到高逐级查找，命中即返回：
+1. 离线词表：常见类型词、作者名、类目（来自 GENRE_SYNONYMS 与 init_books 的热门搜索词），
+   查询可被词表词条完整覆盖（贪心最长匹配，允许「的」「书」等虚词）时直接给出各词条的译名
+2. 译文缓存：进程内 LRU（带 TTL）+ query_translation_cache 持久表（多 worker 共享，TTL + 按最近使用淘汰）
+3. LLM：同一查询并发请求只调用一次；调用方只等待 wait 秒，超时后翻译在后台继续并写入缓存，下一次查询即可命中
+"""
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import QueryTranslationCacheEntry
+from app.services.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+PROMPT_VERSION = "v1"
+_CJK = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+
+# init_books 热门搜索词中的作者与类目（英文为 Open Library 常用写法）
+_STATIC_GLOSSARY = {
+    # 作者
+    "鲁迅": "Lu Xun", "茅盾": "Mao Dun", "巴金": "Ba Jin", "老舍": "Lao She", "沈从文": "Shen Congwen",
+    "莫言": "Mo Yan", "余华": "Yu Hua", "贾平凹": "Jia Pingwa", "路遥": "Lu Yao", "陈忠实": "Chen Zhongshi",
+    "张爱玲": "Eileen Chang", "三毛": "Sanmao", "亦舒": "Yi Shu", "琼瑶": "Chiung Yao", "金庸": "Jin Yong",
+    "古龙": "Gu Long", "梁羽生": "Liang Yusheng", "温瑞安": "Wen Rui'an", "黄易": "Huang Yi", "倪匡": "Ni Kuang",
+    "苏童": "Su Tong", "迟子建": "Chi Zijian", "王安忆": "Wang Anyi", "阎连科": "Yan Lianke", "刘震云": "Liu Zhenyun",
+    "王小波": "Wang Xiaobo", "汪曾祺": "Wang Zengqi", "钱钟书": "Qian Zhongshu", "林语堂": "Lin Yutang", "萧红": "Xiao Hong",
+    "张恨水": "Zhang Henshui", "史铁生": "Shi Tiesheng", "毕飞宇": "Bi Feiyu", "格非": "Ge Fei", "阿城": "Ah Cheng",
+    "韩少功": "Han Shaogong", "刘慈欣": "Liu Cixin", "王朔": "Wang Shuo", "严歌苓": "Yan Geling", "李碧华": "Lilian Lee",
+    "白先勇": "Pai Hsien-yung", "林清玄": "Lin Qingxuan", "龙应台": "Lung Ying-tai", "余秋雨": "Yu Qiuyu", "周国平": "Zhou Guoping",
+    "东野圭吾": "Keigo Higashino", "阿加莎": "Agatha Christie", "阿加莎克里斯蒂": "Agatha Christie",
+    # 经典
+    "唐诗": "Tang poetry", "宋词": "Song ci poetry", "元曲": "Yuan qu", "明清小说": "Ming Qing novels",
+    "四大名著": "four great classical novels", "史记": "Records of the Grand Historian", "资治通鉴": "Zizhi Tongjian",
+    "论语": "Analects", "道德经": "Tao Te Ching", "孙子兵法": "The Art of War",
+    "红楼梦": "Dream of the Red Chamber", "三国演义": "Romance of the Three Kingdoms", "水浒传": "Water Margin", "西游记": "Journey to the West",
+    # 类目
+    "中文": "chinese", "中国": "chinese", "文学": "literature", "现代文学": "modern literature", "当代文学": "contemporary literature",
+    "小说": "novel", "历史": "history", "哲学": "philosophy", "文化": "culture", "艺术": "art", "古典": "classical",
+    "武侠": "wuxia", "散文": "essays", "诗歌": "poetry", "传记": "biography", "游记": "travel writing", "随笔": "essays",
+    "经济": "economics", "管理": "management", "心理": "psychology", "心理学": "psychology", "教育": "education",
+    "科技": "technology", "医学": "medicine", "法律": "law", "建筑": "architecture", "设计": "design", "编程": "programming",
+    "机器学习": "machine learning", "人工智能": "artificial intelligence", "数据分析": "data analysis",
+    "产品经理": "product management", "项目管理": "project management", "用户体验": "user experience",
+    "教程": "tutorial", "办公软件": "office software", "写作技巧": "writing skills", "沟通表达": "communication",
+    "投资理财": "personal finance", "股票基金": "stocks and funds", "摄影": "photography", "摄影入门": "photography basics",
+    "视频剪辑": "video editing", "运营手册": "operations", "市场营销": "marketing", "创业指南": "startup guide",
+    "时间管理": "time management", "高效学习": "effective learning", "奇幻": "fantasy", "恐怖": "horror", "冒险": "adventure",
+    "童话": "fairy tales", "儿童文学": "children's literature", "自传": "autobiography", "回忆录": "memoir", "政治": "politics",
+    "社会学": "sociology", "宗教": "religion", "健康": "health", "音乐": "music", "数学": "mathematics", "物理": "physics",
+    "生物": "biology", "化学": "chemistry", "天文": "astronomy",
+}
+# 可以忽略的虚词 / 口语（覆盖判断时跳过，不产生译文）
+_FILLERS = ("我想看", "想看", "推荐", "关于", "有关", "相关", "一些", "书籍", "的", "书", "类", "本")
+
+
+def build_glossary(genre_synonyms: Optional[Mapping[str, Iterable[str]]] = None) -> Dict[str, Tuple[str, ...]]:
+    """词表（词条 -> 若干英文译名）：GENRE_SYNONYMS 中每个类型词取前两个英文同义词（「推理」->「mystery」「detective」），其余来自静态词表"""
+    glossary = {term: (english,) for term, english in _STATIC_GLOSSARY.items()}
+    for term, synonyms in (genre_synonyms or {}).items():
+        english = tuple(s for s in synonyms if s and not _CJK.search(s))[:2]
+        if english:
+            glossary[term] = english
+    return glossary
+
+
+class QueryTranslator:
+    """中文搜索词 -> 英文（进程级单例由 app/api/search 创建）"""
+
+    def __init__(self, genre_synonyms: Optional[Mapping[str, Iterable[str]]] = None, llm_service=None):
+        self.glossary = build_glossary(genre_synonyms)
+        self._max_term = max(len(t) for t in (*self.glossary, *_FILLERS))
+        self._llm = llm_service
+        self.ttl = settings.QUERY_TRANSLATION_TTL_SECONDS
+        self._memory = LRUCache(maxsize=settings.QUERY_TRANSLATION_MEMORY_SIZE, ttl=self.ttl)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.counts = {
+            "requests": 0,
+            "skipped": 0,  # 不含中文，无需翻译
+            "glossary_hits": 0,
+            "memory_hits": 0,
+            "db_hits": 0,
+            "llm_calls": 0,
+            "llm_failures": 0,
+            "llm_deferred": 0,  # 等待超时，翻译转入后台
+            "uncovered": 0,  # 未命中且没有可用的 LLM
+        }
+
+    # ---------- 词表 ----------
+
+    def glossary_translate(self, query: str) -> Optional[List[str]]:
+        """
+        查询能被词表完整覆盖时返回各词条的英文译名（去重、保持顺序，不拼成一句：
+        「历史小说」->「history」「novel」，由调用方逐个检索）；有任何未覆盖的汉字返回 None
+        """
+        parts: List[str] = []
+        for token in normalize_text(query).split():
+            if not _CJK.search(token):
+                parts.append(token)
+                continue
+            pos = 0
+            while pos < len(token):
+                for size in range(min(self._max_term, len(token) - pos), 0, -1):
+                    piece = token[pos:pos + size]
+                    if piece in self.glossary or piece in _FILLERS:
+                        if piece in self.glossary:
+                            parts.extend(self.glossary[piece])
+                        pos += size
+                        break
+                else:
+                    return None
+        return list(dict.fromkeys(parts)) or None
+
+    # ---------- 缓存 ----------
+
+    @property
+    def model(self) -> str:
+        return getattr(self._llm, "model", "") or "mock"
+
+    def make_key(self, query: str) -> str:
+        raw = f"{self.model}|{PROMPT_VERSION}|{query}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _db_get(self, key: str) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            row = db.execute(
+                select(QueryTranslationCacheEntry).where(QueryTranslationCacheEntry.cache_key == key)
+            ).scalar_one_or_none()
+            if row is None or time.time() - row.created_at > self.ttl:
+                return None
+            translation = row.translation
+            row.hits += 1
+            row.last_used_at = time.time()
+            db.commit()
+            return translation
+        except Exception as e:
+            logger.warning("读取译文缓存失败: %s", e)
+            db.rollback()
+            return None
+        finally:
+            db.close()
+
+    def _db_set(self, key: str, query: str, translation: str) -> None:
+        now = time.time()
+        db = SessionLocal()
+        try:
+            row = db.execute(
+                select(QueryTranslationCacheEntry).where(QueryTranslationCacheEntry.cache_key == key)
+            ).scalar_one_or_none()
+            if row:
+                row.translation = translation
+                row.created_at = now
+                row.last_used_at = now
+            else:
+                db.add(QueryTranslationCacheEntry(
+                    cache_key=key, query=query, translation=translation, model=self.model,
+                    hits=0, created_at=now, last_used_at=now,
+                ))
+            db.flush()
+            # 过期条目直接删除；超出行数上限时淘汰最久未使用的
+            db.execute(delete(QueryTranslationCacheEntry).where(QueryTranslationCacheEntry.created_at < now - self.ttl))
+            overflow = (db.execute(select(func.count(QueryTranslationCacheEntry.id))).scalar() or 0) - settings.QUERY_TRANSLATION_MAX_ROWS
+            if overflow > 0:
+                oldest = select(QueryTranslationCacheEntry.id).order_by(
+                    QueryTranslationCacheEntry.last_used_at
+                ).limit(overflow).scalar_subquery()
+                db.execute(delete(QueryTranslationCacheEntry).where(QueryTranslationCacheEntry.id.in_(oldest)))
+            db.commit()
+        except Exception as e:
+            # 并发 worker 同时写入同一 key 时可能触发唯一约束，内存层已更新，忽略即可
+            logger.warning("写入译文缓存失败: %s", e)
+            db.rollback()
+        finally:
+            db.close()
+
+    # ---------- LLM ----------
+
+    async def _llm_translate(self, key: str, query: str) -> Optional[str]:
+        try:
+            return await self._call_llm(key, query)
+        finally:
+            # 写入缓存后才移出，期间到达的同一查询复用这次调用
+            self._inflight.pop(key, None)
+
+    async def _call_llm(self, key: str, query: str) -> Optional[str]:
+        from app.services.llm import PRIORITY_CHAT
+        self.counts["llm_calls"] += 1
+        messages = [
+            {"role": "system", "content": "你是一个专业的翻译助手，负责把中文图书搜索词翻译成英文。"},
+            {"role": "user", "content": (
+                "请将以下图书搜索词翻译成英文（书名用通行英文译名，人名用通行拼写）。只返回翻译结果，不要添加任何解释。\n\n"
+                f"中文搜索词：{query}\n\n英文翻译："
+            )},
+        ]
+        try:
+            text, _ = await asyncio.wait_for(
+                self._llm.chat_completion(messages, temperature=0.3, priority=PRIORITY_CHAT),
+                timeout=10.0
+            )
+        except Exception as e:
+            self.counts["llm_failures"] += 1
+            logger.warning("搜索词翻译失败: %r", e)
+            return None
+        translation = (text or "").strip().strip('"').strip("'").strip()
+        if not translation or _CJK.search(translation):
+            self.counts["llm_failures"] += 1
+            return None
+        self._memory.set(key, translation)
+        await asyncio.to_thread(self._db_set, key, query, translation)
+        return translation
+
+    # ---------- 入口 ----------
+
+    async def translate(self, text: str, wait: Optional[float] = None) -> Optional[List[str]]:
+        """
+        返回英文译名列表（词表命中时每个词条一项，缓存 / LLM 译文为一项）；
+        不含中文、无法翻译或 LLM 在 wait 秒内未返回时为 None
+        """
+        self.counts["requests"] += 1
+        query = normalize_text(text)
+        if not _CJK.search(query):
+            self.counts["skipped"] += 1
+            return None
+        terms = self.glossary_translate(query)
+        if terms:
+            self.counts["glossary_hits"] += 1
+            return terms
+        key = self.make_key(query)
+        translation = self._memory.get(key)
+        if translation is not None:
+            self.counts["memory_hits"] += 1
+            return [translation]
+        translation = await asyncio.to_thread(self._db_get, key)
+        if translation is not None:
+            self.counts["db_hits"] += 1
+            self._memory.set(key, translation)
+            return [translation]
+        if self._llm is None or getattr(self._llm, "_provider", "mock") == "mock":
+            self.counts["uncovered"] += 1
+            return None
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._llm_translate(key, query))
+        wait = settings.QUERY_TRANSLATION_WAIT_SECONDS if wait is None else wait
+        try:
+            translation = await asyncio.wait_for(asyncio.shield(task), timeout=wait)
+            return [translation] if translation else None
+        except asyncio.TimeoutError:
+            self.counts["llm_deferred"] += 1
+            return None
+
+    def stats(self) -> Dict[str, object]:
+        translated = self.counts["requests"] - self.counts["skipped"]
+        hits = self.counts["glossary_hits"] + self.counts["memory_hits"] + self.counts["db_hits"]
+        return {
+            **self.counts,
+            "hit_rate": round(hits / translated, 4) if translated else 0.0,
+            "glossary_size": len(self.glossary),
+            "memory": self._memory.stats(),
+            "inflight": len(self._inflight),
+        }
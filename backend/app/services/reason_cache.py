@@ -0,0 +1,120 @@
+"""
+热门推荐语两级缓存：进程内有界 LRU + SQLite 持久表（按 book_id + prompt 版本 + 模型 区分）
+过期但未超过最大陈旧期的条目照常返回，并由调用方在后台刷新（stale-while-revalidate）
+"""
+import logging
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import PopularReasonCache
+
+logger = logging.getLogger(__name__)
+
+
+class ReasonCache:
+    """推荐语缓存：get_many 返回 book_id -> (推荐语, 是否陈旧)"""
+
+    def __init__(self, prompt_version: str, model: str):
+        self.prompt_version = prompt_version
+        self.model = model or "mock"
+        self._memory = LRUCache(maxsize=settings.REASON_CACHE_MEMORY_SIZE)
+        self.db_hits = 0
+        self.stale_served = 0
+
+    def _classify(self, created_at: float, now: float) -> Tuple[bool, bool]:
+        """返回 (可用, 陈旧)"""
+        age = now - created_at
+        if age > settings.REASON_CACHE_MAX_STALE_SECONDS:
+            return False, True
+        return True, age > settings.REASON_CACHE_FRESH_SECONDS
+
+    def get_many(self, book_ids: Iterable[int]) -> Dict[int, Tuple[str, bool]]:
+        now = time.time()
+        out: Dict[int, Tuple[str, bool]] = {}
+        missing: List[int] = []
+        for bid in book_ids:
+            item = self._memory.get(bid)
+            if item is None:
+                missing.append(bid)
+                continue
+            reason, created_at = item
+            usable, stale = self._classify(created_at, now)
+            if usable:
+                out[bid] = (reason, stale)
+            else:
+                self._memory.pop(bid)
+        if missing:
+            for bid, reason, created_at in self._load(missing):
+                self._memory.set(bid, (reason, created_at))
+                usable, stale = self._classify(created_at, now)
+                if usable:
+                    self.db_hits += 1
+                    out[bid] = (reason, stale)
+        self.stale_served += sum(1 for _, stale in out.values() if stale)
+        return out
+
+    def _load(self, book_ids: List[int]) -> List[Tuple[int, str, float]]:
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                PopularReasonCache.book_id, PopularReasonCache.reason, PopularReasonCache.created_at
+            ).filter(
+                PopularReasonCache.book_id.in_(book_ids),
+                PopularReasonCache.prompt_version == self.prompt_version,
+                PopularReasonCache.model == self.model,
+            ).all()
+            return [(int(r[0]), r[1], float(r[2])) for r in rows]
+        except Exception as e:
+            logger.warning("读取推荐语缓存失败: %s", e)
+            return []
+        finally:
+            db.close()
+
+    def set_many(self, reasons: Dict[int, str]) -> None:
+        if not reasons:
+            return
+        now = time.time()
+        for bid, reason in reasons.items():
+            self._memory.set(bid, (reason, now))
+        db = SessionLocal()
+        try:
+            existing = {
+                row.book_id: row
+                for row in db.query(PopularReasonCache).filter(
+                    PopularReasonCache.book_id.in_(list(reasons)),
+                    PopularReasonCache.prompt_version == self.prompt_version,
+                    PopularReasonCache.model == self.model,
+                ).all()
+            }
+            for bid, reason in reasons.items():
+                row = existing.get(bid)
+                if row:
+                    row.reason = reason
+                    row.created_at = now
+                else:
+                    db.add(PopularReasonCache(
+                        book_id=bid,
+                        prompt_version=self.prompt_version,
+                        model=self.model,
+                        reason=reason,
+                        created_at=now,
+                    ))
+            db.commit()
+        except Exception as e:
+            # 并发 worker 同时写入同一 key 时可能触发唯一约束，内存层已更新，忽略即可
+            logger.warning("写入推荐语缓存失败: %s", e)
+            db.rollback()
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "memory": self._memory.stats(),
+            "db_hits": self.db_hits,
+            "stale_served": self.stale_served,
+            "prompt_version": self.prompt_version,
+            "model": self.model,
+        }
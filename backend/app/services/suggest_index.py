@@ -0,0 +1,441 @@
+"""
+输入联想（/api/search/suggest）：进程内排序数组前缀索引
+- 检索键：书名、拆开后的单个作者名，规范化为小写并去掉空白与标点；多词书名从每个词开头各生成一个键（hobbit -> The Hobbit）；
+  安装 pypinyin 时另加全拼与首字母（santi / st -> 三体）
+- 查询：二分查找定位前缀区间 [lo, hi)，再取热度最高的 k 条。区间不超过 _HOT_RANGE 个键时直接对区间排序；
+  更大的区间（前缀只有一两个字）在构建时预计算 top 列表，查询只是一次字典查找
+- 热度：book_stats.popularity_score（书架次数）为主、豆瓣评分为辅；作者条目取其名下最热的一本
+- 更新：Book 的增删改在事务提交后增量写入（Session after_flush 收集、after_commit 应用，回滚则丢弃）；
+  热度随用户操作持续变化，由后台按 SUGGEST_REFRESH_SECONDS 全量重建后整体替换
+"""
+import asyncio
+import heapq
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect as sa_inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import LatencyStats
+from app.db.models import Book, BookStats
+from app.services.author_index import normalize_author, pinyin_syllables, split_authors
+
+logger = logging.getLogger(__name__)
+
+KIND_TITLE = "title"
+KIND_AUTHOR = "author"
+
+_KEY_STRIP = re.compile(r"[\W_]+")
+_KEY_UPPER = "\U0010ffff"
+_CHANGES_KEY = "suggest_index_changes"
+MAX_SUGGESTIONS = 20  # 单次最多返回条数（预计算 top 列表的长度）
+_HOT_RANGE = 256  # 前缀命中的键超过该数量时使用预计算的 top 列表，否则直接对区间排序
+
+
+def normalize_key(text: Optional[str]) -> str:
+    """检索键规范化：小写，去掉空白、标点（「《三体 II》」->「三体ii」）"""
+    return _KEY_STRIP.sub("", (text or "").lower())
+
+
+def _pinyin_keys(key: str) -> Set[str]:
+    syllables = pinyin_syllables(key)
+    if not syllables:
+        return set()
+    keys = {normalize_key("".join(syllables))}
+    if len(syllables) >= 2:
+        keys.add("".join(s[0] for s in syllables if s))
+    return {k for k in keys if k}
+
+
+def title_keys(title: Optional[str]) -> Set[str]:
+    key = normalize_key(title)
+    if not key:
+        return set()
+    keys = {key}
+    words = (title or "").split()
+    for i in range(1, len(words)):
+        tail = normalize_key(" ".join(words[i:]))
+        if tail:
+            keys.add(tail)
+    return keys | _pinyin_keys(key)
+
+
+def author_keys(normalized_author: str) -> Set[str]:
+    key = normalize_key(normalized_author)
+    return ({key} | _pinyin_keys(key)) if key else set()
+
+
+def popularity_weight(popularity: Optional[float], rating: Optional[float]) -> float:
+    """排序权重：书架次数为主，评分（0-10）只在热度相同时起作用"""
+    return float(popularity or 0) + float(rating or 0) / 100
+
+
+@dataclass
+class Suggestion:
+    kind: str  # title / author
+    text: str
+    book_id: Optional[int]  # 书名条目对应的书；作者条目为 None
+    weight: float
+    keys: Tuple[str, ...]
+
+
+class PrefixIndex:
+    """排序数组前缀索引（非线程安全，由 SuggestService 加锁访问）"""
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._key_entry: List[int] = []  # 与 _keys 平行：键所属条目
+        self._hot: Dict[str, List[int]] = {}  # 大区间前缀 -> 预计算的前 MAX_SUGGESTIONS 条（已去重、按热度排序）
+        self._entries: Dict[int, Suggestion] = {}
+        self._book_entry: Dict[int, int] = {}
+        self._book_weight: Dict[int, float] = {}
+        self._book_authors: Dict[int, Tuple[str, ...]] = {}
+        self._author_books: Dict[str, Set[int]] = {}
+        self._author_name: Dict[str, str] = {}  # 规范化作者名 -> 展示用原始写法
+        self._author_entry: Dict[str, int] = {}
+        self._next_id = 0
+
+    @property
+    def entry_count(self) -> int:
+        return len(self._entries)
+
+    @property
+    def key_count(self) -> int:
+        return len(self._keys)
+
+    def contains_book(self, book_id: int) -> bool:
+        return book_id in self._book_weight
+
+    # ---------- 构建 ----------
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[int, Optional[str], Optional[str], float]]) -> "PrefixIndex":
+        """rows: (book_id, title, author, weight)；一次性收集后整体排序，比逐条插入快得多"""
+        index = cls()
+        for book_id, title, author, weight in rows:
+            index._register_book(book_id, title, author, weight, bulk=True)
+        for author in index._author_books:
+            index._refresh_author(author, bulk=True)
+        pairs = sorted(
+            ((key, eid) for eid, entry in index._entries.items() for key in entry.keys),
+        )
+        index._keys = [k for k, _ in pairs]
+        index._key_entry = [e for _, e in pairs]
+        index._build_hot()
+        return index
+
+    def _build_hot(self) -> None:
+        """逐层找出命中键数超过 _HOT_RANGE 的前缀并预计算 top 列表（只在上一层的大区间内继续细分）"""
+        self._hot = {}
+        stack = [("", 0, len(self._keys))]
+        while stack:
+            parent, lo, hi = stack.pop()
+            depth = len(parent) + 1
+            pos = lo
+            while pos < hi:
+                key = self._keys[pos]
+                if len(key) < depth:  # 与父前缀相同的键
+                    pos += 1
+                    continue
+                prefix = key[:depth]
+                end = bisect_left(self._keys, prefix + _KEY_UPPER, pos, hi)
+                if end - pos > _HOT_RANGE:
+                    self._hot[prefix] = self._top(pos, end, MAX_SUGGESTIONS)
+                    stack.append((prefix, pos, end))
+                pos = end
+
+    def _new_entry(self, entry: Suggestion, bulk: bool) -> int:
+        eid = self._next_id
+        self._next_id += 1
+        self._entries[eid] = entry
+        if not bulk:
+            for key in entry.keys:
+                pos = bisect_right(self._keys, key)
+                self._keys.insert(pos, key)
+                self._key_entry.insert(pos, eid)
+            self._merge_hot(eid, entry)
+        return eid
+
+    def _hot_prefixes(self, entry: Suggestion):
+        return {key[:n] for key in entry.keys for n in range(1, len(key) + 1)} & self._hot.keys()
+
+    def _merge_hot(self, eid: int, entry: Suggestion) -> None:
+        """新条目只可能挤进已有 top 列表，合并后重新排序截断"""
+        for prefix in self._hot_prefixes(entry):
+            top = self._hot[prefix]
+            if eid not in top:
+                self._hot[prefix] = self._dedupe_ids(sorted(top + [eid], key=self._rank), MAX_SUGGESTIONS)
+
+    def _drop_entry(self, eid: int) -> None:
+        entry = self._entries.pop(eid, None)
+        if entry is None:
+            return
+        for key in entry.keys:
+            pos = bisect_left(self._keys, key)
+            while pos < len(self._keys) and self._keys[pos] == key:
+                if self._key_entry[pos] == eid:
+                    del self._keys[pos]
+                    del self._key_entry[pos]
+                    break
+                pos += 1
+        # 删除的条目在某个 top 列表中时，该列表作废，下次查询该前缀时重新计算
+        for prefix in self._hot_prefixes(entry):
+            if eid in self._hot[prefix]:
+                del self._hot[prefix]
+
+    def _register_book(self, book_id: int, title: Optional[str], author: Optional[str], weight: float, bulk: bool) -> Set[str]:
+        """登记书名条目与作者归属，返回涉及的作者（需刷新作者条目）"""
+        keys = title_keys(title)
+        if keys:
+            entry = Suggestion(KIND_TITLE, title.strip(), book_id, weight, tuple(sorted(keys)))
+            self._book_entry[book_id] = self._new_entry(entry, bulk)
+        self._book_weight[book_id] = weight
+        authors = []
+        for name in split_authors(author):
+            normalized = normalize_author(name)
+            if not normalized:
+                continue
+            authors.append(normalized)
+            self._author_books.setdefault(normalized, set()).add(book_id)
+            self._author_name.setdefault(normalized, name)
+        self._book_authors[book_id] = tuple(authors)
+        return set(authors)
+
+    def _refresh_author(self, normalized: str, bulk: bool = False) -> None:
+        eid = self._author_entry.pop(normalized, None)
+        if eid is not None:
+            self._drop_entry(eid)
+        books = self._author_books.get(normalized)
+        if not books:
+            self._author_books.pop(normalized, None)
+            self._author_name.pop(normalized, None)
+            return
+        keys = author_keys(normalized)
+        if not keys:
+            return
+        weight = max(self._book_weight.get(b, 0.0) for b in books)
+        entry = Suggestion(KIND_AUTHOR, self._author_name[normalized], None, weight, tuple(sorted(keys)))
+        self._author_entry[normalized] = self._new_entry(entry, bulk)
+
+    # ---------- 增量更新 ----------
+
+    def _unregister_book(self, book_id: int) -> Set[str]:
+        eid = self._book_entry.pop(book_id, None)
+        if eid is not None:
+            self._drop_entry(eid)
+        self._book_weight.pop(book_id, None)
+        authors = set(self._book_authors.pop(book_id, ()))
+        for normalized in authors:
+            self._author_books.get(normalized, set()).discard(book_id)
+        return authors
+
+    def upsert_book(self, book_id: int, title: Optional[str], author: Optional[str], weight: Optional[float] = None) -> None:
+        """新增或修改一本书；weight 为 None 时沿用原权重（书目编辑不改变热度）"""
+        if weight is None:
+            weight = self._book_weight.get(book_id, 0.0)
+        affected = self._unregister_book(book_id)
+        affected |= self._register_book(book_id, title, author, weight, bulk=False)
+        for normalized in affected:
+            self._refresh_author(normalized)
+
+    def delete_book(self, book_id: int) -> None:
+        for normalized in self._unregister_book(book_id):
+            self._refresh_author(normalized)
+
+    # ---------- 查询 ----------
+
+    def _rank(self, eid: int) -> Tuple[float, int]:
+        return (-self._entries[eid].weight, eid)
+
+    def _top(self, lo: int, hi: int, k: int) -> List[int]:
+        """键区间 [lo, hi) 内热度最高的 k 个条目（去重后）"""
+        candidates = set(self._key_entry[lo:hi])
+        if len(candidates) > 4 * k:
+            ordered = heapq.nsmallest(4 * k, candidates, key=self._rank)
+        else:
+            ordered = sorted(candidates, key=self._rank)
+        return self._dedupe_ids(ordered, k)
+
+    def _dedupe_ids(self, ordered_ids: Iterable[int], k: int) -> List[int]:
+        """同名书（不同版本）只保留最热的一条"""
+        result: List[int] = []
+        seen = set()
+        for eid in ordered_ids:
+            entry = self._entries[eid]
+            if (entry.kind, entry.text) in seen:
+                continue
+            seen.add((entry.kind, entry.text))
+            result.append(eid)
+            if len(result) >= k:
+                break
+        return result
+
+    def query(self, prefix: str, k: int) -> List[Suggestion]:
+        p = normalize_key(prefix)
+        k = min(k, MAX_SUGGESTIONS)
+        if not p or k <= 0:
+            return []
+        lo = bisect_left(self._keys, p)
+        hi = bisect_left(self._keys, p + _KEY_UPPER, lo)
+        if hi - lo > _HOT_RANGE:
+            top = self._hot.get(p)
+            if top is None:
+                top = self._hot[p] = self._top(lo, hi, MAX_SUGGESTIONS)
+            ids = top[:k]
+        else:
+            ids = self._top(lo, hi, k) if hi > lo else []
+        return [self._entries[eid] for eid in ids]
+
+
+def _load_rows(db: Session) -> List[Tuple[int, Optional[str], Optional[str], float]]:
+    rows = db.execute(
+        select(Book.id, Book.title, Book.author, Book.rating, BookStats.popularity_score)
+        .outerjoin(BookStats, BookStats.book_id == Book.id)
+    ).all()
+    return [(book_id, title, author, popularity_weight(pop, rating)) for book_id, title, author, rating, pop in rows]
+
+
+class SuggestService:
+    """输入联想服务（进程级单例 suggest_service）"""
+
+    def __init__(self):
+        self._index: Optional[PrefixIndex] = None
+        self._lock = threading.Lock()
+        self._building = False
+        self._pending: List[tuple] = []  # 全量重建期间提交的变更，替换索引后重放
+        self._task: Optional[asyncio.Task] = None
+        self.last_build_seconds: Optional[float] = None
+        self.latency = LatencyStats()
+
+    @property
+    def ready(self) -> bool:
+        return self._index is not None
+
+    def rebuild(self, db: Session) -> int:
+        """从数据库全量构建并替换索引，返回条目数"""
+        started = time.perf_counter()
+        with self._lock:
+            self._building = True
+            self._pending = []
+        try:
+            index = PrefixIndex.build(_load_rows(db))
+        except Exception:
+            with self._lock:
+                self._building = False
+                self._pending = []
+            raise
+        with self._lock:
+            self._apply(index, self._pending)
+            self._index = index
+            self._building = False
+            self._pending = []
+        self.last_build_seconds = time.perf_counter() - started
+        logger.info("联想索引已构建: %d 条, %d 个键, %.2fs", index.entry_count, index.key_count, self.last_build_seconds)
+        return index.entry_count
+
+    @staticmethod
+    def _apply(index: PrefixIndex, changes: Iterable[tuple]) -> None:
+        for op, book_id, title, author, rating in changes:
+            if op == "delete":
+                index.delete_book(book_id)
+            elif index.contains_book(book_id):
+                index.upsert_book(book_id, title, author)
+            else:
+                index.upsert_book(book_id, title, author, popularity_weight(0, rating))
+
+    def apply_changes(self, changes: List[tuple]) -> None:
+        """事务提交后调用：[(op, book_id, title, author, rating)]，op 为 upsert / delete"""
+        with self._lock:
+            if self._building:
+                self._pending.extend(changes)
+            if self._index is not None:
+                self._apply(self._index, changes)
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Suggestion]:
+        started = time.perf_counter()
+        with self._lock:
+            result = self._index.query(prefix, limit) if self._index is not None else []
+        self.latency.record(time.perf_counter() - started)
+        return result
+
+    def _rebuild_safely(self) -> None:
+        from app.db.database import SessionLocal
+        db = SessionLocal()
+        try:
+            self.rebuild(db)
+        except Exception as e:
+            logger.warning("联想索引构建失败: %s", e)
+        finally:
+            db.close()
+
+    async def _refresh_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.to_thread(self._rebuild_safely)
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+
+    def start(self) -> None:
+        """应用启动时调用：后台构建索引，之后按 SUGGEST_REFRESH_SECONDS 周期重建以更新热度（0 表示只构建一次）"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._refresh_loop(settings.SUGGEST_REFRESH_SECONDS))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, object]:
+        index = self._index
+        return {
+            "ready": index is not None,
+            "entries": index.entry_count if index is not None else 0,
+            "keys": index.key_count if index is not None else 0,
+            "last_build_seconds": self.last_build_seconds,
+            "latency": self.latency.snapshot(),
+        }
+
+
+suggest_service = SuggestService()
+
+
+def _collect_changes(session: Session, flush_context) -> None:
+    changes = session.info.setdefault(_CHANGES_KEY, [])
+    for obj in session.new:
+        if isinstance(obj, Book):
+            changes.append(("upsert", obj.id, obj.title, obj.author, obj.rating))
+    for obj in session.dirty:
+        if isinstance(obj, Book):
+            attrs = sa_inspect(obj).attrs
+            if attrs.title.history.has_changes() or attrs.author.history.has_changes():
+                changes.append(("upsert", obj.id, obj.title, obj.author, obj.rating))
+    for obj in session.deleted:
+        if isinstance(obj, Book):
+            changes.append(("delete", obj.id, None, None, None))
+
+
+def _apply_committed(session: Session) -> None:
+    changes = session.info.pop(_CHANGES_KEY, None)
+    if changes:
+        suggest_service.apply_changes(changes)
+
+
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_CHANGES_KEY, None)
+
+
+event.listen(Session, "after_flush", _collect_changes)
+event.listen(Session, "after_commit", _apply_committed)
+event.listen(Session, "after_rollback", _discard_changes)
@@ -1,27 +1,82 @@
 """
 向量数据库服务
+后端可插拔：Chroma（默认）或内存 NumPy 暴力检索（settings.VECTOR_BACKEND = "numpy"）
 """
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Any
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional
 from app.core.config import settings
 
 
-class VectorDBService:
-    """向量数据库服务，使用 Chroma"""
-    
+class VectorBackend(ABC):
+    """向量后端接口：VectorDBService 只依赖这些方法"""
+
+    name = "base"
+
+    @abstractmethod
+    def add(self, book_id: str, embedding: List[float], metadata: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def query(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """返回 [{book_id, metadata, distance}]，distance 越小越相似"""
+        ...
+
+    def query_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """多个查询向量一次检索，结果与输入顺序一一对应（默认逐个查询）"""
+        return [self.query(q, top_k, where) for q in query_embeddings]
+
+    @abstractmethod
+    def get_metadata(self, book_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_embeddings(self, book_ids: List[str]) -> Dict[str, List[float]]:
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    def persist(self) -> None:
+        """将未落盘的写入持久化（Chroma 自动持久化，无需操作）"""
+        return None
+
+
+class ChromaVectorBackend(VectorBackend):
+    """Chroma 持久化集合"""
+
+    name = "chroma"
+    _COUNT_TTL = 30.0  # 集合大小缓存秒数，避免每次检索前都调用 count()
+
     def __init__(self):
+        import chromadb
+        from chromadb.config import Settings
+
         # 禁用 ChromaDB telemetry 以避免错误
         import os
         os.environ["ANONYMIZED_TELEMETRY"] = "False"
-        
+
         self.client = chromadb.PersistentClient(
             path=settings.CHROMA_PERSIST_DIR,
             settings=Settings(anonymized_telemetry=False)
         )
         self.collection_name = "books"
         self.collection = self._get_or_create_collection()
-    
+        self._count = 0
+        self._count_at = 0.0
+
     def _get_or_create_collection(self):
         """获取或创建集合"""
         try:
@@ -31,7 +86,105 @@ class VectorDBService:
                 name=self.collection_name,
                 metadata={"description": "书籍向量数据库"}
             )
-    
+
+    def count(self) -> int:
+        now = time.monotonic()
+        if now - self._count_at > self._COUNT_TTL:
+            self._count = self.collection.count()
+            self._count_at = now
+        return self._count
+
+    def add(self, book_id: str, embedding: List[float], metadata: Dict[str, Any]) -> None:
+        self.collection.add(
+            ids=[str(book_id)],
+            embeddings=[embedding],
+            metadatas=[metadata]
+        )
+        self._count_at = 0.0
+
+    def query(self, query_embedding, top_k, where=None):
+        return self.query_batch([query_embedding], top_k, where)[0]
+
+    def query_batch(self, query_embeddings, top_k, where=None):
+        collection_count = self.count()
+        if collection_count == 0 or not query_embeddings:
+            return [[] for _ in query_embeddings]
+        results = self.collection.query(
+            query_embeddings=list(query_embeddings),
+            n_results=min(top_k, collection_count),
+            where=where
+        )
+        batches = []
+        for q in range(len(query_embeddings)):
+            ids = results["ids"][q] if results["ids"] and q < len(results["ids"]) else []
+            metadatas = results["metadatas"][q] if results["metadatas"] else None
+            distances = results["distances"][q] if results["distances"] else None
+            batches.append([
+                {
+                    "book_id": book_id,
+                    "metadata": metadatas[i] if metadatas else {},
+                    "distance": distances[i] if distances else 0.0
+                }
+                for i, book_id in enumerate(ids)
+            ])
+        return batches
+
+    def get_metadata(self, book_id: str) -> Optional[Dict[str, Any]]:
+        results = self.collection.get(ids=[str(book_id)])
+        if results["ids"]:
+            return results["metadatas"][0] if results["metadatas"] else {}
+        return None
+
+    def get_embeddings(self, book_ids: List[str]) -> Dict[str, List[float]]:
+        results = self.collection.get(ids=[str(bid) for bid in book_ids], include=["embeddings"])
+        out = {}
+        if results.get("ids") and results.get("embeddings"):
+            for i, bid in enumerate(results["ids"]):
+                emb = results["embeddings"][i]
+                if emb is not None:
+                    out[str(bid)] = emb
+        return out
+
+
+# 进程内共享的后端实例（NumPy 后端需把整个矩阵载入内存，不应每个服务各载一份）
+_backend: Optional[VectorBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_vector_backend() -> VectorBackend:
+    """按 settings.VECTOR_BACKEND 创建（并缓存）向量后端"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                kind = (settings.VECTOR_BACKEND or "chroma").strip().lower()
+                if kind == "numpy":
+                    from app.services.numpy_vector_index import NumpyVectorBackend
+                    _backend = NumpyVectorBackend(settings.NUMPY_INDEX_DIR)
+                else:
+                    _backend = ChromaVectorBackend()
+    return _backend
+
+
+class VectorDBService:
+    """向量数据库服务，后端见 settings.VECTOR_BACKEND"""
+
+    def __init__(self, backend: Optional[VectorBackend] = None):
+        self.backend = backend or get_vector_backend()
+
+    @property
+    def collection(self):
+        """Chroma 集合（仅 Chroma 后端，供诊断脚本使用）"""
+        return getattr(self.backend, "collection", None)
+
+    def count(self) -> int:
+        """向量条数"""
+        return self.backend.count()
+
+    def persist(self):
+        """批量写入结束后调用，确保数据落盘"""
+        self.backend.persist()
+
     async def add_book(
         self,
         book_id: str,
@@ -49,17 +202,13 @@ class VectorDBService:
                     clean_metadata[key] = value
                 else:
                     clean_metadata[key] = str(value)
-            
-            self.collection.add(
-                ids=[str(book_id)],
-                embeddings=[embedding],
-                metadatas=[clean_metadata]
-            )
+
+            self.backend.add(str(book_id), embedding, clean_metadata)
         except Exception as e:
             # 如果向量数据库添加失败，记录错误但不抛出异常
             print(f"向量数据库添加失败 (book_id={book_id}): {e}")
             raise
-    
+
     async def search_similar(
         self,
         query_embedding: List[float],
@@ -69,42 +218,41 @@ class VectorDBService:
         """搜索相似书籍"""
         try:
             where = filter_metadata if filter_metadata else None
-            
-            # 检查集合是否为空
-            collection_count = self.collection.count()
-            if collection_count == 0:
+            books = self.backend.query(query_embedding, top_k, where)
+            if not books and self.backend.count() == 0:
                 print("⚠️  向量数据库为空，返回空结果")
-                return []
-            
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=min(top_k, collection_count),
-                where=where
-            )
-            
-            books = []
-            if results["ids"] and len(results["ids"][0]) > 0:
-                for i, book_id in enumerate(results["ids"][0]):
-                    books.append({
-                        "book_id": book_id,
-                        "metadata": results["metadatas"][0][i] if results["metadatas"] else {},
-                        "distance": results["distances"][0][i] if results["distances"] else 0.0
-                    })
-            
             return books
         except Exception as e:
             print(f"⚠️  向量搜索失败: {e}")
             import traceback
             traceback.print_exc()
             return []
-    
+
+    async def search_similar_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        filters: Dict[str, Any] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """多个查询向量一次检索（Chroma 单次多向量查询 / NumPy 矩阵乘），返回与输入对齐的结果列表"""
+        if not query_embeddings:
+            return []
+        try:
+            where = filters if filters else None
+            return self.backend.query_batch(list(query_embeddings), top_k, where)
+        except Exception as e:
+            print(f"⚠️  批量向量搜索失败: {e}")
+            import traceback
+            traceback.print_exc()
+            return [[] for _ in query_embeddings]
+
     async def get_book_by_id(self, book_id: str) -> Dict[str, Any]:
         """根据ID获取书籍向量"""
-        results = self.collection.get(ids=[str(book_id)])
-        if results["ids"]:
+        metadata = self.backend.get_metadata(str(book_id))
+        if metadata is not None:
             return {
                 "book_id": book_id,
-                "metadata": results["metadatas"][0] if results["metadatas"] else {}
+                "metadata": metadata
             }
         return None
 
@@ -113,15 +261,7 @@ class VectorDBService:
         if not book_ids:
             return {}
         try:
-            ids_str = [str(bid) for bid in book_ids]
-            results = self.collection.get(ids=ids_str, include=["embeddings"])
-            out = {}
-            if results.get("ids") and results.get("embeddings"):
-                for i, bid in enumerate(results["ids"]):
-                    emb = results["embeddings"][i]
-                    if emb is not None:
-                        out[str(bid)] = emb
-            return out
+            return self.backend.get_embeddings([str(bid) for bid in book_ids])
         except Exception as e:
             print(f"⚠️  获取书籍 embedding 失败: {e}")
             return {}
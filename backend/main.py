@@ -8,44 +8,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
 
-from sqlalchemy import inspect, text
-
 from app.api import auth, books, search, recommendation, agent, bookshelf, popular
 from app.core.config import settings
-from app.db.database import engine, Base
+from app.db.database import engine
 
 # 导入模型以注册到 Base.metadata（确保新表被创建）
 from app.db import models  # noqa: F401
-# 创建数据库表
-Base.metadata.create_all(bind=engine)
-
-# 修复旧库：缺失列时自动添加
-def _migrate_db():
-    inspector = inspect(engine)
-    tables = inspector.get_table_names()
-    with engine.connect() as conn:
-        if "chat_messages" in tables:
-            cols = [c["name"] for c in inspector.get_columns("chat_messages")]
-            if "session_id" not in cols:
-                conn.execute(text("ALTER TABLE chat_messages ADD COLUMN session_id INTEGER NOT NULL DEFAULT 1"))
-                conn.commit()
-        if "users" in tables:
-            cols = [c["name"] for c in inspector.get_columns("users")]
-            if "agent_name" not in cols:
-                conn.execute(text("ALTER TABLE users ADD COLUMN agent_name VARCHAR DEFAULT '苏童童'"))
-                conn.commit()
-        if "books" in tables:
-            cols = [c["name"] for c in inspector.get_columns("books")]
-            if "douban_id" not in cols:
-                conn.execute(text("ALTER TABLE books ADD COLUMN douban_id VARCHAR"))
-                conn.commit()
-            if "rating_source" not in cols:
-                conn.execute(text("ALTER TABLE books ADD COLUMN rating_source VARCHAR DEFAULT 'douban'"))
-                conn.commit()
+from app.db.migrations import run_migrations
+
+# 创建数据库表并执行未执行过的结构迁移（补列、补索引）
 try:
-    _migrate_db()
+    run_migrations(engine)
 except Exception as e:
-    print(f"⚠️  数据库迁移检查跳过: {e}")
+    print(f"⚠️  数据库迁移失败: {e}")
 
 app = FastAPI(
     title="阅心 API",
@@ -60,6 +35,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 分页游标放在响应头中，需暴露给前端读取
+    expose_headers=["X-Feed-Cursor", "X-Next-Cursor"],
 )
 
 # 注册路由
@@ -89,6 +66,28 @@ def _log_llm_provider():
 @app.on_event("startup")
 async def startup():
     _log_llm_provider()
+    from app.services.http_client import http_clients
+    await http_clients.startup()
+    from app.services import book_stats
+    book_stats.start_reconciliation()
+    from app.services.fts_search import fts_service
+    fts_service.start_background_build()
+    from app.services import author_index
+    author_index.start_backfill()
+    from app.services.suggest_index import suggest_service
+    suggest_service.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    from app.services.suggest_index import suggest_service
+    await suggest_service.stop()
+    from app.services import book_stats
+    await book_stats.stop_reconciliation()
+    from app.services.http_client import http_clients
+    await http_clients.shutdown()
+    from app.db.database import dispose_engines
+    await dispose_engines()
 
 
 @app.get("/")
@@ -101,6 +100,34 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/api/metrics")
+async def metrics():
+    """运行指标（出站 HTTP 连接池占用、LLM 调度队列等），用于排查性能问题"""
+    from app.services.http_client import http_clients
+    from app.services.llm import llm_scheduler, get_intent_metrics
+    from app.api.popular import reason_cache
+    from app.services.candidate_store import candidate_store
+    from app.services.feed_cache import feed_cache
+    from app.services.fts_search import fts_service
+    from app.services.suggest_index import suggest_service
+    from app.api.recommendation import embedding_service, get_pipeline_metrics
+    from app.api.search import hybrid_search_service, query_translator
+    return {
+        "http_pools": http_clients.get_metrics(),
+        "llm_scheduler": llm_scheduler.get_metrics(),
+        "popular_reason_cache": reason_cache.stats(),
+        "popular_candidates": candidate_store.stats(),
+        "popular_feed": feed_cache.stats(),
+        "fts_index": fts_service.stats(),
+        "hybrid_search": hybrid_search_service.stats(),
+        "suggest_index": suggest_service.stats(),
+        "query_translation": query_translator.stats(),
+        "embedding_cache": embedding_service.cache_stats(),
+        "intent_extraction": get_intent_metrics(),
+        "semantic_pipeline": get_pipeline_metrics(),
+    }
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """捕获未处理的异常，返回 500 并打印到控制台便于排查"""
@@ -1,39 +1,29 @@
 """
-数据库迁移脚本 - 创建所有必需的表，并修复 chat_messages 表结构
+数据库迁移脚本 - 创建所有必需的表，并执行 app/db/migrations.py 中未执行过的迁移（补列、补索引）
+后端启动时也会自动执行，此脚本用于部署前单独迁移或查看迁移状态
 """
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app.db.database import engine, Base
-from app.db.models import User, Book, Bookshelf, UserPreference, ChatSession, ChatMessage
+from app.db.database import engine
+from app.db import models  # noqa: F401
+from app.db.migrations import MIGRATIONS, applied_versions, run_migrations
 from sqlalchemy import inspect
-from sqlalchemy import text
 
 print("🔄 开始数据库迁移...")
 
-# 创建所有表（包括新的 ChatSession 和 ChatMessage 表）
-Base.metadata.create_all(bind=engine)
-
-# 修复 chat_messages 表：若缺少 session_id 则添加（兼容旧库）
-inspector = inspect(engine)
-if "chat_messages" in inspector.get_table_names():
-    columns = [c["name"] for c in inspector.get_columns("chat_messages")]
-    if "session_id" not in columns:
-        print("🔄 为 chat_messages 表添加缺失的 session_id 列...")
-        with engine.connect() as conn:
-            conn.execute(text("ALTER TABLE chat_messages ADD COLUMN session_id INTEGER NOT NULL DEFAULT 1"))
-            conn.commit()
-        print("✅ 已添加 session_id 列")
-    else:
-        print("✅ chat_messages 表已包含 session_id 列")
+executed = run_migrations(engine)
+applied = set(applied_versions(engine))
+for m in MIGRATIONS:
+    mark = "🆕" if m.version in executed else ("✅" if m.version in applied else "❌")
+    print(f"  {mark} {m.version:03d}_{m.name}")
 
-print("✅ 数据库迁移完成！")
-print("   已创建/更新所有表，包括 ChatSession 和 ChatMessage 表")
+print("✅ 数据库迁移完成！" if not executed else f"✅ 数据库迁移完成，本次执行 {len(executed)} 个迁移")
 
 # 验证表是否创建成功
-tables = inspector.get_table_names()
+tables = inspect(engine).get_table_names()
 
 required_tables = ['users', 'books', 'bookshelves', 'user_preferences', 'chat_sessions', 'chat_messages']
 print("\n📊 验证表创建情况：")
@@ -0,0 +1,138 @@
+"""
+同步 Session 与 AsyncSession 并发吞吐对比（进程内 ASGI 调用，不需要启动服务）
+每轮同时发出 CONCURRENCY 个书架列表请求，并用一个探针协程测量事件循环被阻塞的时间：
+同步版本查询期间事件循环停摆，等待 LLM 的请求也随之排队；异步版本查询期间其他协程照常运行。
+用法：cd backend && python scripts/bench_async_db.py [--books 3000] [--shelf 100] [--concurrency 20] [--rounds 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 使用临时数据库，避免污染开发库（必须在导入 app 之前设置）
+_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="yuexin_bench_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_PATH}"
+os.environ["ASYNC_DATABASE_URL"] = ""
+
+import httpx
+from fastapi import FastAPI
+
+from app.db.database import Base, SessionLocal, engine
+from app.db.models import Book, Bookshelf, User
+from app.api import bookshelf
+
+
+def _seed(books: int, shelf: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add(User(id=1, email="anonymous@guest.local", username="匿名用户", hashed_password="x"))
+        db.add_all(
+            Book(
+                title=f"测试书籍{i}",
+                author=f"作者{i % 97}",
+                isbn=f"bench-{i}",
+                description="这是一段用于压测的简介。" * 8,
+                rating=6 + (i % 40) / 10,
+                category=f"分类{i % 13}",
+            )
+            for i in range(1, books + 1)
+        )
+        db.flush()
+        db.add_all(Bookshelf(user_id=1, book_id=i, status="to_read") for i in range(1, shelf + 1))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(bookshelf.router, prefix="/api/bookshelf")
+
+    @app.get("/bench/sync-bookshelf")
+    async def sync_bookshelf():
+        """改造前的写法：async 路由里直接调用同步 Session（用完立即关闭，避免压测时连接池耗尽）"""
+        db = SessionLocal()
+        try:
+            rows = db.query(Bookshelf).filter(Bookshelf.user_id == 1).all()
+            return [
+                {"id": bs.id, "book": {"id": bs.book.id, "title": bs.book.title}, "status": bs.status}
+                for bs in rows
+            ]
+        finally:
+            db.close()
+
+    return app
+
+
+async def _loop_lag_probe(stop: asyncio.Event, samples: list, interval: float = 0.005) -> None:
+    """反复 sleep 固定间隔，实际耗时减去间隔即事件循环被阻塞的时长"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+
+async def _run(client: httpx.AsyncClient, url: str, concurrency: int, rounds: int) -> dict:
+    await client.get(url)  # 预热（建立连接池、编译语句）
+    lag: list = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_loop_lag_probe(stop, lag))
+    latencies: list = []
+
+    async def one():
+        started = time.perf_counter()
+        resp = await client.get(url)
+        resp.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    latencies.sort()
+    lag.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "loop_lag_max_ms": (lag[-1] if lag else 0) * 1000,
+        "loop_lag_p95_ms": (lag[int(len(lag) * 0.95) - 1] if lag else 0) * 1000,
+    }
+
+
+async def main(args) -> None:
+    _seed(args.books, args.shelf)
+    print(f"📚 临时库 {_DB_PATH}: {args.books} 本书，书架 {args.shelf} 条；并发 {args.concurrency} × {args.rounds} 轮")
+    transport = httpx.ASGITransport(app=_build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {
+            "同步 Session（改造前）": await _run(client, "/bench/sync-bookshelf", args.concurrency, args.rounds),
+            "AsyncSession（改造后）": await _run(client, "/api/bookshelf/", args.concurrency, args.rounds),
+        }
+    from app.db.database import async_engine
+    await async_engine.dispose()
+
+    print(f"{'':<24}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'循环阻塞max':>14}{'循环阻塞p95':>14}")
+    for name, r in results.items():
+        print(
+            f"{name:<20}{r['rps']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+            f"{r['loop_lag_max_ms']:>14.1f}{r['loop_lag_p95_ms']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="同步 / 异步数据库会话并发吞吐对比")
+    parser.add_argument("--books", type=int, default=3000)
+    parser.add_argument("--shelf", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
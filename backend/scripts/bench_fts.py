@@ -0,0 +1,211 @@
+"""
+精确搜索：中文二元组 FTS 与 LIKE 回退路径的命中率、延迟对比（临时库，不需要启动服务）
+- LIKE：title / description 上的 '%词%' 全表扫描（exact_search 原先的回退路径）
+- 旧 FTS：unicode61 直接索引原文，整段汉字为一个词，只能命中与整段完全相同的查询
+- 二元组 FTS：app/services/fts_search 的切分索引与查询构造
+- 二元组 FTS + LIKE 兜底：exact_search 的实际路径，ISBN / 英文查询在 FTS 无结果时再走 LIKE（fts_search.empty_is_final）
+查询含书名 / 作者的汉字片段、英文整词、英文词中间的片段（otter -> Potter）与 ISBN 中段数字。
+召回率以 LIKE 的结果集为基准（LIKE 是子串匹配，结果即「应该命中」的集合）。
+用法：cd backend && python scripts/bench_fts.py [--books 20000] [--queries 300]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 使用临时数据库（必须在导入 app 之前设置）
+_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="yuexin_fts_"), "fts.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_PATH}"
+os.environ["ASYNC_DATABASE_URL"] = ""
+
+from sqlalchemy import or_, text
+
+from app.db.database import SessionLocal, engine
+from app.db.migrations import run_migrations
+from app.db.models import Book
+from app.services.fts_search import FTSSearchService, _CJK_RUN, empty_is_final, fts_service
+
+# 常用汉字随机组成的词表：词汇量足够大，查询选择性接近真实书目
+_HANZI = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所"
+    "民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那"
+    "社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通"
+    "并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区"
+    "强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清"
+    "森林黑暗星辰岁月故乡春秋雨夜烬河城旧梦风花雪影书灯桥舟歌诗酒茶"
+)
+_SURNAMES = "刘余路钱杨王张李陈周吴郑沈韩冯朱"
+_GIVEN = ["慈欣", "华", "遥", "钟书", "绛", "小波", "忠实", "迅", "铁生", "春树", "野圭吾", "爱玲"]
+_LATIN = ["Harry Potter", "The Hobbit", "Dune", "Foundation", "Neuromancer", "Solaris"]
+
+
+def _word(rng: random.Random) -> str:
+    return rng.choice(_HANZI) + rng.choice(_HANZI)
+
+
+def _seed(count: int, rng: random.Random) -> None:
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        books = []
+        for i in range(1, count + 1):
+            title = "".join(_word(rng) for _ in range(rng.randint(1, 3))) + (rng.choice(["", "II", "（珍藏版）", " 第2部"]))
+            if i % 10 == 0:
+                title = f"{rng.choice(_LATIN)} {i % 7}"
+            author = rng.choice(_SURNAMES) + rng.choice(_GIVEN)
+            desc = "，".join("".join(_word(rng) for _ in range(4)) for _ in range(8)) + "。"
+            books.append(dict(title=title, author=author, isbn=f"9787{i:09d}", description=desc, rating=round(rng.uniform(6, 9.6), 1)))
+        db.execute(Book.__table__.insert(), books)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _queries(count: int, rng: random.Random) -> list:
+    db = SessionLocal()
+    try:
+        titles = [t for (t,) in db.query(Book.title).all()]
+        authors = [a for (a,) in db.query(Book.author).all()]
+        isbns = [i for (i,) in db.query(Book.isbn).all()]
+    finally:
+        db.close()
+    result = []
+    while len(result) < count:
+        kind = rng.random()
+        if kind < 0.55:
+            source = rng.choice(titles)
+            runs = _CJK_RUN.findall(source)
+            if not runs:
+                result.append(("title", source.split()[0][:4]))
+                continue
+            run = max(runs, key=len)
+            n = rng.randint(2, min(4, len(run)))
+            start = rng.randint(0, len(run) - n)
+            result.append(("title", run[start:start + n]))
+        elif kind < 0.8:
+            author = rng.choice(authors)
+            result.append(("author", author[rng.randint(0, max(0, len(author) - 2)):][:3] if len(author) > 2 else author))
+        elif kind < 0.88:
+            result.append(("title", rng.choice(_LATIN).split()[0]))
+        elif kind < 0.94:
+            # 英文词中间的片段：unicode61 只能按词首前缀匹配
+            word = max(rng.choice(_LATIN).split(), key=len)
+            result.append(("title", word[1:]))
+        else:
+            # ISBN 中段数字
+            isbn = rng.choice(isbns)
+            result.append(("isbn", isbn[6:]))
+    return result
+
+
+def _like(db, field: str, term: str, limit):
+    """与 exact_search 的 LIKE 回退一致：加载完整书籍行"""
+    if field == "author":
+        query = db.query(Book).filter(Book.author.contains(term))
+    elif field == "isbn":
+        query = db.query(Book).filter(Book.isbn.contains(term))
+    else:
+        query = db.query(Book).filter(or_(Book.title.contains(term), Book.description.contains(term)))
+    if limit:
+        query = query.limit(limit)
+    ids = {b.id for b in query.all()}
+    db.expunge_all()
+    return ids
+
+
+def _legacy_setup(db) -> None:
+    db.execute(text("CREATE VIRTUAL TABLE books_fts_legacy USING fts5(title, author, isbn, description)"))
+    db.execute(text(
+        "INSERT INTO books_fts_legacy(rowid, title, author, isbn, description) SELECT id, title, author, isbn, description FROM books"
+    ))
+    db.commit()
+
+
+def _legacy(db, field: str, term: str, limit):
+    columns = field if field in ("author", "isbn") else "{title description}"
+    sql = "SELECT rowid FROM books_fts_legacy WHERE books_fts_legacy MATCH :m" + (" LIMIT :l" if limit else "")
+    escaped = term.replace('"', '""')
+    return {r[0] for r in db.execute(text(sql), {"m": f'{columns} : "{escaped}"', "l": limit})}
+
+
+def _bigram(service: FTSSearchService, db, field: str, term: str, limit):
+    books = service.search(db, **{field: term}, limit=limit or 10 ** 9)
+    db.expunge_all()
+    return None if books is None else {b.id for b in books}
+
+
+def _exact_search(service: FTSSearchService, db, field: str, term: str, limit):
+    """与 exact_search 的 _search_books 一致：FTS 无法回答、或 ISBN / 英文查询无结果时走 LIKE"""
+    found = _bigram(service, db, field, term, limit)
+    if found is None or (not found and not empty_is_final(**{field: term})):
+        return _like(db, field, term, limit)
+    return found
+
+
+def _run(name, fn, queries, truth):
+    latencies, hits, recall = [], 0, []
+    fallbacks = 0
+    for (field, term), expected in zip(queries, truth):
+        started = time.perf_counter()
+        found = fn(field, term, 100)
+        latencies.append(time.perf_counter() - started)
+        if found is None:
+            fallbacks += 1
+            continue
+        hits += bool(found)
+        if expected:
+            complete = fn(field, term, None)
+            recall.append(len(complete & expected) / len(expected))
+    latencies.sort()
+    return {
+        "name": name,
+        "hit_rate": hits / len(queries),
+        "recall": statistics.mean(recall) if recall else 0.0,
+        "fallbacks": fallbacks,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main(args) -> None:
+    rng = random.Random(args.seed)
+    _seed(args.books, rng)
+    queries = _queries(args.queries, rng)
+    db = SessionLocal()
+    try:
+        service = fts_service
+        service.check(db)
+        service.rebuild(db)  # 全量切分入索引（服务中由启动时的后台任务完成）
+        print(f"🔍 二元组索引构建 {service.last_build_seconds:.2f}s")
+        _legacy_setup(db)
+        truth = [_like(db, field, term, None) for field, term in queries]
+        print(f"📚 临时库 {_DB_PATH}: {args.books} 本书，{len(queries)} 条查询")
+        results = [
+            _run("LIKE 全表扫描", lambda f, t, l: _like(db, f, t, l), queries, truth),
+            _run("旧 FTS (unicode61)", lambda f, t, l: _legacy(db, f, t, l), queries, truth),
+            _run("二元组 FTS", lambda f, t, l: _bigram(service, db, f, t, l), queries, truth),
+            _run("二元组 FTS + LIKE 兜底", lambda f, t, l: _exact_search(service, db, f, t, l), queries, truth),
+        ]
+    finally:
+        db.close()
+        engine.dispose()
+
+    print(f"{'':<22}{'命中率':>8}{'召回率':>8}{'回退':>6}{'p50 ms':>10}{'p95 ms':>10}")
+    for r in results:
+        print(
+            f"{r['name']:<20}{r['hit_rate']:>10.1%}{r['recall']:>10.1%}{r['fallbacks']:>6}"
+            f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="中文二元组 FTS 与 LIKE 搜索对比")
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
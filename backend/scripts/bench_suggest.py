@@ -0,0 +1,125 @@
+"""
+输入联想前缀索引基准（纯内存，不需要启动服务）
+- 构建：10 万本书（书名 + 作者）全量构建耗时与键数量
+- 查询：随机取书名 / 作者的前 1-4 个字符（含拉丁字母前缀），统计 top-k 查询的 p50 / p95 / p99
+- 对照：逐条比对全部条目的线性扫描（抽样少量查询）
+- 增量：单本书新增 / 修改 / 删除的耗时（事务提交后在请求线程中执行）
+用法：cd backend && python scripts/bench_suggest.py [--books 100000] [--queries 5000] [-k 8]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 使用临时数据库（必须在导入 app 之前设置；本脚本不读写数据库）
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='yuexin_suggest_'), 'suggest.db')}"
+os.environ["ASYNC_DATABASE_URL"] = ""
+
+from app.services.author_index import PINYIN_AVAILABLE
+from app.services.suggest_index import PrefixIndex, normalize_key
+
+_HANZI = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所"
+    "民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那"
+    "森林黑暗星辰岁月故乡春秋雨夜烬河城旧梦风花雪影书灯桥舟歌诗酒茶"
+)
+_SURNAMES = "刘余路钱杨王张李陈周吴郑沈韩冯朱"
+_LATIN = ["harry", "hobbit", "dune", "foundation", "neuromancer", "solaris", "the", "night", "river", "garden"]
+
+
+def _rows(count: int, rng: random.Random) -> list:
+    rows = []
+    for i in range(1, count + 1):
+        if i % 8 == 0:
+            title = " ".join(rng.choice(_LATIN).title() for _ in range(rng.randint(1, 3))) + f" {i % 97}"
+        else:
+            title = "".join(rng.choice(_HANZI) for _ in range(rng.randint(2, 8)))
+        author = rng.choice(_SURNAMES) + "".join(rng.choice(_HANZI) for _ in range(rng.randint(1, 2)))
+        if i % 20 == 0:
+            author += "，" + rng.choice(_SURNAMES) + rng.choice(_HANZI)
+        # 热度长尾分布：多数书 0-2 次，少数上百次
+        popularity = int(rng.paretovariate(1.2)) - 1
+        rows.append((i, title, author, popularity + rng.uniform(6, 9.6) / 100))
+    return rows
+
+
+def _prefixes(rows: list, count: int, rng: random.Random) -> list:
+    result = []
+    while len(result) < count:
+        _, title, author, _ = rng.choice(rows)
+        source = normalize_key(title if rng.random() < 0.7 else author)
+        if source:
+            result.append(source[:rng.randint(1, min(4, len(source)))])
+    return result
+
+
+def _linear(rows: list, prefix: str, k: int) -> list:
+    p = normalize_key(prefix)
+    hits = [(w, t) for _, t, a, w in rows if normalize_key(t).startswith(p) or normalize_key(a).startswith(p)]
+    return sorted(hits, reverse=True)[:k]
+
+
+def _percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return f"p50 {statistics.median(samples) * 1000:.3f} ms  p95 {pick(0.95):.3f} ms  p99 {pick(0.99):.3f} ms"
+
+
+def main(args) -> None:
+    rng = random.Random(args.seed)
+    rows = _rows(args.books, rng)
+    print(f"📚 {args.books} 本书，pypinyin {'已安装' if PINYIN_AVAILABLE else '未安装（不生成拼音键）'}")
+
+    started = time.perf_counter()
+    index = PrefixIndex.build(rows)
+    print(f"🔨 全量构建 {time.perf_counter() - started:.2f}s：{index.entry_count} 条，{index.key_count} 个键")
+
+    prefixes = _prefixes(rows, args.queries, rng)
+    latencies, empty = [], 0
+    for p in prefixes:
+        t = time.perf_counter()
+        result = index.query(p, args.k)
+        latencies.append(time.perf_counter() - t)
+        empty += not result
+    print(f"⚡ 前缀索引 {len(prefixes)} 次查询：{_percentiles(latencies)}（无结果 {empty} 次）")
+    by_length = {}
+    for p, s in zip(prefixes, latencies):
+        by_length.setdefault(len(p), []).append(s)
+    for n in sorted(by_length):
+        print(f"    前缀长 {n}: {_percentiles(by_length[n])}")
+
+    sample = prefixes[:args.linear_sample]
+    linear = []
+    for p in sample:
+        t = time.perf_counter()
+        _linear(rows, p, args.k)
+        linear.append(time.perf_counter() - t)
+    print(f"🐢 线性扫描 {len(sample)} 次查询：{_percentiles(linear)}")
+
+    upserts, deletes = [], []
+    for i in range(200):
+        book_id = args.books + 1 + i
+        t = time.perf_counter()
+        index.upsert_book(book_id, "".join(rng.choice(_HANZI) for _ in range(4)), rng.choice(_SURNAMES) + "新", 0.09)
+        upserts.append(time.perf_counter() - t)
+    for i in range(200):
+        t = time.perf_counter()
+        index.delete_book(args.books + 1 + i)
+        deletes.append(time.perf_counter() - t)
+    print(f"✏️  增量新增：{_percentiles(upserts)}")
+    print(f"🗑️  增量删除：{_percentiles(deletes)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="输入联想前缀索引基准")
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--linear-sample", type=int, default=50)
+    parser.add_argument("-k", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
@@ -0,0 +1,45 @@
+"""
+把 Chroma 向量库导出为 NumPy 索引（VECTOR_BACKEND=numpy 时使用）
+用法：cd backend && python scripts/build_numpy_index.py
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.vector_db import ChromaVectorBackend
+from app.services.numpy_vector_index import NumpyVectorBackend
+
+
+def build_numpy_index(batch_size: int = 500):
+    source = ChromaVectorBackend()
+    total = source.collection.count()
+    print(f"📚 Chroma 中共有 {total} 条向量，导出到 {settings.NUMPY_INDEX_DIR} ...")
+    if total == 0:
+        print("⚠️  Chroma 向量库为空，请先运行 init_books.py 或 generate_vectors.py")
+        return
+
+    target = NumpyVectorBackend(settings.NUMPY_INDEX_DIR)
+    exported = 0
+    for offset in range(0, total, batch_size):
+        results = source.collection.get(
+            limit=batch_size,
+            offset=offset,
+            include=["embeddings", "metadatas"]
+        )
+        for i, book_id in enumerate(results["ids"]):
+            embedding = results["embeddings"][i]
+            if embedding is None:
+                continue
+            metadata = results["metadatas"][i] if results["metadatas"] else {}
+            target.add(book_id, embedding, metadata or {})
+            exported += 1
+        print(f"  📊 进度: {min(offset + batch_size, total)}/{total}")
+
+    target.persist()
+    print(f"✅ 完成！共导出 {exported} 条向量")
+
+
+if __name__ == "__main__":
+    build_numpy_index()
@@ -0,0 +1,105 @@
+"""
+N+1 回归检查：书架大小分别为 1 / 20 / 200 时，统计书架列表接口与书架画像查询执行的 SQL 语句数，
+语句数随书架大小变化（出现逐条懒加载）即以非零状态码退出，可接入 CI。
+用法：cd backend && python scripts/check_query_counts.py [--sizes 1 20 200] [-v]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 使用临时数据库（必须在导入 app 之前设置）
+_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="yuexin_n1_"), "n1.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_PATH}"
+os.environ["ASYNC_DATABASE_URL"] = ""
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import delete
+
+from app.api import bookshelf
+from app.api.popular import _get_user_shelf_profile
+from app.db.database import AsyncSessionLocal, SessionLocal, dispose_engines, engine
+from app.db.migrations import run_migrations
+from app.db.models import Book, Bookshelf, User
+from app.db.query_counter import count_queries
+
+_STATUSES = ["to_read", "reading", "read", "dropped"]
+
+
+def _seed(max_shelf: int) -> None:
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        db.add(User(id=1, email="anonymous@guest.local", username="匿名用户", hashed_password="x"))
+        db.add_all(
+            Book(title=f"测试书籍{i}", author=f"作者{i % 17}", isbn=f"n1-{i}", rating=7.5, category=f"分类{i % 5}")
+            for i in range(1, max_shelf + 1)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _fill_shelf(size: int) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(delete(Bookshelf))
+        db.add_all(
+            Bookshelf(user_id=1, book_id=i, status=_STATUSES[i % len(_STATUSES)]) for i in range(1, size + 1)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _measure(client: httpx.AsyncClient) -> dict:
+    counts = {}
+    with count_queries() as log:
+        resp = await client.get("/api/bookshelf/")
+        resp.raise_for_status()
+    counts["GET /api/bookshelf/"] = (log.count, log.statements)
+    with count_queries() as log:
+        async with AsyncSessionLocal() as db:
+            await _get_user_shelf_profile(db, 1)
+    counts["_get_user_shelf_profile"] = (log.count, log.statements)
+    return counts
+
+
+async def main(args) -> int:
+    _seed(max(args.sizes))
+    app = FastAPI()
+    app.include_router(bookshelf.router, prefix="/api/bookshelf")
+    results = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://check") as client:
+        await client.get("/api/bookshelf/")  # 预热（建立连接，避免把首次 PRAGMA 等计入）
+        for size in args.sizes:
+            _fill_shelf(size)
+            results[size] = await _measure(client)
+    await dispose_engines()
+
+    failed = False
+    for name in results[args.sizes[0]]:
+        per_size = {size: results[size][name][0] for size in args.sizes}
+        constant = len(set(per_size.values())) == 1
+        failed |= not constant
+        detail = "  ".join(f"书架 {size}: {n} 条" for size, n in per_size.items())
+        print(f"{'✅' if constant else '❌'} {name:<28}{detail}")
+        if args.verbose or not constant:
+            for stmt in results[args.sizes[-1]][name][1]:
+                print(f"      {' '.join(stmt.split())[:160]}")
+    if failed:
+        print("\n❌ SQL 语句数随书架大小增长，存在 N+1 查询")
+        return 1
+    print("\n✅ SQL 语句数与书架大小无关")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="书架相关查询的 N+1 回归检查")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 20, 200])
+    parser.add_argument("-v", "--verbose", action="store_true", help="打印最大书架下执行的全部语句")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,101 @@
+"""
+热点查询执行计划回归检查：对临时库执行全部迁移后，逐条 EXPLAIN QUERY PLAN，
+任何一条退化为全表扫描（SCAN <表> 且未使用索引）即以非零状态码退出，可接入 CI。
+新增热点查询或修改过滤条件时在 HOT_QUERIES 中补充对应语句。
+用法：cd backend && python scripts/check_query_plans.py [-v]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 使用临时数据库（必须在导入 app 之前设置）
+_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="yuexin_plan_"), "plan.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_PATH}"
+os.environ["ASYNC_DATABASE_URL"] = ""
+
+from sqlalchemy import select
+
+from app.db.database import engine
+from app.db.migrations import run_migrations
+from app.db.models import (
+    Book,
+    BookStats,
+    Bookshelf,
+    ChatMessage,
+    ChatSession,
+    EmbeddingCacheEntry,
+    UserInterestFact,
+    UserPreference,
+)
+from app.services.author_index import author_condition
+
+# (说明, 语句)：与接口中的查询保持相同的过滤与排序条件
+HOT_QUERIES = [
+    ("书架查重 (user_id, book_id)", select(Bookshelf).where(Bookshelf.user_id == 1, Bookshelf.book_id == 2)),
+    ("书架列表 user_id 键集分页", select(Bookshelf).where(Bookshelf.user_id == 1, Bookshelf.id > 0).order_by(Bookshelf.id).limit(20)),
+    ("书架列表按状态筛选", select(Bookshelf).where(Bookshelf.user_id == 1, Bookshelf.status == "read").order_by(Bookshelf.id)),
+    ("书架画像 状态 IN", select(Bookshelf).where(Bookshelf.user_id == 1, Bookshelf.status.in_(["to_read", "read"]))),
+    ("书架画像 JOIN books", select(Bookshelf.book_id, Bookshelf.status, Book.author, Book.category)
+        .join(Book, Book.id == Bookshelf.book_id)
+        .where(Bookshelf.user_id == 1, Bookshelf.status.in_(["to_read", "read", "dropped"]))),
+    ("不感兴趣列表 (user_id, preference_type)", select(UserPreference.book_id).where(
+        UserPreference.user_id == 1, UserPreference.preference_type == "not_interested")),
+    ("会话列表 user_id", select(ChatSession).where(ChatSession.user_id == 1)),
+    ("会话按书筛选 (user_id, book_id)", select(ChatSession).where(ChatSession.user_id == 1, ChatSession.book_id == 2)),
+    ("最近对话上下文 (session_id, created_at)", select(ChatMessage.role, ChatMessage.content).where(
+        ChatMessage.session_id == 1).order_by(ChatMessage.created_at.desc()).limit(10)),
+    ("消息键集分页 (session_id, id)", select(ChatMessage).where(
+        ChatMessage.session_id == 1, ChatMessage.id < 100).order_by(ChatMessage.id.desc()).limit(50)),
+    ("兴趣事实查重 (user_id, fact_value)", select(UserInterestFact).where(
+        UserInterestFact.user_id == 1, UserInterestFact.fact_value == "科幻")),
+    ("兴趣事实注入 user_id", select(UserInterestFact.fact_value).where(
+        UserInterestFact.user_id == 1, UserInterestFact.weight >= 0.2)
+        .order_by(UserInterestFact.last_mentioned_at.desc()).limit(15)),
+    ("书籍详情 id", select(Book).where(Book.id == 1)),
+    ("书籍列表键集分页", select(Book).where(Book.id > 100).order_by(Book.id).limit(20)),
+    ("当前页书籍 id IN", select(Book).where(Book.id.in_([1, 2, 3]))),
+    ("作者子串 / 拼音 (book_author_terms 前缀范围)", select(Book).where(author_condition("慈欣")).limit(100)),
+    ("book_stats 单书", select(BookStats).where(BookStats.book_id == 1)),
+    ("embedding 缓存 key", select(EmbeddingCacheEntry).where(EmbeddingCacheEntry.cache_key == "k")),
+]
+
+# 「SCAN 表名」后没有 USING ... INDEX 即为全表扫描；SEARCH 与按索引有序扫描均可接受
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+
+
+def explain(conn, stmt) -> list:
+    # 参数直接内联（IN 列表等展开参数无法以占位符形式 EXPLAIN）
+    compiled = stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled)).fetchall()
+    return [row[-1] for row in rows]
+
+
+def main(verbose: bool) -> int:
+    run_migrations(engine)
+    failures = []
+    with engine.connect() as conn:
+        for label, stmt in HOT_QUERIES:
+            plan = explain(conn, stmt)
+            scans = [d for d in plan if _FULL_SCAN.match(d.strip())]
+            if scans:
+                failures.append(label)
+            print(f"{'❌' if scans else '✅'} {label}")
+            if verbose or scans:
+                for detail in plan:
+                    print(f"      {detail}")
+    engine.dispose()
+    if failures:
+        print(f"\n❌ {len(failures)} 条热点查询退化为全表扫描: {', '.join(failures)}")
+        return 1
+    print(f"\n✅ {len(HOT_QUERIES)} 条热点查询均命中索引")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="热点查询执行计划回归检查")
+    parser.add_argument("-v", "--verbose", action="store_true", help="打印每条查询的完整执行计划")
+    sys.exit(main(parser.parse_args().verbose))
@@ -79,6 +79,7 @@ async def generate_vectors_for_existing_books():
         
     finally:
         db.close()
+        vector_db_service.persist()
 
 
 if __name__ == "__main__":
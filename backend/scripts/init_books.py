@@ -10,17 +10,19 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sqlalchemy.orm import Session
-from app.db.database import SessionLocal, engine, Base
+from app.db.database import SessionLocal, engine
+from app.db.migrations import run_migrations
 from app.db.models import Book
 from app.services.book_data import BookDataService
 from app.services.embedding import EmbeddingService
+from app.services.fts_search import fts_service
 from app.services.vector_db import VectorDBService
 
 
 async def init_books():
     """初始化书籍数据"""
     # 创建数据库表
-    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
     
     db: Session = SessionLocal()
     book_data_service = BookDataService()
@@ -263,7 +265,17 @@ async def init_books():
             db.rollback()
             continue
     
+    # 新书经 ORM 事件已写入 FTS 索引；这里再核对一次签名，补上事件未覆盖的写入（如 FTS 表在导入中途才创建），
+    # 否则正在运行的后端在下次重启前搜不到这些书
+    try:
+        if fts_service.check(db):
+            print("🔍 FTS 索引与书籍表不一致，正在重建...")
+            fts_service.rebuild(db)
+    except Exception as e:
+        print(f"⚠️  FTS 索引检查失败，请运行 python scripts/init_fts.py 重建: {e}")
+    
     db.close()
+    vector_db_service.persist()
     print(f"\n{'='*50}")
     print(f"✅ 完成！")
     print(f"   - 共保存: {saved_count} 本书籍")
@@ -1,14 +1,15 @@
 """
 初始化 FTS 全文搜索索引
-首次使用精确搜索前运行此脚本，或当书籍数据更新后重建索引
+后端启动时会自动检查并在后台补建索引；通过脚本 / 原生 SQL 批量修改书籍数据后，可运行此脚本立即重建
 """
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.db.database import SessionLocal
-from app.services.fts_search import FTSSearchService
+from app.db.database import SessionLocal, engine
+from app.db.migrations import run_migrations
+from app.services.fts_search import fts_service
 
 
 def init_fts():
@@ -16,7 +17,11 @@ def init_fts():
     db = SessionLocal()
     try:
         print("🔍 初始化 FTS 全文搜索索引...")
-        fts_service = FTSSearchService(db)
+        run_migrations(engine)  # 确保 books_fts 表已按当前结构创建
+        fts_service.check(db)
+        if not fts_service.available:
+            print("⚠️  当前 SQLite 不支持 FTS5，精确搜索将使用普通 LIKE 搜索")
+            return
         
         # 检查书籍数量
         from app.db.models import Book
@@ -24,7 +29,8 @@ def init_fts():
         print(f"📚 数据库中有 {book_count} 本书籍")
         
         # 重建索引（确保数据同步）
-        fts_service.rebuild_fts_index()
+        rows = fts_service.rebuild(db)
+        print(f"✅ 已写入 {rows} 本书，用时 {fts_service.last_build_seconds:.2f}s")
         
         print("✅ FTS 索引初始化完成！精确搜索性能已优化。")
     except Exception as e:
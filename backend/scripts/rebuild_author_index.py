@@ -0,0 +1,26 @@
+"""
+全量重建作者索引（book_authors / book_author_terms）
+后端启动时只为缺少索引的书补建；安装 pypinyin 后、或通过原生 SQL 批量修改了 books.author 时运行此脚本
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import engine
+from app.db.migrations import run_migrations
+from app.services.author_index import PINYIN_AVAILABLE, rebuild_author_index
+
+
+def main():
+    print("🔍 重建作者索引...")
+    run_migrations(engine)
+    if not PINYIN_AVAILABLE:
+        print("⚠️  未安装 pypinyin，跳过拼音检索词（pip install pypinyin 后重新运行即可支持拼音搜索作者）")
+    with engine.begin() as conn:
+        rows = rebuild_author_index(conn)
+    print(f"✅ 作者索引重建完成：{rows} 位作者")
+
+
+if __name__ == "__main__":
+    main()
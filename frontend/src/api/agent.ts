@@ -1,4 +1,4 @@
-import { apiClient } from './client'
+import { apiClient, postEventStream } from './client'
 
 export interface ChatMessageRequest {
   message: string
@@ -14,6 +14,14 @@ export interface ChatResponse {
   used_fallback?: boolean
 }
 
+/** 流式对话结束事件：回复已保存 */
+export interface ChatStreamDone {
+  message_id: number | null
+  response: string
+  agent_name: string
+  used_fallback?: boolean
+}
+
 export interface ChatMessage {
   id: number
   role: 'user' | 'agent'
@@ -68,6 +76,19 @@ export const agentAPI = {
     return response.data
   },
 
+  /** 流式对话（SSE）：每收到一段回复调用 onDelta，结束后返回已保存的完整回复 */
+  chatStream: async (data: ChatMessageRequest, onDelta: (text: string) => void): Promise<ChatStreamDone> => {
+    let done: ChatStreamDone | null = null
+    await postEventStream('/api/agent/chat/stream', data, (event, payload) => {
+      if (event === 'delta') onDelta(payload.text || '')
+      else if (event === 'done') done = payload as ChatStreamDone
+    })
+    if (!done) {
+      throw new Error('对话连接意外中断')
+    }
+    return done
+  },
+
   getMessages: async (sessionId: number, limit = 50) => {
     const response = await apiClient.get<ChatMessage[]>(`/api/agent/sessions/${sessionId}/messages`, {
       params: { limit },
@@ -76,6 +97,24 @@ export const agentAPI = {
     return response.data
   },
 
+  /** 最近的消息 + 更早消息的游标（cursor 为 null 表示已到最早） */
+  getMessagesPage: async (sessionId: number, options?: { cursor?: string | null; limit?: number }) => {
+    const params: Record<string, string | number | boolean> = { limit: options?.limit ?? 50 }
+    if (options?.cursor) {
+      params.cursor = options.cursor
+    } else {
+      params.latest = true
+    }
+    const response = await apiClient.get<ChatMessage[]>(`/api/agent/sessions/${sessionId}/messages`, {
+      params,
+      timeout: 60000,
+    })
+    return {
+      messages: response.data,
+      olderCursor: (response.headers['x-next-cursor'] as string | undefined) || null,
+    }
+  },
+
   deleteMessage: async (messageId: number) => {
     const response = await apiClient.delete(`/api/agent/messages/${messageId}`)
     return response.data
@@ -57,3 +57,55 @@ apiClient.interceptors.response.use(
     return Promise.reject(error)
   }
 )
+
+/**
+ * POST 并以 Server-Sent Events 逐条读取响应（axios 无法在浏览器中逐段读取响应体，这里直接使用 fetch）。
+ * 每收到一个事件调用 onEvent(事件名, 解析后的 data)。
+ */
+export async function postEventStream(
+  url: string,
+  body: unknown,
+  onEvent: (event: string, data: any) => void,
+  signal?: AbortSignal
+): Promise<void> {
+  const headers: Record<string, string> = { 'Content-Type': 'application/json' }
+  const token = localStorage.getItem('token')
+  if (token) {
+    headers.Authorization = `Bearer ${token}`
+  }
+  const response = await fetch(`${API_BASE_URL}${url}`, {
+    method: 'POST',
+    headers,
+    body: JSON.stringify(body),
+    signal,
+  })
+  if (!response.ok || !response.body) {
+    let detail = `请求失败（${response.status}）`
+    try {
+      detail = (await response.json()).detail || detail
+    } catch {
+      // 响应体不是 JSON，保留默认提示
+    }
+    throw new Error(detail)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    const events = buffer.split('\n\n')
+    buffer = events.pop() || ''
+    for (const raw of events) {
+      let event = 'message'
+      let payload = ''
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) payload += line.slice(5).trim()
+      }
+      if (payload) onEvent(event, JSON.parse(payload))
+    }
+  }
+}
@@ -5,6 +5,11 @@ export interface BookWithReason extends Book {
   reason?: string  // 推荐理由
 }
 
+export interface PopularPage {
+  books: BookWithReason[]
+  cursor: string | null  // 下一页游标，null 表示已无更多
+}
+
 export const popularAPI = {
   getEveryoneWatching: async (
     skip = 0,
@@ -21,4 +26,23 @@ export const popularAPI = {
     })
     return response.data
   },
+
+  /** 游标分页：首页不传 cursor，之后传上一页返回的 cursor（服务端按用户快照切片，翻页结果稳定） */
+  getEveryoneWatchingPage: async (
+    limit = 20,
+    options?: { cursor?: string | null; refresh?: boolean }
+  ): Promise<PopularPage> => {
+    const params: Record<string, string | number | boolean> = { limit }
+    if (options?.cursor) {
+      params.cursor = options.cursor
+    }
+    if (options?.refresh) {
+      params.refresh = true
+      params._t = Date.now() // 避免 HTTP 缓存
+    }
+    const response = await apiClient.get<BookWithReason[]>('/api/popular/everyone-watching', {
+      params,
+    })
+    return { books: response.data, cursor: response.headers['x-feed-cursor'] || null }
+  },
 }
@@ -1,4 +1,4 @@
-import { apiClient } from './client'
+import { apiClient, postEventStream } from './client'
 
 export interface RecommendationItem {
   book_id: number
@@ -17,6 +17,13 @@ export interface RecommendationResponse {
   agent_name?: string  // AI书童名称
 }
 
+/** 流式推荐中单条推荐语生成完成的推送 */
+export interface RecommendationTextUpdate {
+  book_id: number
+  recommendation_text: string
+  highlighted_words: string[]
+}
+
 export const recommendationAPI = {
   semanticRecommendation: async (query: string, signal?: AbortSignal) => {
     const response = await apiClient.post<RecommendationResponse>(
@@ -26,4 +33,46 @@ export const recommendationAPI = {
     )
     return response.data
   },
+
+  /**
+   * 流式语义推荐（SSE）：书单确定后立即回调 onBooks（推荐语为空），
+   * 之后每条推荐语生成完成即回调 onText；结束后返回完整结果
+   */
+  semanticRecommendationStream: async (
+    query: string,
+    handlers: {
+      onBooks: (response: RecommendationResponse) => void
+      onText: (update: RecommendationTextUpdate) => void
+    },
+    signal?: AbortSignal
+  ): Promise<RecommendationResponse> => {
+    let result: RecommendationResponse | null = null
+    let finished = false
+    await postEventStream(
+      '/api/recommendation/semantic/stream',
+      { query },
+      (event, data) => {
+        if (event === 'books') {
+          result = data as RecommendationResponse
+          handlers.onBooks(result)
+        } else if (event === 'text' && result) {
+          const update = data as RecommendationTextUpdate
+          result = {
+            ...result,
+            recommendations: result.recommendations.map((item) =>
+              item.book_id === update.book_id ? { ...item, ...update } : item
+            ),
+          }
+          handlers.onText(update)
+        } else if (event === 'done') {
+          finished = true
+        }
+      },
+      signal
+    )
+    if (!result || !finished) {
+      throw new Error('推荐连接意外中断')
+    }
+    return result
+  },
 }
@@ -1,6 +1,24 @@
 import { apiClient } from './client'
 import { Book } from './books'
 
+export interface HybridSearchBook extends Book {
+  score: number
+  sources: string[]
+}
+
+export interface SearchSuggestion {
+  text: string
+  kind: 'title' | 'author'
+  book_id?: number | null
+}
+
+export interface HybridSearchResponse {
+  query: string
+  books: HybridSearchBook[]
+  timings_ms: Record<string, number>
+  degraded: string[]
+}
+
 export const searchAPI = {
   exactSearch: async (
     params: { isbn?: string; title?: string; author?: string },
@@ -9,4 +27,20 @@ export const searchAPI = {
     const response = await apiClient.get<Book[]>('/api/search/exact', { params, signal })
     return response.data
   },
+
+  suggest: async (q: string, limit = 8, signal?: AbortSignal) => {
+    const response = await apiClient.get<SearchSuggestion[]>('/api/search/suggest', {
+      params: { q, limit },
+      signal,
+    })
+    return response.data
+  },
+
+  hybridSearch: async (q: string, limit = 20, signal?: AbortSignal) => {
+    const response = await apiClient.get<HybridSearchResponse>('/api/search/hybrid', {
+      params: { q, limit },
+      signal,
+    })
+    return response.data
+  },
 }
@@ -18,8 +18,15 @@ export default function AgentChatModal({ bookId, isOpen, onClose, initialSession
   const [sessions, setSessions] = useState<ChatSession[]>([])
   const [currentSessionId, setCurrentSessionId] = useState<number | null>(null)
   const [messages, setMessages] = useState<ChatMessage[]>([])
+  /** 更早消息的分页游标（null 表示已加载到最早一条） */
+  const [olderCursor, setOlderCursor] = useState<string | null>(null)
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false)
+  /** 在列表顶部插入更早的消息时不滚动到底部 */
+  const skipScrollRef = useRef(false)
   const [input, setInput] = useState('')
   const [isLoading, setIsLoading] = useState(false)
+  // 流式回复已开始输出（此时隐藏「正在思考」占位）
+  const [isReplyStreaming, setIsReplyStreaming] = useState(false)
   const [isEditingName, setIsEditingName] = useState(false)
   const [agentName, setAgentName] = useState('苏童童')
   const [isCreatingSession, setIsCreatingSession] = useState(false)
@@ -222,11 +229,16 @@ export default function AgentChatModal({ bookId, isOpen, onClose, initialSession
       loadMessages(currentSessionId)
     } else {
       setMessages([])
+      setOlderCursor(null)
     }
   }, [currentSessionId])
 
   // 消息列表变化时滚动到底部
   useEffect(() => {
+    if (skipScrollRef.current) {
+      skipScrollRef.current = false
+      return
+    }
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
   }, [messages])
 
@@ -302,7 +314,8 @@ export default function AgentChatModal({ bookId, isOpen, onClose, initialSession
 
   const loadMessages = async (sessionId: number) => {
     try {
-      const loadedMessages = await agentAPI.getMessages(sessionId)
+      const { messages: loadedMessages, olderCursor: cursor } = await agentAPI.getMessagesPage(sessionId)
+      setOlderCursor(cursor)
       if (loadedMessages.length === 0) {
         // 如果没有历史记录，显示欢迎消息
         setMessages([
@@ -327,6 +340,27 @@ export default function AgentChatModal({ bookId, isOpen, onClose, initialSession
     }
   }
 
+  const loadOlderMessages = async () => {
+    if (!currentSessionId || !olderCursor || isLoadingOlder) return
+    setIsLoadingOlder(true)
+    try {
+      const { messages: older, olderCursor: cursor } = await agentAPI.getMessagesPage(currentSessionId, {
+        cursor: olderCursor,
+      })
+      setOlderCursor(cursor)
+      skipScrollRef.current = true
+      setMessages((prev) => {
+        const seen = new Set(prev.map((m) => m.id))
+        return [...older.filter((m) => !seen.has(m.id)), ...prev]
+      })
+    } catch (error: any) {
+      console.error('加载更早的消息失败:', error)
+      showToast('加载更早的消息失败', 'error')
+    } finally {
+      setIsLoadingOlder(false)
+    }
+  }
+
   const handleCreateSession = async () => {
     if (!newSessionName.trim()) {
       showToast('请输入对话名称', 'error')
@@ -439,29 +473,52 @@ export default function AgentChatModal({ bookId, isOpen, onClose, initialSession
     setMessages((prev) => [...prev, tempUserMessage])
     setIsLoading(true)
 
+    // 流式接收回复：首段到达时插入临时 AI 消息，之后逐段追加
+    const tempAgentId = tempUserMessage.id + 1
     try {
-      const response = await agentAPI.chat({
-        message: userMessage,
-        session_id: sessionId!,
-        book_id: bookId || undefined,
-      })
+      const response = await agentAPI.chatStream(
+        {
+          message: userMessage,
+          session_id: sessionId!,
+          book_id: bookId || undefined,
+        },
+        (text) => {
+          setIsReplyStreaming(true)
+          setMessages((prev) => {
+            if (!prev.some((msg) => msg.id === tempAgentId)) {
+              return [
+                ...prev,
+                {
+                  id: tempAgentId,
+                  role: 'agent',
+                  content: text,
+                  created_at: new Date().toISOString(),
+                  book_id: bookId || null,
+                },
+              ]
+            }
+            return prev.map((msg) => (msg.id === tempAgentId ? { ...msg, content: msg.content + text } : msg))
+          })
+        }
+      )
       if (response.used_fallback) {
         showToast('当前为简要回复，未使用 DeepSeek。请检查 DEEPSEEK_API_KEY 或到 platform.deepseek.com 充值后重试。', 'error')
       }
-      // 替换临时消息并添加AI回复
+      // 用已保存的消息 ID 替换临时消息
+      const agentMessageId = response.message_id ?? tempAgentId
       setMessages((prev) => {
-        const filtered = prev.filter((msg) => msg.id !== tempUserMessage.id)
+        const filtered = prev.filter((msg) => msg.id !== tempUserMessage.id && msg.id !== tempAgentId)
         return [
           ...filtered,
           {
-            id: response.message_id - 1,
+            id: response.message_id != null ? response.message_id - 1 : tempUserMessage.id,
             role: 'user',
             content: userMessage,
             created_at: new Date().toISOString(),
             book_id: bookId || null,
           },
           {
-            id: response.message_id,
+            id: agentMessageId,
             role: 'agent',
             content: response.response,
             created_at: new Date().toISOString(),
@@ -469,17 +526,14 @@ export default function AgentChatModal({ bookId, isOpen, onClose, initialSession
           },
         ]
       })
-      setStreamingMessageId(response.message_id)
-      setStreamingFullText(response.response)
-      setStreamingDisplayedLength(0)
-      // 更新会话列表（不重载本会话消息，保留逐步展示效果）
+      // 更新会话列表（不重载本会话消息）
       await loadSessions()
     } catch (error: any) {
       console.error('发送消息失败:', error)
       const errorMsg = error.response?.data?.detail || error.message || '网络错误'
       showToast(`发送失败: ${errorMsg}`, 'error')
       setMessages((prev) => {
-        const filtered = prev.filter((msg) => msg.id !== tempUserMessage.id)
+        const filtered = prev.filter((msg) => msg.id !== tempUserMessage.id && msg.id !== tempAgentId)
         return [
           ...filtered,
           {
@@ -493,6 +547,7 @@ export default function AgentChatModal({ bookId, isOpen, onClose, initialSession
       })
     } finally {
       setIsLoading(false)
+      setIsReplyStreaming(false)
     }
   }
 
@@ -784,6 +839,17 @@ export default function AgentChatModal({ bookId, isOpen, onClose, initialSession
 
             {/* 消息列表 */}
             <div className="flex-1 overflow-y-auto p-4 md:p-6 space-y-4">
+              {olderCursor && messages.length > 0 && (
+                <div className="text-center">
+                  <button
+                    onClick={loadOlderMessages}
+                    disabled={isLoadingOlder}
+                    className="text-xs text-foreground/60 hover:text-foreground disabled:opacity-50"
+                  >
+                    {isLoadingOlder ? '加载中...' : '加载更早的消息'}
+                  </button>
+                </div>
+              )}
               {messages.length === 0 ? (
                 proactiveCare ? (
                   <div className="flex justify-start">
@@ -836,7 +902,7 @@ export default function AgentChatModal({ bookId, isOpen, onClose, initialSession
                   </div>
                   ))
               )}
-              {isLoading && (
+              {isLoading && !isReplyStreaming && (
                 <div className="flex justify-start">
                   <div className="flex items-center gap-2 bg-background border border-border rounded-lg px-4 py-3 animate-pulse">
                     <Bot className="w-4 h-4 text-purple-500 animate-pulse" />
@@ -73,13 +73,20 @@ export default function RecommendationCard({
         <div className="flex flex-col md:flex-row gap-6">
           {/* 左侧：推荐语 + 操作按钮（平分卡片宽度） */}
           <div className="flex-1 flex flex-col gap-4">
-            <p
-              className="text-xl md:text-2xl leading-relaxed text-foreground font-light"
-              style={{ lineHeight: '1.8' }}
-              dangerouslySetInnerHTML={{
-                __html: highlightText(item.recommendation_text, item.highlighted_words),
-              }}
-            />
+            {item.recommendation_text ? (
+              <p
+                className="text-xl md:text-2xl leading-relaxed text-foreground font-light"
+                style={{ lineHeight: '1.8' }}
+                dangerouslySetInnerHTML={{
+                  __html: highlightText(item.recommendation_text, item.highlighted_words),
+                }}
+              />
+            ) : (
+              // 流式推荐：书单先到，推荐语仍在生成
+              <p className="text-xl md:text-2xl leading-relaxed text-foreground/40 font-light animate-pulse" style={{ lineHeight: '1.8' }}>
+                正在为你写推荐语…
+              </p>
+            )}
             <div className="flex gap-3 w-full">
               <button
                 onClick={() => onViewDetails(item.book_id)}
@@ -1,11 +1,13 @@
-import { useState } from 'react'
+import { useEffect, useState } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { Search as SearchIcon, Sparkles, BookOpen } from 'lucide-react'
 import { RecommendationItem } from '../api/recommendation'
+import { searchAPI, SearchSuggestion } from '../api/search'
 
 type SearchMode = 'semantic' | 'exact'
 
 const SEARCH_MODE_STORAGE_KEY = 'yuexin_search_mode'
+const SUGGEST_DEBOUNCE_MS = 150
 
 interface UnifiedSearchProps {
   onRecommendations?: (recommendations: RecommendationItem[], message: string) => void
@@ -21,6 +23,8 @@ export default function UnifiedSearch({
   const navigate = useNavigate()
   const [query, setQuery] = useState('')
   const [isSearching, _setIsSearching] = useState(false)
+  const [suggestions, setSuggestions] = useState<SearchSuggestion[]>([])
+  const [activeSuggestion, setActiveSuggestion] = useState(-1)
   
   // 从 localStorage 读取保存的搜索模式，如果没有则使用默认值
   const [searchMode, setSearchMode] = useState<SearchMode>(() => {
@@ -33,6 +37,31 @@ export default function UnifiedSearch({
     return 'semantic' // 默认值
   })
 
+  // 精确搜索模式下输入联想：防抖后请求，新输入到来时取消上一次请求
+  useEffect(() => {
+    const q = query.trim()
+    if (searchMode !== 'exact' || !q) {
+      setSuggestions([])
+      return
+    }
+    const controller = new AbortController()
+    const timer = window.setTimeout(() => {
+      searchAPI
+        .suggest(q, 8, controller.signal)
+        .then((items) => {
+          setSuggestions(items)
+          setActiveSuggestion(-1)
+        })
+        .catch(() => {
+          // 联想失败不影响搜索，静默忽略（包括被取消的请求）
+        })
+    }, SUGGEST_DEBOUNCE_MS)
+    return () => {
+      window.clearTimeout(timer)
+      controller.abort()
+    }
+  }, [query, searchMode])
+
   // 当搜索模式改变时，保存到 localStorage
   const handleModeChange = (mode: SearchMode) => {
     setSearchMode(mode)
@@ -41,27 +70,51 @@ export default function UnifiedSearch({
     }
   }
 
-  const handleSearch = () => {
-    if (!query.trim()) {
+  const handleSearch = (text: string = query) => {
+    if (!text.trim()) {
       alert('请输入搜索内容')
       return
     }
 
-    console.log('开始搜索:', query, '模式:', searchMode)
+    console.log('开始搜索:', text, '模式:', searchMode)
+    setSuggestions([])
     
     if (searchMode === 'semantic') {
       // 语义推荐 - 跳转到推荐结果页面
-      navigate(`/recommendations?q=${encodeURIComponent(query)}`)
+      navigate(`/recommendations?q=${encodeURIComponent(text)}`)
     } else {
       // 精确搜索 - 跳转到搜索页面
-      navigate(`/search?q=${encodeURIComponent(query)}`)
+      navigate(`/search?q=${encodeURIComponent(text)}`)
+    }
+  }
+
+  const selectSuggestion = (suggestion: SearchSuggestion) => {
+    setQuery(suggestion.text)
+    handleSearch(suggestion.text)
+  }
+
+  // 上下键在联想列表中移动，Esc 关闭
+  const handleKeyDown = (e: React.KeyboardEvent) => {
+    if (suggestions.length === 0) return
+    if (e.key === 'ArrowDown') {
+      e.preventDefault()
+      setActiveSuggestion((i) => (i + 1) % suggestions.length)
+    } else if (e.key === 'ArrowUp') {
+      e.preventDefault()
+      setActiveSuggestion((i) => (i <= 0 ? suggestions.length - 1 : i - 1))
+    } else if (e.key === 'Escape') {
+      setSuggestions([])
     }
   }
 
   const handleKeyPress = (e: React.KeyboardEvent) => {
     if (e.key === 'Enter' && !e.shiftKey) {
       e.preventDefault()
-      handleSearch()
+      if (activeSuggestion >= 0 && activeSuggestion < suggestions.length) {
+        selectSuggestion(suggestions[activeSuggestion])
+      } else {
+        handleSearch()
+      }
     }
   }
 
@@ -105,6 +158,8 @@ export default function UnifiedSearch({
           value={query}
           onChange={(e) => setQuery(e.target.value)}
           onKeyPress={handleKeyPress}
+          onKeyDown={handleKeyDown}
+          onBlur={() => window.setTimeout(() => setSuggestions([]), 150)}
           placeholder={
             searchMode === 'semantic'
               ? '告诉我你的心情或需求，例如：最近工作压力大，想看点轻松的书...'
@@ -119,7 +174,7 @@ export default function UnifiedSearch({
           }}
         />
         <button
-          onClick={handleSearch}
+          onClick={() => handleSearch()}
           disabled={isSearching}
           className="absolute right-2 p-2.5 rounded-full bg-gradient-to-r from-purple-500 to-pink-500 text-white hover:opacity-90 transition-opacity disabled:opacity-50 shadow-lg disabled:cursor-not-allowed"
         >
@@ -129,6 +184,25 @@ export default function UnifiedSearch({
             <SearchIcon className="w-5 h-5" />
           )}
         </button>
+        {suggestions.length > 0 && (
+          <ul className="absolute left-0 right-0 top-full mt-2 z-20 overflow-hidden rounded-2xl bg-white shadow-lg border border-border/50 text-left">
+            {suggestions.map((s, i) => (
+              <li key={`${s.kind}-${s.book_id ?? s.text}`}>
+                <button
+                  type="button"
+                  onMouseDown={(e) => e.preventDefault()}
+                  onClick={() => selectSuggestion(s)}
+                  className={`w-full flex items-center gap-3 px-5 py-2.5 text-sm text-black transition-colors ${
+                    i === activeSuggestion ? 'bg-purple-50' : 'hover:bg-purple-50'
+                  }`}
+                >
+                  <span className="text-xs text-gray-400 w-8 flex-shrink-0">{s.kind === 'author' ? '作者' : '书名'}</span>
+                  <span className="truncate">{s.text}</span>
+                </button>
+              </li>
+            ))}
+          </ul>
+        )}
       </div>
       {isSearching && (
         <div className="mt-4 text-center text-sm text-foreground/60">
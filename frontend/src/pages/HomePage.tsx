@@ -293,6 +293,7 @@ export default function HomePage() {
   const [isInitialLoading, setIsInitialLoading] = useState(true)
   const [showBackToTop, setShowBackToTop] = useState(false)
   const observerTarget = useRef<HTMLDivElement>(null)
+  const popularCursor = useRef<string | null>(null)
   const PAGE_SIZE = 20
   const [visibleCapsules, setVisibleCapsules] = useState<typeof INSPIRATION_CAPSULES>([])
 
@@ -453,7 +454,11 @@ export default function HomePage() {
         setIsInitialLoading(true)
       }
       console.log(`开始加载热门书籍 (skip=${skip}, refresh=${refresh})...`)
-      const books = await popularAPI.getEveryoneWatching(skip, PAGE_SIZE, { refresh })
+      const { books, cursor } = await popularAPI.getEveryoneWatchingPage(PAGE_SIZE, {
+        cursor: skip === 0 ? null : popularCursor.current,
+        refresh,
+      })
+      popularCursor.current = cursor
       console.log('热门书籍加载成功:', books?.length || 0)
       
       if (books && books.length > 0) {
@@ -465,8 +470,8 @@ export default function HomePage() {
           // 追加加载
           setPopularBooks((prev) => [...prev, ...books])
         }
-        setHasMore(books.length === PAGE_SIZE)
-        console.log(`已加载 ${skip + books.length} 本书，还有更多: ${books.length === PAGE_SIZE}`)
+        setHasMore(cursor !== null)
+        console.log(`已加载 ${skip + books.length} 本书，还有更多: ${cursor !== null}`)
       } else {
         console.warn('热门书籍列表为空')
         if (skip === 0) {
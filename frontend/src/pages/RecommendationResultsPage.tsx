@@ -5,7 +5,7 @@ import BookDetailModal from '../components/BookDetailModal'
 import AgentChatModal from '../components/AgentChatModal'
 import LoadingSpinner from '../components/LoadingSpinner'
 import EmptyState from '../components/EmptyState'
-import { RecommendationItem } from '../api/recommendation'
+import { RecommendationItem, RecommendationResponse, RecommendationTextUpdate } from '../api/recommendation'
 import { recommendationAPI } from '../api/recommendation'
 import { booksAPI, Book } from '../api/books'
 import { showToast } from '../components/ToastContainer'
@@ -95,19 +95,53 @@ export default function RecommendationResultsPage() {
     const MIN_LOADING_MS = 600 // 换一批时至少展示 600ms 加载动效，避免请求过快时看不到
     setIsLoading(true)
     try {
-      const response = await recommendationAPI.semanticRecommendation(searchQuery, signal)
-      if (thisRequestId !== requestIdRef.current) return
-      const elapsed = Date.now() - loadingStartedAt
-      const delay = Math.max(0, MIN_LOADING_MS - elapsed)
-      if (delay > 0) {
-        await new Promise((r) => setTimeout(r, delay))
+      // 流式：书单先到先渲染卡片（推荐语显示为生成中），推荐语逐条补上
+      let pendingTexts: RecommendationTextUpdate[] = []
+      let booksShown = false
+      const showBooks = async (books: RecommendationResponse) => {
+        const elapsed = Date.now() - loadingStartedAt
+        const delay = Math.max(0, MIN_LOADING_MS - elapsed)
+        if (delay > 0) {
+          await new Promise((r) => setTimeout(r, delay))
+        }
+        if (thisRequestId !== requestIdRef.current) return
+        hadRecommendationsRef.current = (books.recommendations?.length ?? 0) > 0
+        // 等待期间已生成的推荐语一并应用
+        const early = new Map(pendingTexts.map((u) => [u.book_id, u]))
+        setRecommendations(books.recommendations.map((item) => ({ ...item, ...early.get(item.book_id) })))
+        setMessage(books.message)
+        setShowAgentSuggestion(books.show_agent_suggestion || false)
+        setAgentName(books.agent_name || '苏童童')
+        setIsLoading(false)
+        booksShown = true
       }
+      let booksShownPromise: Promise<void> = Promise.resolve()
+      const response = await recommendationAPI.semanticRecommendationStream(
+        searchQuery,
+        {
+          onBooks: (books) => {
+            booksShownPromise = showBooks(books)
+          },
+          onText: (update) => {
+            if (thisRequestId !== requestIdRef.current) return
+            if (!booksShown) {
+              pendingTexts = [...pendingTexts, update]
+              return
+            }
+            setRecommendations((prev) =>
+              prev.map((item) => (item.book_id === update.book_id ? { ...item, ...update } : item))
+            )
+          },
+        },
+        signal
+      )
+      await booksShownPromise
       if (thisRequestId !== requestIdRef.current) return
-      hadRecommendationsRef.current = (response.recommendations?.length ?? 0) > 0
-      setRecommendations(response.recommendations)
-      setMessage(response.message)
-      setShowAgentSuggestion(response.show_agent_suggestion || false)
-      setAgentName(response.agent_name || '苏童童')
+      // 以最终结果为准（用户已移除的卡片不会重新出现）
+      setRecommendations((prev) => {
+        const finalById = new Map(response.recommendations.map((item) => [item.book_id, item]))
+        return prev.map((item) => finalById.get(item.book_id) || item)
+      })
       // 缓存推荐结果
       const cacheKey = `recommendation_results_${searchQuery}`
       sessionStorage.setItem(cacheKey, JSON.stringify({